@@ -0,0 +1,4 @@
+"""
+Benchmarks offline de los scripts de migración y sync contra stand-ins
+locales de Supabase (PostgREST) y Gemini. Ver benchmarks/run.py.
+"""
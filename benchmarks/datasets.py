@@ -0,0 +1,286 @@
+"""
+Datos sintéticos con la forma y el volumen de las fuentes reales.
+
+Con scale=1.0 los tamaños son los de producción (22,358 promesas, 8,109
+candidatos, 6,438 hojas de vida, ...). Todo sale de un random.Random(seed),
+así que dos corridas con la misma escala generan exactamente lo mismo y los
+números son comparables entre commits.
+"""
+
+import json
+import random
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+SCHEMA_SQLITE = Path(__file__).resolve().parent.parent / "data" / "schema_sqlite.sql"
+
+SIZES = {
+    "partidos": 35,
+    "promesas": 22_358,
+    "candidatos": 8_109,
+    "hojas_vida": 6_438,
+    "master": 2_000,
+    "temas": 247,
+    "aliases": 400,
+}
+INTERACCIONES_POR_ENTRADA = 4
+DUPLICADOS = 0.08          # Fracción de promesas con texto repetido (pasa en los PDFs)
+MULTICARGO = 0.01          # Candidatos con más de un registro (mismo DNI, otro cargo)
+
+CARGOS = (
+    (1, "PRESIDENTE DE LA REPÚBLICA"),
+    (2, "PRIMER VICEPRESIDENTE DE LA REPÚBLICA"),
+    (3, "SEGUNDO VICEPRESIDENTE DE LA REPÚBLICA"),
+    (4, "SENADOR"),
+    (5, "DIPUTADO"),
+    (6, "REPRESENTANTE ANTE EL PARLAMENTO ANDINO"),
+)
+CATEGORIAS = ("educacion", "salud", "economia", "seguridad", "empleo", "infraestructura",
+              "agricultura", "medio_ambiente", "justicia", "tecnologia", "vivienda", "transporte")
+DEPARTAMENTOS = ("LIMA", "AREQUIPA", "CUSCO", "PIURA", "LA LIBERTAD", "JUNIN", "PUNO", "LORETO")
+NOMBRES = ("JUAN", "MARIA", "CARLOS", "ROSA", "JOSE", "ANA", "LUIS", "CARMEN", "JORGE", "ELENA",
+           "MIGUEL", "PATRICIA", "CESAR", "LUCIA", "RAUL", "SOFIA", "VICTOR", "ISABEL")
+APELLIDOS = ("QUISPE", "FLORES", "SANCHEZ", "GARCIA", "RODRIGUEZ", "MAMANI", "HUAMAN", "CHAVEZ",
+             "TORRES", "RAMIREZ", "MENDOZA", "VARGAS", "CASTILLO", "ROJAS", "GUTIERREZ", "PAREDES",
+             "CONDORI", "DIAZ", "ESPINOZA", "VASQUEZ", "RIOS", "SALAZAR", "CRUZ", "REYES")
+VERBOS = ("Implementar", "Crear", "Fortalecer", "Garantizar", "Construir", "Impulsar", "Reducir",
+          "Ampliar", "Mejorar", "Modernizar", "Promover", "Descentralizar")
+PALABRAS = ("programa", "nacional", "acceso", "servicios", "públicos", "regiones", "rurales",
+            "inversión", "infraestructura", "educación", "salud", "seguridad", "ciudadana",
+            "empleo", "formal", "agua", "potable", "hospitales", "colegios", "carreteras",
+            "policía", "justicia", "corrupción", "digital", "internet", "vivienda", "social",
+            "pequeña", "empresa", "agricultura", "familiar", "minería", "responsable", "turismo",
+            "transporte", "público", "medio", "ambiente", "becas", "universidades", "estado")
+
+
+class Corpus:
+    """Partidos y candidatos compartidos por todas las fuentes generadas."""
+
+    def __init__(self, scale=1.0, seed=0, dims=1536):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.dims = dims
+        self.n = {k: max(1, round(v * scale)) if k != "partidos" else v for k, v in SIZES.items()}
+        self.partidos = [self._partido(i) for i in range(1, self.n["partidos"] + 1)]
+        self.candidatos = self._candidatos()
+
+    # --- piezas ---
+    def texto(self, min_words=12, max_words=40):
+        words = self.rng.choices(PALABRAS, k=self.rng.randint(min_words, max_words))
+        return f"{self.rng.choice(VERBOS)} {' '.join(words)}."
+
+    def _partido(self, i):
+        nombre = f"PARTIDO {self.rng.choice(PALABRAS).upper()} {i}"
+        return {
+            "id": i,
+            "nombre_oficial": nombre,
+            "nombre_corto": f"P{i}",
+            "candidato_presidencial": None,
+            "pdf_plan_completo": f"{nombre} - plan.pdf",
+            "pdf_resumen": f"{nombre} resumen.pdf",
+            "total_candidatos": 0,
+        }
+
+    def _candidatos(self):
+        candidatos = []
+        dni = 40_000_000
+        while len(candidatos) < self.n["candidatos"]:
+            dni += self.rng.randint(1, 997)
+            partido = self.rng.choice(self.partidos)
+            nombres = " ".join(self.rng.sample(NOMBRES, self.rng.randint(1, 2)))
+            paterno, materno = self.rng.sample(APELLIDOS, 2)
+            cargos = [self.rng.choices(CARGOS, weights=(1, 1, 1, 20, 60, 5))[0]]
+            if self.rng.random() < MULTICARGO:
+                cargos.append(CARGOS[3])
+            for cargo_id, cargo in cargos:
+                candidatos.append({
+                    "id": len(candidatos) + 1,
+                    "dni": str(dni),
+                    "nombres": nombres,
+                    "apellido_paterno": paterno,
+                    "apellido_materno": materno,
+                    "nombre_completo": f"{nombres} {paterno} {materno}",
+                    "cargo_postula": cargo,
+                    "cargo_eleccion": cargo_id,
+                    "partido_id": partido["id"],
+                    "organizacion_politica": partido["nombre_oficial"],
+                    "departamento": self.rng.choice(DEPARTAMENTOS),
+                    "foto_url": f"{dni:08d}.jpg",
+                })
+        return candidatos[:self.n["candidatos"]]
+
+    # --- fuentes en archivo ---
+    def write_promesas_db(self, path):
+        """promesas_v2.db con el schema real y embeddings JSON de `dims` dimensiones."""
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA_SQLITE.read_text(encoding="utf-8"))
+        conn.executemany(
+            "INSERT INTO partidos_politicos (id, nombre_oficial, nombre_corto, pdf_plan_completo, pdf_resumen, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(p["id"], p["nombre_oficial"], p["nombre_corto"], p["pdf_plan_completo"], p["pdf_resumen"],
+              json.dumps({"fuente": "benchmark"})) for p in self.partidos])
+
+        vectors = np.random.default_rng(self.seed)
+        textos = []
+        for i in range(self.n["promesas"]):
+            if textos and self.rng.random() < DUPLICADOS:
+                textos.append(self.rng.choice(textos))
+            else:
+                textos.append(self.texto())
+
+        batch = 1000
+        for start in range(0, len(textos), batch):
+            chunk = vectors.standard_normal((min(batch, len(textos) - start), self.dims), dtype=np.float32)
+            rows = []
+            for offset, vec in enumerate(chunk):
+                i = start + offset
+                rows.append((
+                    i + 1, self.partidos[i % len(self.partidos)]["id"], f"{textos[i]} [{i}]", textos[i].lower(),
+                    self.rng.choice(CATEGORIAS), self.rng.randint(1, 120), f"EJE {self.rng.randint(1, 8)}",
+                    round(self.rng.uniform(0.5, 1.0), 2), json.dumps(np.round(vec, 6).tolist()),
+                ))
+            conn.executemany(
+                "INSERT INTO promesas (id, partido_id, texto_original, texto_normalizado, categoria, "
+                "pagina_pdf, seccion_pdf, confianza_extraccion, embedding) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        conn.close()
+
+    def write_candidatos_json(self, path):
+        """candidatos_jne_2026.json con los campos crudos del JNE."""
+        registros = [{
+            "strDocumentoIdentidad": c["dni"],
+            "strNombres": c["nombres"],
+            "strApellidoPaterno": c["apellido_paterno"],
+            "strApellidoMaterno": c["apellido_materno"],
+            "strSexo": self.rng.choice(("MASCULINO", "FEMENINO")),
+            "strOrganizacionPolitica": c["organizacion_politica"],
+            "strTipoEleccion": "ELECCIONES GENERALES 2026",
+            "strCargo": c["cargo_postula"],
+            "idCargo": c["cargo_eleccion"],
+            "strUbigeo": f"{self.rng.randint(10000, 259999):06d}",
+            "strDepartamento": c["departamento"],
+            "strProvincia": c["departamento"],
+            "strDistrito": c["departamento"],
+            "strNombre": c["foto_url"],
+            "strEstadoCandidato": "INSCRITO",
+        } for c in self.candidatos]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"candidatos": registros}, f, ensure_ascii=False)
+
+    def write_hojas_vida_json(self, path):
+        """Hojas de vida con los campos que leen 002 y 007 (~6 KB por registro, como el snapshot real)."""
+        personas = list({c["dni"]: c for c in self.candidatos}.values())
+        hojas = []
+        for i in range(self.n["hojas_vida"]):
+            c = personas[i % len(personas)]
+            hojas.append({
+                "hv_id": str(100_000 + i),
+                "dni": c["dni"],
+                "estado_hv": self.rng.choice(("CONFIRMADA", "EN REGISTRO")),
+                "porcentaje_completitud": self.rng.randint(40, 100),
+                "fecha_termino_registro": f"{self.rng.randint(1, 28):02d}/12/2025 10:30:00",
+                "verificacion_sunedu": self.rng.random() < 0.7,
+                "verificacion_sunarp": self.rng.random() < 0.5,
+                "indicadores": {"tiene_sentencias": self.rng.random() < 0.1, "tiene_bienes": True},
+                "educacion": {
+                    "edu_primaria": {"concluido": True, "centro": self.texto(2, 4)},
+                    "edu_secundaria": {"concluido": True, "centro": self.texto(2, 4)},
+                    "edu_universitaria": [{"universidad": self.texto(2, 5), "carrera": self.texto(1, 3),
+                                           "concluido": self.rng.random() < 0.8} for _ in range(self.rng.randint(0, 3))],
+                    "edu_posgrado": [{"centro": self.texto(2, 5), "grado": "MAESTRIA"} for _ in range(self.rng.randint(0, 2))],
+                },
+                "experiencia_laboral": [{"centro_trabajo": self.texto(2, 5), "ocupacion": self.texto(1, 4),
+                                         "desde": 2000 + j, "hasta": 2002 + j} for j in range(self.rng.randint(1, 8))],
+                "cargos_partidarios": [{"organizacion": c["organizacion_politica"], "cargo": self.texto(1, 3)}],
+                "sentencias": {"penales": [], "obligaciones": []},
+                "bienes": {
+                    "muebles": [{"tipo": "VEHICULO", "descripcion": self.texto(3, 8),
+                                 "valor": self.rng.randint(5_000, 90_000)} for _ in range(self.rng.randint(0, 4))],
+                    "inmuebles": [{"tipo": "CASA", "direccion": self.texto(4, 10),
+                                   "valor": self.rng.randint(50_000, 900_000)} for _ in range(self.rng.randint(0, 4))],
+                },
+                "ingresos": {"publico": self.rng.randint(0, 200_000), "privado": self.rng.randint(0, 400_000)},
+                "ubigeo_nacimiento": f"{self.rng.randint(10000, 259999):06d}",
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"metadata": {"fuente": "benchmark"}, "hojas_vida": hojas}, f, ensure_ascii=False)
+
+    # --- filas de Supabase ---
+    def partidos_rows(self):
+        return [{k: p[k] for k in ("id", "nombre_oficial", "nombre_corto", "candidato_presidencial")}
+                for p in self.partidos]
+
+    def promesas_planes_rows(self):
+        """quipu_promesas_planes ya migrada (entrada de 004), sin embedding."""
+        rows, textos = [], []
+        for i in range(self.n["promesas"]):
+            if textos and self.rng.random() < DUPLICADOS:
+                texto = self.rng.choice(textos)
+            else:
+                texto = self.texto()
+                textos.append(texto)
+            rows.append({
+                "id": i + 1,
+                "partido_id": self.partidos[i % len(self.partidos)]["id"],
+                "texto_original": texto,
+                "resumen": None,
+                "categoria": self.rng.choice(CATEGORIAS),
+            })
+        return rows
+
+    def temas_rows(self):
+        return [{
+            "id": i,
+            "nombre": f"Tema {palabra} {i}",
+            "nombre_normalizado": f"tema {palabra} {i}",
+            "categoria": self.rng.choice(CATEGORIAS),
+            "sector": None,
+            "keywords": [f"{palabra} {i}", f"{self.rng.choice(PALABRAS)} {palabra} {i}"],
+            "orden": i,
+            "activo": True,
+        } for i, palabra in ((i, self.rng.choice(PALABRAS)) for i in range(1, self.n["temas"] + 1))]
+
+    def aliases_rows(self):
+        rows = []
+        for i in range(1, self.n["aliases"] + 1):
+            c = self.rng.choice(self.candidatos)
+            alias = f"{c['apellido_paterno'].title()} ({c['organizacion_politica'].title()})"
+            rows.append({
+                "id": i,
+                "alias": alias,
+                "alias_normalized": alias.lower(),
+                "candidato_id": c["id"],
+                "confidence": 1.0,
+                "match_method": "manual",
+                "verified": True,
+            })
+        return rows
+
+    def master_rows(self, temas):
+        """QUIPU_MASTER: entradas con interacciones de tipo declaration."""
+        rows = []
+        for i in range(1, self.n["master"] + 1):
+            interacciones = []
+            for _ in range(self.rng.randint(1, 2 * INTERACCIONES_POR_ENTRADA - 1)):
+                c = self.rng.choice(self.candidatos)
+                stakeholder = c["nombre_completo"].title() if self.rng.random() < 0.8 else self.texto(1, 3)
+                tema = self.rng.choice(temas)["nombre"]
+                interacciones.append({
+                    "type": self.rng.choice(("declaration", "declaration", "declaration", "mention")),
+                    "content": self.texto(20, 80),
+                    "stakeholder": stakeholder,
+                    "tema": tema,
+                    "categorias": ";".join({tema, self.rng.choice(temas)["nombre"]}),
+                })
+            rows.append({
+                "id": i,
+                "fecha": f"2026-{self.rng.randint(1, 3):02d}-{self.rng.randint(1, 28):02d}",
+                "canal": self.rng.choice(("TV", "RADIO", "WEB", "PRENSA")),
+                "ruta": f"https://medios.example/{i}",
+                "titulo": self.texto(4, 10),
+                "resumen": self.texto(20, 40),
+                "interacciones": interacciones,
+            })
+        return rows
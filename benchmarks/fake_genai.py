@@ -0,0 +1,120 @@
+"""
+Stand-in del módulo google.genai: Client().models.generate_content y
+embed_content, más types.EmbedContentConfig.
+
+Los embeddings son deterministas por texto (mismo texto → mismo vector) y
+generate_content responde con `responder(prompt)`. Latencia y error_rate
+funcionan igual que en fake_supabase.py; los errores imitan el 503
+UNAVAILABLE / 429 RESOURCE_EXHAUSTED de la API de Gemini.
+"""
+
+import sys
+import time
+import random
+import hashlib
+import threading
+from dataclasses import dataclass, fields
+from types import ModuleType, SimpleNamespace
+
+import numpy as np
+
+
+@dataclass
+class GenaiConfig:
+    latency: float = 0.15         # segundos por request
+    per_item: float = 0.002       # + segundos por texto en embed_content
+    jitter: float = 0.05
+    error_rate: float = 0.0
+    dimensions: int = 1536        # si el request no pide output_dimensionality
+    seed: int = 0
+
+
+@dataclass
+class GenaiStats:
+    requests: int = 0
+    errors: int = 0
+    texts: int = 0
+    chars: int = 0
+
+    def snapshot(self):
+        return {f"genai_{f.name}": getattr(self, f.name) for f in fields(self)}
+
+
+INJECTED_ERRORS = (
+    "503 UNAVAILABLE. The model is overloaded (inyectado)",
+    "429 RESOURCE_EXHAUSTED (inyectado)",
+)
+
+
+def fake_vector(text, dims):
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dims, dtype=np.float32).tolist()
+
+
+class _Models:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        prompt = contents if isinstance(contents, str) else " ".join(map(str, contents))
+        self.owner._network([prompt])
+        return SimpleNamespace(text=self.owner.responder(prompt))
+
+    def embed_content(self, model, contents, config=None, **kwargs):
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        self.owner._network(texts)
+        dims = getattr(config, "output_dimensionality", None) or self.owner.config.dimensions
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=fake_vector(t, dims)) for t in texts])
+
+
+class FakeGenai:
+    """Estado compartido por todos los Client() que cree el script."""
+
+    def __init__(self, config=None, responder=None):
+        self.config = config or GenaiConfig()
+        self.responder = responder or (lambda prompt: "Otros")
+        self.stats = GenaiStats()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+
+    def _network(self, texts):
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.texts += len(texts)
+            self.stats.chars += sum(len(t) for t in texts)
+            delay = (self.config.latency + self.config.per_item * len(texts)
+                     + self._rng.uniform(0, self.config.jitter))
+            error = self._rng.choice(INJECTED_ERRORS) if self._rng.random() < self.config.error_rate else None
+        time.sleep(delay)
+        if error:
+            with self._lock:
+                self.stats.errors += 1
+            raise RuntimeError(error)
+
+    def module(self):
+        """Módulo que reemplaza a google.genai (Client, types)."""
+        owner = self
+        mod = ModuleType("google.genai")
+
+        class Client:
+            def __init__(self, api_key=None, **kwargs):
+                self.models = _Models(owner)
+
+        mod.Client = Client
+        mod.types = SimpleNamespace(
+            EmbedContentConfig=lambda **kw: SimpleNamespace(**kw),
+            GenerateContentConfig=lambda **kw: SimpleNamespace(**kw),
+        )
+        return mod
+
+    def install(self):
+        """Registra el stand-in como google.genai (exista o no el paquete google)."""
+        try:
+            import google
+        except ImportError:
+            google = ModuleType("google")
+            google.__path__ = []
+            sys.modules["google"] = google
+        mod = self.module()
+        sys.modules["google.genai"] = mod
+        google.genai = mod
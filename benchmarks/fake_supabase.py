@@ -0,0 +1,388 @@
+"""
+Stand-in en memoria del cliente supabase-py: la API de tablas (select /
+insert / upsert / update / delete con filtros, orden y paginación) y rpc().
+
+Cada execute() cuenta como un request: duerme `latency` + jitter + el tiempo
+de transferencia del payload según `bandwidth`, y con probabilidad
+`error_rate` falla con FakeAPIError (503/504/429) sin aplicar la escritura,
+igual que un PostgREST saturado. Los contadores de `stats` son los que reporta
+benchmarks/run.py por fase.
+"""
+
+import re
+import json
+import time
+import random
+import threading
+from dataclasses import dataclass, fields
+from types import SimpleNamespace
+
+
+class FakeAPIError(Exception):
+    """Error de PostgREST simulado (mismo rol que postgrest.exceptions.APIError)."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.02       # segundos por request
+    jitter: float = 0.01        # + uniforme(0, jitter)
+    bandwidth: float = 0.0      # bytes/s del payload (0 = sin límite)
+    error_rate: float = 0.0     # probabilidad de fallo por request
+    seed: int = 0
+
+
+@dataclass
+class RequestStats:
+    requests: int = 0
+    errors: int = 0
+    rows_read: int = 0
+    rows_written: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+    def snapshot(self):
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+INJECTED_ERRORS = (
+    (503, "Service Unavailable (inyectado)"),
+    (504, "Gateway Timeout (inyectado)"),
+    (429, "Too Many Requests (inyectado)"),
+)
+
+
+def _size(obj):
+    return len(json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8")) if obj is not None else 0
+
+
+def _like(pattern, flags=0):
+    regex = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern)
+    return re.compile(f"^{regex}$", flags | re.DOTALL)
+
+
+def _comparable(a, b):
+    """PostgREST castea el literal al tipo de la columna; acá alcanza con int/float vs str."""
+    if isinstance(a, (int, float)) and isinstance(b, str):
+        try:
+            return a, float(b)
+        except ValueError:
+            return str(a), b
+    if isinstance(a, str) and isinstance(b, (int, float)):
+        return a, str(b)
+    return a, b
+
+
+def _compare(op, value, arg):
+    if value is None:
+        return False
+    value, arg = _comparable(value, arg)
+    try:
+        return {
+            "eq": value == arg, "neq": value != arg,
+            "gt": value > arg, "gte": value >= arg,
+            "lt": value < arg, "lte": value <= arg,
+        }[op]
+    except TypeError:
+        return False
+
+
+class _Table:
+    def __init__(self):
+        self.rows = {}         # id → fila
+        self.next_id = 1
+        self.indexes = {}      # columnas de conflicto → {clave: id}
+
+    def index(self, cols):
+        if cols not in self.indexes:
+            self.indexes[cols] = {tuple(r.get(c) for c in cols): rid for rid, r in self.rows.items()}
+        return self.indexes[cols]
+
+    def insert(self, row):
+        row = dict(row)
+        if row.get("id") is None:
+            row["id"] = self.next_id
+        if isinstance(row["id"], int):
+            self.next_id = max(self.next_id, row["id"] + 1)
+        self.rows[row["id"]] = row
+        for cols, idx in self.indexes.items():
+            idx[tuple(row.get(c) for c in cols)] = row["id"]
+        return row
+
+    def upsert(self, row, cols, ignore_duplicates=False):
+        if cols == ("id",) and row.get("id") is None:
+            return self.insert(row)
+        existing = self.index(cols).get(tuple(row.get(c) for c in cols))
+        if existing is None:
+            return self.insert(row)
+        if not ignore_duplicates:
+            self.rows[existing].update(row)
+        return self.rows[existing]
+
+
+class _Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = "select"
+        self.columns = None
+        self.count = None
+        self.head = False
+        self.filters = []
+        self.orders = []
+        self.limit_n = None
+        self.offset = 0
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self._negate = False
+
+    # --- operación ---
+    def select(self, columns="*", count=None, head=False):
+        self.columns = [c.strip() for c in columns.split(",")] if columns and columns.strip() != "*" else None
+        self.count = count
+        self.head = head
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.op, self.payload = "upsert", rows
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values, **kwargs):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self, **kwargs):
+        self.op = "delete"
+        return self
+
+    # --- filtros ---
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _filter(self, fn):
+        negate, self._negate = self._negate, False
+        self.filters.append((lambda r: not fn(r)) if negate else fn)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda r: _compare("eq", r.get(column), value))
+
+    def neq(self, column, value):
+        return self._filter(lambda r: _compare("neq", r.get(column), value))
+
+    def gt(self, column, value):
+        return self._filter(lambda r: _compare("gt", r.get(column), value))
+
+    def gte(self, column, value):
+        return self._filter(lambda r: _compare("gte", r.get(column), value))
+
+    def lt(self, column, value):
+        return self._filter(lambda r: _compare("lt", r.get(column), value))
+
+    def lte(self, column, value):
+        return self._filter(lambda r: _compare("lte", r.get(column), value))
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(lambda r: r.get(column) in values)
+
+    def is_(self, column, value):
+        expected = {"null": None, "true": True, "false": False}.get(str(value).lower(), value)
+        return self._filter(lambda r: r.get(column) is expected)
+
+    def or_(self, filters, **kwargs):
+        """Disyunción "col.op.valor,col.op.valor" (sin and/or anidados)."""
+        condiciones = [f.split(".", 2) for f in filters.split(",")]
+
+        def match(r, column, op, value):
+            if op == "is":
+                return r.get(column) is {"null": None, "true": True, "false": False}.get(value.lower(), value)
+            return _compare(op, r.get(column), value)
+        return self._filter(lambda r: any(match(r, *c) for c in condiciones))
+
+    def like(self, column, pattern):
+        regex = _like(pattern)
+        return self._filter(lambda r: isinstance(r.get(column), str) and bool(regex.match(r[column])))
+
+    def ilike(self, column, pattern):
+        regex = _like(pattern, re.IGNORECASE)
+        return self._filter(lambda r: isinstance(r.get(column), str) and bool(regex.match(r[column])))
+
+    # --- orden y paginación ---
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n, **kwargs):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset = start
+        self.limit_n = end - start + 1
+        return self
+
+    def execute(self):
+        return self.client._execute(self)
+
+
+class _Rpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        return self.client._execute_rpc(self)
+
+
+class FakeSupabase:
+    """Cliente con las tablas en memoria; `rpcs` mapea nombre → handler(client, params)."""
+
+    def __init__(self, config=None, rpcs=None):
+        self.config = config or FakeConfig()
+        self.stats = RequestStats()
+        self.tables = {}
+        self.rpcs = dict(DEFAULT_RPCS)
+        self.rpcs.update(rpcs or {})
+        self._lock = threading.RLock()
+        self._rng = random.Random(self.config.seed)
+
+    def table(self, name):
+        return _Query(self, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        return _Rpc(self, name, params or {})
+
+    def seed(self, table, rows):
+        """Carga filas sin pasar por la latencia ni los contadores."""
+        with self._lock:
+            t = self.tables.setdefault(table, _Table())
+            for row in rows:
+                t.insert(row)
+
+    def rows(self, table):
+        with self._lock:
+            return list(self.tables.get(table, _Table()).rows.values())
+
+    # --- simulación de red ---
+    def _network(self, payload_bytes):
+        with self._lock:
+            self.stats.requests += 1
+            delay = self.config.latency + self._rng.uniform(0, self.config.jitter)
+            fail = self._rng.random() < self.config.error_rate
+            error = self._rng.choice(INJECTED_ERRORS) if fail else None
+        if self.config.bandwidth:
+            delay += payload_bytes / self.config.bandwidth
+        time.sleep(delay)
+        if error:
+            with self._lock:
+                self.stats.errors += 1
+            raise FakeAPIError(*error)
+
+    def _execute(self, q):
+        sent = _size(q.payload) if q.op != "select" else 0
+        self._network(sent)
+
+        with self._lock:
+            t = self.tables.setdefault(q.table, _Table())
+            if q.op == "insert":
+                rows = q.payload if isinstance(q.payload, list) else [q.payload]
+                data = [dict(t.insert(r)) for r in rows]
+                self.stats.rows_written += len(data)
+            elif q.op == "upsert":
+                rows = q.payload if isinstance(q.payload, list) else [q.payload]
+                cols = tuple(c.strip() for c in q.on_conflict.split(",")) if q.on_conflict else ("id",)
+                data = [dict(t.upsert(r, cols, q.ignore_duplicates)) for r in rows]
+                self.stats.rows_written += len(data)
+            else:
+                matched = [r for r in t.rows.values() if all(f(r) for f in q.filters)]
+                if q.op == "update":
+                    for r in matched:
+                        r.update(q.payload)
+                    self.stats.rows_written += len(matched)
+                elif q.op == "delete":
+                    for r in matched:
+                        del t.rows[r["id"]]
+                    t.indexes.clear()
+                data = self._shape(q, matched)
+            count = len(data) if q.op != "select" else None
+            if q.op == "select":
+                count = len(data["matched"]) if q.count else None
+                data = data["page"]
+                self.stats.rows_read += len(data)
+            self.stats.bytes_sent += sent
+
+        received = _size(data)
+        with self._lock:
+            self.stats.bytes_received += received
+        return SimpleNamespace(data=data, count=count)
+
+    def _shape(self, q, matched):
+        for column, desc in reversed(q.orders):
+            present = [r for r in matched if r.get(column) is not None]
+            nulls = [r for r in matched if r.get(column) is None]
+            present.sort(key=lambda r: r[column], reverse=desc)
+            matched = present + nulls          # NULLS LAST, como el default de PostgREST en ASC
+        if not q.orders:
+            matched = sorted(matched, key=lambda r: r["id"])
+        page = matched[q.offset:] if q.offset else matched
+        if q.limit_n is not None:
+            page = page[:q.limit_n]
+        if q.head:
+            page = []
+        elif q.columns is not None:
+            page = [{c: r.get(c) for c in q.columns} for r in page]
+        else:
+            page = [dict(r) for r in page]
+        return {"matched": matched, "page": page} if q.op == "select" else page
+
+    def _execute_rpc(self, call):
+        self._network(_size(call.params))
+        handler = self.rpcs.get(call.name)
+        if handler is None:
+            raise FakeAPIError(404, f"Could not find the function public.{call.name}")
+        with self._lock:
+            data = handler(self, call.params)
+            self.stats.bytes_sent += _size(call.params)
+        return SimpleNamespace(data=data, count=None)
+
+
+def _bulk_update(table, column, ids_param, values_param, parse=lambda v: v):
+    """Handler genérico para los RPC de UPDATE ... FROM unnest(ids, valores)."""
+    def handler(client, params):
+        t = client.tables.setdefault(table, _Table())
+        actualizadas = 0
+        for rid, value in zip(params[ids_param], params[values_param]):
+            row = t.rows.get(rid)
+            if row is not None:
+                row[column] = parse(value)
+                actualizadas += 1
+        client.stats.rows_written += actualizadas
+        return actualizadas
+    return handler
+
+
+DEFAULT_RPCS = {
+    # migrations/011_bulk_update_categorias.sql
+    "quipu_update_categorias": _bulk_update("quipu_promesas_planes", "categoria", "p_ids", "p_categorias"),
+    # fase3/migrations/023_declaraciones_embeddings_bulk.sql
+    "quipu_set_declaracion_embeddings": _bulk_update("quipu_declaraciones", "embedding", "p_ids", "p_embeddings"),
+    # fase3/migrations/025_candidato_fotos.sql
+    "quipu_set_candidato_fotos": _bulk_update("quipu_candidatos", "foto_local", "p_ids", "p_keys"),
+}
@@ -0,0 +1,178 @@
+"""
+Corre un escenario dentro del proceso actual (lo lanza run.py en un subproceso).
+
+1. Genera los datos sintéticos y carga las tablas del FakeSupabase
+2. Registra los stand-ins como `supabase` y `google.genai`
+3. Importa el script, redirige sus rutas al directorio temporal y envuelve
+   las funciones de fase con PhaseTracker
+4. Llama a main() con la salida del script en script.log
+"""
+
+import os
+import sys
+import time
+import threading
+import functools
+import importlib.util
+from types import ModuleType
+from contextlib import redirect_stderr, redirect_stdout
+
+from benchmarks.datasets import Corpus
+from benchmarks.fake_genai import FakeGenai, GenaiConfig
+from benchmarks.fake_supabase import FakeConfig, FakeSupabase
+from benchmarks.scenarios import ROOT, SCENARIOS
+
+RSS_SAMPLE_INTERVAL = 0.02
+
+
+def rss_bytes():
+    """RSS actual (Linux); en macOS el máximo histórico de getrusage; 0 si no hay cómo medir."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:   # Windows
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class PhaseTracker:
+    """
+    Divide la corrida en segmentos: cada llamada de nivel superior (hilo
+    principal) a una función envuelta abre uno; el tiempo entre fases va a
+    `resto`. Por segmento acumula llamadas, tiempo, RSS pico y la diferencia
+    de los contadores de los stand-ins (que incluye lo que hagan los hilos
+    de fondo del script mientras tanto).
+    """
+
+    def __init__(self, counters, resto):
+        self.counters = counters
+        self.resto = resto
+        self.segments = {}
+        self._current = resto
+        self._depth = 0
+        self._peak = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        self._t0 = self._seg_t = time.perf_counter()
+        self._seg_c = self.counters()
+        self._peak = rss_bytes()
+        self._sampler = threading.Thread(target=self._sample, name="bench-rss", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._close()
+        self._stop.set()
+        self._sampler.join()
+        self.wall = time.perf_counter() - self._t0
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = rss_bytes()
+            with self._lock:
+                self._peak = max(self._peak, rss)
+
+    def _close(self):
+        now = time.perf_counter()
+        counters = self.counters()
+        rss = rss_bytes()
+        with self._lock:
+            peak, self._peak = max(self._peak, rss), rss
+        seg = self.segments.setdefault(self._current, {"calls": 0, "wall_s": 0.0, "peak_rss": 0,
+                                                       **{k: 0 for k in counters}})
+        seg["wall_s"] += now - self._seg_t
+        seg["peak_rss"] = max(seg["peak_rss"], peak)
+        for k, v in counters.items():
+            seg[k] += v - self._seg_c[k]
+        self._seg_t, self._seg_c = now, counters
+
+    def wrap(self, module, name):
+        fn = getattr(module, name)
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            if self._depth or threading.current_thread() is not threading.main_thread():
+                return fn(*args, **kwargs)
+            self._close()
+            self._current = name
+            self._depth += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                self._close()
+                self.segments[name]["calls"] += 1
+                self._current = self.resto
+
+        setattr(module, name, timed)
+
+    def report(self):
+        phases = [{"phase": name, **seg} for name, seg in self.segments.items()]
+        total = {"phase": "TOTAL", "calls": 1, "wall_s": self.wall,
+                 "peak_rss": max((p["peak_rss"] for p in phases), default=0)}
+        for key in phases[0] if phases else ():
+            if key not in total:
+                total[key] = sum(p[key] for p in phases)
+        return phases + [total]
+
+
+def install_standins(supabase, genai):
+    module = ModuleType("supabase")
+    module.create_client = lambda url=None, key=None, *args, **kwargs: supabase
+    module.Client = FakeSupabase
+    sys.modules["supabase"] = module
+    genai.install()
+
+
+def load_script(path):
+    """Importa un script suelto (nombre con dígitos) como módulo sin ejecutar main()."""
+    spec = importlib.util.spec_from_file_location(f"bench_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_scenario(name, workdir, options):
+    """Corre el escenario y devuelve el reporte por fase (lista de dicts)."""
+    scenario = SCENARIOS[name]
+    os.environ.update({
+        "SUPABASE_URL": "http://benchmark.invalid",
+        "SUPABASE_SERVICE_KEY": "benchmark",
+        "GEMINI_API_KEY": "benchmark",
+    })
+
+    supabase = FakeSupabase(FakeConfig(**options["supabase"]))
+    genai = FakeGenai(GenaiConfig(**options["genai"]), responder=scenario.responder)
+    corpus = Corpus(scale=options["scale"], seed=options["seed"], dims=options["genai"]["dimensions"])
+    if scenario.prepare:
+        scenario.prepare(corpus, workdir, supabase)
+
+    install_standins(supabase, genai)
+    log_path = workdir / "script.log"
+    with open(log_path, "w", encoding="utf-8") as log, redirect_stdout(log), redirect_stderr(log):
+        module = load_script(ROOT / scenario.script)
+        for attr, filename in scenario.paths.items():
+            setattr(module, attr, workdir / filename)
+
+        tracker = PhaseTracker(lambda: {**supabase.stats.snapshot(), **genai.stats.snapshot()}, scenario.resto)
+        for phase in scenario.phases:
+            tracker.wrap(module, phase)
+
+        sys.argv = [scenario.script] + [a.format(workdir=workdir) for a in scenario.argv]
+        tracker.start()
+        try:
+            module.main()
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                raise
+        finally:
+            tracker.stop()
+
+    return tracker.report()
@@ -0,0 +1,200 @@
+"""
+Benchmarks offline de los scripts de migración y sync.
+
+Cada escenario corre en un subproceso con un directorio temporal propio
+(datos sintéticos, cache de quipu/, checkpoints) contra el FakeSupabase y el
+stand-in de Gemini, y reporta por fase: tiempo, requests, errores
+inyectados, filas leídas/escritas, filas/s, bytes enviados, llamadas a
+Gemini y RSS pico.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.run                              # Todos los escenarios, escala 0.05
+    python -m benchmarks.run migrate sync --scale 0.2     # Algunos escenarios, más datos
+    python -m benchmarks.run --latency-ms 80 --error-rate 0.02
+    python -m benchmarks.run --json bench.json            # Guardar resultados
+    python -m benchmarks.run --baseline bench.json        # Comparar; sale con 1 si hay regresión
+
+Los tiempos incluyen la CPU del propio stand-in (serializar payloads para
+medir bytes, filtrar tablas en memoria): comparar corridas con las mismas
+opciones en la misma máquina.
+
+Requiere:
+    - pip install python-dotenv tqdm numpy pyarrow
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from benchmarks.scenarios import ROOT, SCENARIOS
+
+DEFAULT_SCALE = 0.05
+DEFAULT_TOLERANCE = 0.25
+
+
+def build_options(args):
+    return {
+        "scale": args.scale,
+        "seed": args.seed,
+        "supabase": {
+            "latency": args.latency_ms / 1000,
+            "jitter": args.jitter_ms / 1000,
+            "bandwidth": args.bandwidth_mbps * 1e6 / 8,
+            "error_rate": args.error_rate,
+            "seed": args.seed,
+        },
+        "genai": {
+            "latency": args.genai_latency_ms / 1000,
+            "per_item": args.genai_per_item_ms / 1000,
+            "jitter": args.genai_latency_ms / 3000,
+            "error_rate": args.genai_error_rate,
+            "dimensions": args.dims,
+            "seed": args.seed,
+        },
+    }
+
+
+def run_child(name, options, keep=False, timeout=None):
+    """Lanza el escenario en un subproceso aislado y devuelve su reporte."""
+    workdir = Path(tempfile.mkdtemp(prefix=f"quipu-bench-{name}-"))
+    out = workdir / "result.json"
+    env = dict(os.environ, QUIPU_CACHE_DIR=str(workdir / "cache"), PYTHONHASHSEED=str(options["seed"]))
+    cmd = [sys.executable, "-m", "benchmarks.run", "--child", name,
+           "--workdir", str(workdir), "--options", json.dumps(options), "--out", str(out)]
+    try:
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout)
+        if proc.returncode != 0 or not out.exists():
+            log = workdir / "script.log"
+            tail = log.read_text(encoding="utf-8")[-2000:] if log.exists() else ""
+            raise RuntimeError(f"{name} falló (código {proc.returncode}):\n{proc.stderr[-2000:]}{tail}")
+        with open(out, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        if keep:
+            print(f"  (datos y script.log en {workdir})")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_report(name, phases):
+    scenario = SCENARIOS[name]
+    print(f"\n== {name}: {Path(scenario.script).name} ==")
+    print(f"   {scenario.description}")
+    header = (f"{'fase':<22}{'llam.':>6}{'tiempo':>9}{'requests':>10}{'errores':>9}"
+              f"{'leídas':>9}{'escritas':>10}{'filas/s':>10}{'MB env.':>9}{'gemini':>8}{'RSS MB':>8}")
+    print(header)
+    print("-" * len(header))
+    for p in phases:
+        filas = p["rows_written"] or p["rows_read"]
+        rate = filas / p["wall_s"] if p["wall_s"] > 0 else 0
+        calls = str(p["calls"]) if p["calls"] else "-"
+        print(f"{p['phase'][:21]:<22}{calls:>6}{p['wall_s']:>8.2f}s{p['requests']:>10,}{p['errors']:>9,}"
+              f"{p['rows_read']:>9,}{p['rows_written']:>10,}{rate:>10,.0f}{p['bytes_sent'] / 1e6:>9.1f}"
+              f"{p['genai_requests']:>8,}{p['peak_rss'] / 1e6:>8.0f}")
+
+
+def compare(results, baseline, tolerance):
+    """Regresiones contra un JSON previo: tiempo total y cantidad de requests por escenario."""
+    if baseline.get("options") != results["options"]:
+        print("\n[WARN] El baseline se corrió con otras opciones; la comparación es orientativa")
+    regresiones = []
+    print(f"\nComparación contra baseline (tolerancia {tolerance:.0%}):")
+    for name, phases in results["scenarios"].items():
+        previo = baseline.get("scenarios", {}).get(name)
+        if not previo:
+            print(f"  {name}: sin baseline")
+            continue
+        actual, antes = phases[-1], previo[-1]
+        for key, label in (("wall_s", "tiempo"), ("requests", "requests"), ("genai_requests", "llamadas Gemini")):
+            if not antes.get(key):
+                continue
+            delta = actual[key] / antes[key] - 1
+            marca = "REGRESIÓN" if delta > tolerance else "ok"
+            print(f"  {name:<18} {label:<16} {antes[key]:>10,.2f} → {actual[key]:>10,.2f} ({delta:+.0%}) {marca}")
+            if delta > tolerance:
+                regresiones.append(f"{name}.{key}")
+    return regresiones
+
+
+def child_main(args):
+    from benchmarks.harness import run_scenario
+
+    phases = run_scenario(args.child, Path(args.workdir), json.loads(args.options))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(phases, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline de los scripts de migración y sync")
+    parser.add_argument("scenarios", nargs="*", metavar="escenario",
+                        help=f"Escenarios a correr (default: todos): {', '.join(SCENARIOS)}")
+    parser.add_argument("--scale", type=float, default=DEFAULT_SCALE,
+                        help=f"Fracción del volumen de producción (default: {DEFAULT_SCALE})")
+    parser.add_argument("--dims", type=int, default=1536, help="Dimensiones de los embeddings (default: 1536)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de datos, latencias y errores")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latencia por request a Supabase (default: 20)")
+    parser.add_argument("--jitter-ms", type=float, default=10, help="Jitter máximo por request (default: 10)")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="Ancho de banda de subida, 0 = sin límite")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de error por request a Supabase")
+    parser.add_argument("--genai-latency-ms", type=float, default=150, help="Latencia por request a Gemini (default: 150)")
+    parser.add_argument("--genai-per-item-ms", type=float, default=2, help="Latencia extra por texto embebido (default: 2)")
+    parser.add_argument("--genai-error-rate", type=float, default=0.0, help="Probabilidad de error por request a Gemini")
+    parser.add_argument("--json", type=Path, help="Guardar los resultados en este archivo")
+    parser.add_argument("--baseline", type=Path, help="JSON de una corrida previa para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Empeoramiento permitido vs baseline (default: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--timeout", type=float, help="Segundos máximos por escenario")
+    parser.add_argument("--keep", action="store_true", help="No borrar el directorio temporal (datos y script.log)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--options", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args)
+        return
+
+    desconocidos = [n for n in args.scenarios if n not in SCENARIOS]
+    if desconocidos:
+        parser.error(f"escenarios desconocidos: {', '.join(desconocidos)} (disponibles: {', '.join(SCENARIOS)})")
+
+    options = build_options(args)
+    nombres = args.scenarios or list(SCENARIOS)
+    print(f"Benchmarks: escala {args.scale}, {args.dims} dims, Supabase {args.latency_ms:.0f}ms "
+          f"(error {args.error_rate:.1%}), Gemini {args.genai_latency_ms:.0f}ms (error {args.genai_error_rate:.1%})")
+
+    results = {"options": options, "scenarios": {}}
+    fallidos = []
+    for name in nombres:
+        try:
+            phases = run_child(name, options, keep=args.keep, timeout=args.timeout)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"\n[ERROR] {e}")
+            fallidos.append(name)
+            continue
+        results["scenarios"][name] = phases
+        print_report(name, phases)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados en {args.json}")
+
+    regresiones = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regresiones = compare(results, json.load(f), args.tolerance)
+
+    if fallidos or regresiones:
+        print(f"\nFallidos: {fallidos or '-'} | Regresiones: {regresiones or '-'}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Escenarios: qué script corre, con qué argumentos, sobre qué datos y qué
+funciones del script cuentan como fases.
+
+Las fases son funciones de nivel módulo que main() llama en secuencia; el
+tiempo fuera de ellas se reporta como `resto` (p.ej. el loop de clasificación
+de 004, que vive dentro de main()).
+"""
+
+import json
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+CATEGORIAS_JSON = ROOT / "docs" / "categorias.json"
+
+
+@dataclass
+class Scenario:
+    name: str
+    script: str                          # relativo a la raíz del repo
+    description: str
+    argv: tuple = ()                     # "{workdir}" se reemplaza por el directorio temporal
+    phases: tuple = ()
+    resto: str = "main"
+    paths: dict = field(default_factory=dict)   # constante del módulo → archivo en el workdir
+    prepare: Optional[Callable] = None          # (corpus, workdir, supabase) → None
+    responder: Optional[Callable] = None        # respuesta de generate_content
+
+
+def _prepare_migrate(corpus, workdir, supabase):
+    corpus.write_promesas_db(workdir / "promesas_v2.db")
+    corpus.write_candidatos_json(workdir / "candidatos_jne_2026.json")
+    corpus.write_hojas_vida_json(workdir / "hojas_vida_completas.json")
+
+
+def _prepare_hojas_vida(corpus, workdir, supabase):
+    corpus.write_hojas_vida_json(workdir / "hojas_vida.json")
+    supabase.seed("quipu_candidatos", corpus.candidatos)
+
+
+def _prepare_reclassify(corpus, workdir, supabase):
+    supabase.seed("quipu_promesas_planes", corpus.promesas_planes_rows())
+
+
+def _prepare_sync(corpus, workdir, supabase):
+    temas = corpus.temas_rows()
+    supabase.seed("quipu_candidatos", corpus.candidatos)
+    supabase.seed("quipu_partidos", corpus.partidos_rows())
+    supabase.seed("quipu_temas", temas)
+    supabase.seed("quipu_stakeholder_aliases", corpus.aliases_rows())
+    supabase.seed("QUIPU_MASTER", corpus.master_rows(temas))
+
+
+def _categoria_responder():
+    """Una categoría válida de docs/categorias.json, determinista por prompt."""
+    with open(CATEGORIAS_JSON, "r", encoding="utf-8") as f:
+        categorias = json.load(f)
+
+    def responder(prompt):
+        h = int.from_bytes(hashlib.sha1(prompt.encode("utf-8")).digest()[:4], "little")
+        return categorias[h % len(categorias)]
+    return responder
+
+
+SCENARIOS = {s.name: s for s in (
+    Scenario(
+        name="migrate",
+        script="migrations/002_migrate_to_supabase.py",
+        description="SQLite + JSON → partidos, promesas (con embeddings), candidatos, hojas de vida",
+        phases=("migrate_partidos", "migrate_promesas", "migrate_candidatos", "migrate_hojas_vida",
+                "refresh_after_run"),
+        resto="setup",
+        paths={
+            "SQLITE_DB": "promesas_v2.db",
+            "CANDIDATOS_JSON": "candidatos_jne_2026.json",
+            "HOJAS_VIDA_JSON": "hojas_vida_completas.json",
+            "EMBEDDINGS_NPY": "promesas_embeddings.npy",   # No se genera: camino JSON
+        },
+        prepare=_prepare_migrate,
+    ),
+    Scenario(
+        name="hojas_vida",
+        script="migrations/007_update_hojas_vida.py",
+        description="Upsert de hojas de vida con todas las hojas en memoria",
+        argv=("--file", "{workdir}/hojas_vida.json"),
+        phases=("load_candidato_map", "run_full"),
+        resto="verificacion",
+        prepare=_prepare_hojas_vida,
+    ),
+    Scenario(
+        name="hojas_vida_stream",
+        script="migrations/007_update_hojas_vida.py",
+        description="Upsert de hojas de vida leídas de a batches (--stream)",
+        argv=("--file", "{workdir}/hojas_vida.json", "--stream"),
+        phases=("load_candidato_map", "run_streaming"),
+        resto="verificacion",
+        prepare=_prepare_hojas_vida,
+    ),
+    Scenario(
+        name="reclassify",
+        script="migrations/004_reclassify_categories_gemini.py",
+        description="Clasificación de promesas con Gemini y escritura por RPC",
+        argv=("--reset",),
+        phases=("init_clients", "count_promesas", "count_remaining", "refresh_after_run"),
+        resto="clasificacion",
+        paths={"CHECKPOINT_PATH": "reclassify_checkpoint.json"},
+        prepare=_prepare_reclassify,
+        responder=_categoria_responder(),
+    ),
+    Scenario(
+        name="sync",
+        script="fase3/scripts/sync_master_declaraciones.py",
+        description="QUIPU_MASTER → quipu_declaraciones con cola de embeddings",
+        argv=("--full", "--rpm", "0"),
+        phases=("cargar_indices", "refresh_after_run"),
+        resto="sync",
+        paths={"STATE_PATH": "sync_master_state.json"},
+        prepare=_prepare_sync,
+    ),
+)}
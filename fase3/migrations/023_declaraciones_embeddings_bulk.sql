@@ -0,0 +1,28 @@
+-- =====================================================
+-- FASE 3: Escritura masiva de embeddings de declaraciones
+-- sync_master_declaraciones.py inserta declaraciones sin vector y una cola
+-- en segundo plano completa los embeddings por lotes con esta función.
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION quipu_set_declaracion_embeddings(
+    p_ids INTEGER[],
+    p_embeddings TEXT[]               -- '[0.1, -0.2, ...]' (formato de texto de pgvector)
+)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH actualizadas AS (
+        UPDATE quipu_declaraciones d
+        SET embedding = u.embedding::vector
+        FROM unnest(p_ids, p_embeddings) AS u(id, embedding)
+        WHERE d.id = u.id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::int FROM actualizadas;
+$$;
+
+-- Solo el service role (scripts de sync) escribe embeddings
+REVOKE EXECUTE ON FUNCTION quipu_set_declaracion_embeddings(INTEGER[], TEXT[]) FROM PUBLIC, anon, authenticated;
+
+-- Backfill: ubicar rápido las declaraciones sin vector
+CREATE INDEX IF NOT EXISTS idx_decl_sin_embedding ON quipu_declaraciones(id) WHERE embedding IS NULL;
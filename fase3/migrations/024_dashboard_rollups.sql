@@ -0,0 +1,97 @@
+-- =====================================================
+-- FASE 3: Rollups precalculados para el Dashboard
+-- Los llena quipu/rollups.py (fase3/scripts/refresh_rollups.py), que corre
+-- al final de 002_migrate_to_supabase.py, 004_reclassify_categories_gemini.py
+-- y sync_master_declaraciones.py. El frontend lee estas tablas en vez de
+-- paginar quipu_promesas_planes / QUIPU_MASTER y contar en el navegador.
+--
+-- Las claves siguen normalizeKey() del frontend: minúsculas, sin tildes,
+-- espacios → '_'. Una clave que desaparece queda con total = 0.
+-- =====================================================
+
+-- Promesas por categoría
+CREATE TABLE IF NOT EXISTS quipu_rollup_categorias (
+    categoria_key VARCHAR(100) PRIMARY KEY,
+    categoria VARCHAR(100),           -- Label original (primera variante vista)
+    total INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Promesas por partido × categoría
+CREATE TABLE IF NOT EXISTS quipu_rollup_partido_categoria (
+    partido_id INTEGER NOT NULL REFERENCES quipu_partidos(id) ON DELETE CASCADE,
+    categoria_key VARCHAR(100) NOT NULL,
+    categoria VARCHAR(100),
+    total INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (partido_id, categoria_key)
+);
+
+-- Declaraciones (QUIPU_MASTER, type = 'declaration') por tema
+CREATE TABLE IF NOT EXISTS quipu_rollup_temas (
+    tema_key VARCHAR(200) PRIMARY KEY,
+    tema VARCHAR(200),
+    total INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Declaraciones por tema × candidato (stakeholder resuelto con alias/nombre)
+CREATE TABLE IF NOT EXISTS quipu_rollup_tema_candidato (
+    tema_key VARCHAR(200) NOT NULL,
+    candidato_id INTEGER NOT NULL DEFAULT 0,  -- 0 = stakeholder sin candidato
+    tema VARCHAR(200),
+    total INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (tema_key, candidato_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rollup_tema_candidato ON quipu_rollup_tema_candidato(candidato_id);
+
+-- Versión y huella de las fuentes de cada grupo de rollups
+CREATE TABLE IF NOT EXISTS quipu_rollup_meta (
+    nombre VARCHAR(50) PRIMARY KEY,   -- 'promesas', 'declaraciones'
+    version INTEGER NOT NULL DEFAULT 0,
+    fingerprint JSONB,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- =====================================================
+-- RLS
+-- =====================================================
+
+-- Promesas: públicas (vienen de planes de gobierno públicos)
+ALTER TABLE quipu_rollup_categorias ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Rollup categorías es público"
+ON quipu_rollup_categorias FOR SELECT
+USING (true);
+
+ALTER TABLE quipu_rollup_partido_categoria ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Rollup partido×categoría es público"
+ON quipu_rollup_partido_categoria FOR SELECT
+USING (true);
+
+ALTER TABLE quipu_rollup_meta ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Rollup meta es público"
+ON quipu_rollup_meta FOR SELECT
+USING (true);
+
+-- Declaraciones: el total global solo para superadmin
+ALTER TABLE quipu_rollup_temas ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Superadmin ve rollup de temas"
+ON quipu_rollup_temas FOR SELECT
+USING (get_my_rol() = 'superadmin');
+
+-- Por candidato: cada cliente ve solo sus candidatos
+ALTER TABLE quipu_rollup_tema_candidato ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Cliente ve rollup de sus candidatos"
+ON quipu_rollup_tema_candidato FOR SELECT
+USING (
+    get_my_rol() = 'superadmin'
+    OR candidato_id IN (
+        SELECT candidato_id FROM quipu_cliente_candidatos
+        WHERE cliente_id = get_current_cliente_id()
+    )
+);
+
+GRANT SELECT ON quipu_rollup_categorias, quipu_rollup_partido_categoria, quipu_rollup_temas,
+    quipu_rollup_tema_candidato, quipu_rollup_meta TO authenticated;
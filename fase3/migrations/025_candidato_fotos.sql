@@ -0,0 +1,33 @@
+-- =====================================================
+-- FASE 3: Miniaturas WebP de fotos de candidatos
+-- migrations/013_process_candidato_fotos.py sube las variantes al bucket
+-- público candidatos-fotos (<key>/s64.webp, s128, s192, w320, w640) y guarda
+-- la key (hash del contenido de la foto) en quipu_candidatos.foto_local.
+-- El frontend arma el srcset desde foto_local y usa foto_url (JNE) solo si
+-- la foto todavía no fue procesada.
+-- =====================================================
+
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('candidatos-fotos', 'candidatos-fotos', true)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION quipu_set_candidato_fotos(
+    p_ids INTEGER[],
+    p_keys TEXT[]
+)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH actualizadas AS (
+        UPDATE quipu_candidatos c
+        SET foto_local = u.key
+        FROM unnest(p_ids, p_keys) AS u(id, key)
+        WHERE c.id = u.id
+          AND c.foto_local IS DISTINCT FROM u.key
+        RETURNING 1
+    )
+    SELECT COUNT(*)::int FROM actualizadas;
+$$;
+
+-- Solo el service role (script de fotos) escribe
+REVOKE EXECUTE ON FUNCTION quipu_set_candidato_fotos(INTEGER[], TEXT[]) FROM PUBLIC, anon, authenticated;
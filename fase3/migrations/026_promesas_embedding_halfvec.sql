@@ -0,0 +1,60 @@
+-- =====================================================
+-- FASE 3: Índice HNSW halfvec para la búsqueda de promesas
+-- Requiere pgvector >= 0.7 (tipo halfvec).
+--
+-- La columna sigue siendo vector(1536): el índice es sobre la expresión
+-- embedding::halfvec(1536), así que guarda float16 y ocupa la mitad que
+-- idx_quipu_promesas_planes_embedding. quipu_buscar_promesas_similares_half
+-- tiene la misma firma y salida que quipu_buscar_promesas_similares y ordena
+-- por esa misma expresión para que el planner use el índice.
+--
+-- `python -m quipu.compaction` mide el recall@k de halfvec (y de los modos
+-- truncados) contra float32 sobre el corpus real. Si mrl768/halfvec768
+-- mantiene el recall, la misma receta con
+-- (subvector(embedding, 1, 768)::halfvec(768)) deja el índice en un cuarto.
+-- Una vez que el frontend use esta función se puede borrar el índice
+-- vector_cosine_ops original.
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_quipu_promesas_planes_embedding_half ON quipu_promesas_planes
+    USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops);
+
+CREATE OR REPLACE FUNCTION quipu_buscar_promesas_similares_half(
+    query_embedding vector(1536),
+    match_threshold float DEFAULT 0.7,
+    match_count int DEFAULT 10,
+    filter_categoria text DEFAULT NULL,
+    filter_partido_id int DEFAULT NULL
+)
+RETURNS TABLE (
+    id int,
+    texto_original text,
+    resumen varchar,
+    categoria varchar,
+    partido varchar,
+    candidato varchar,
+    similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        p.id,
+        p.texto_original,
+        p.resumen,
+        p.categoria,
+        pp.nombre_oficial as partido,
+        pp.candidato_presidencial as candidato,
+        1 - (p.embedding::halfvec(1536) <=> query_embedding::halfvec(1536)) as similarity
+    FROM quipu_promesas_planes p
+    JOIN quipu_partidos pp ON p.partido_id = pp.id
+    WHERE
+        p.embedding IS NOT NULL
+        AND 1 - (p.embedding::halfvec(1536) <=> query_embedding::halfvec(1536)) > match_threshold
+        AND (filter_categoria IS NULL OR p.categoria = filter_categoria)
+        AND (filter_partido_id IS NULL OR p.partido_id = filter_partido_id)
+    ORDER BY p.embedding::halfvec(1536) <=> query_embedding::halfvec(1536)
+    LIMIT match_count;
+END;
+$$;
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Llena quipu_promesa_declaracion en bloque.
+
+Equivale a llamar buscar_promesas_para_declaracion para cada declaración,
+pero sin un RPC por fila. Las promesas y sus embeddings salen de
+promesas_v2.db (los ids coinciden con Supabase tras 002_migrate_to_supabase.py).
+Las declaraciones con embedding se leen de Supabase por keyset y el matching
+corre en memoria (quipu/coherencia.py). Los pares con similitud > threshold
+se upsertean con on_conflict (promesa_id, declaracion_id); las columnas de
+análisis (coherencia, verificado, notas) no se tocan.
+
+Incremental: .match_coherencia_state.json guarda el último id de declaración
+revisado y los ids que todavía no tenían embedding (la cola de embeddings
+del sync los completa después); la siguiente corrida procesa solo ids
+nuevos más esos pendientes. Usar --full tras migrar promesas nuevas.
+
+Uso:
+    python match_coherencia.py                  # Solo declaraciones nuevas
+    python match_coherencia.py --full           # Recalcula todo
+    python match_coherencia.py --dry-run        # Solo cuenta pares
+    python match_coherencia.py --threshold 0.75 --limit 10
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quipu import metrics
+from quipu.bulk_upsert import BulkUpserter
+from quipu.coherencia import match_declaraciones, parse_vector, partido_de
+from quipu.semantic_search import DB_PATH, PromesaSearchIndex
+from quipu.snapshots import load_snapshot
+
+load_dotenv()
+
+supabase: Client = metrics.instrument_supabase(create_client(
+    os.getenv("SUPABASE_URL"),
+    os.getenv("SUPABASE_SERVICE_KEY")
+))
+
+STATE_PATH = Path(__file__).parent / ".match_coherencia_state.json"
+PAGE_SIZE = 200  # Cada embedding viaja como texto (~20 KB por fila)
+
+
+def load_state():
+    if STATE_PATH.exists():
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    with open(STATE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def fetch_declaraciones(desde_id=0, pendientes=(), page_size=PAGE_SIZE):
+    """Páginas de declaraciones con id > desde_id más las de `pendientes`, paginadas por id."""
+    columnas = 'id, candidato_id, embedding'
+
+    last_id = desde_id
+    while True:
+        page = (supabase.table('quipu_declaraciones').select(columnas)
+                .gt('id', last_id).order('id').limit(page_size).execute()).data
+        yield page
+        if len(page) < page_size:
+            break
+        last_id = page[-1]['id']
+
+    pendientes = sorted(pendientes)
+    for i in range(0, len(pendientes), page_size):
+        yield (supabase.table('quipu_declaraciones').select(columnas)
+               .in_('id', pendientes[i:i + page_size]).execute()).data
+
+
+def leer_declaraciones(paginas, dim):
+    """
+    Parsea cada página a float32 apenas llega y descarta el texto del
+    embedding, así la memoria no crece con el JSON de toda la tabla.
+    Devuelve (ids, candidato_ids, matrix) de las que tienen embedding de
+    dimensión `dim`, los ids sin embedding y el mayor id visto.
+    """
+    ids, candidato_ids, bloques, sin_embedding = [], [], [], []
+    max_id = 0
+    for page in paginas:
+        vectores = []
+        for f in page:
+            max_id = max(max_id, f['id'])
+            vector = parse_vector(f.get('embedding'))
+            if vector is None or len(vector) != dim:
+                sin_embedding.append(f['id'])
+                continue
+            ids.append(f['id'])
+            candidato_ids.append(f.get('candidato_id'))
+            vectores.append(vector)
+        if vectores:
+            bloques.append(np.asarray(vectores, dtype=np.float32))
+    matrix = np.concatenate(bloques) if bloques else np.empty((0, dim), dtype=np.float32)
+    return np.asarray(ids, dtype=np.int64), candidato_ids, matrix, sin_embedding, max_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matching batch declaraciones → promesas")
+    parser.add_argument("--full", action="store_true", help="Ignorar el estado y revisar todas las declaraciones")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Similitud mínima, estricta (default: 0.7)")
+    parser.add_argument("--limit", type=int, default=5, help="Promesas por declaración (default: 5)")
+    parser.add_argument("--block-size", type=int, default=1024, help="Declaraciones por bloque de matmul")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Base SQLite de promesas")
+    parser.add_argument("--dry-run", action="store_true", help="No escribir ni avanzar el estado")
+    args = parser.parse_args()
+    metrics.start_run(Path(__file__).stem)
+
+    print("MATCH: quipu_declaraciones → quipu_promesa_declaracion\n")
+
+    state = {} if args.full else load_state()
+    desde_id = state.get('last_declaracion_id', 0)
+    pendientes = state.get('sin_embedding', [])
+
+    start = time.perf_counter()
+    with metrics.phase("indice"):
+        conn = sqlite3.connect(args.db)
+        index = PromesaSearchIndex.from_sqlite(conn)
+        conn.close()
+    print(f"Promesas: {len(index):,} x {index.matrix.shape[1]} ({time.perf_counter() - start:.1f}s)")
+
+    with metrics.phase("lectura"):
+        candidato_partidos = {c['id']: c.get('partido_id') for c in load_snapshot(supabase, 'quipu_candidatos').rows}
+        start = time.perf_counter()
+        ids, candidato_ids, matrix, sin_embedding, max_id = leer_declaraciones(
+            fetch_declaraciones(desde_id, pendientes), index.matrix.shape[1])
+    print(f"Declaraciones: {len(ids):,} con embedding, {len(sin_embedding):,} sin "
+          f"(id > {desde_id}, {len(pendientes):,} pendientes) ({time.perf_counter() - start:.1f}s)")
+
+    pares = []
+    if len(ids):
+        start = time.perf_counter()
+        grupos = [partido_de(c, candidato_partidos) for c in candidato_ids]
+        with metrics.phase("matching"):
+            pares = list(match_declaraciones(index, ids, matrix, grupos,
+                                             args.threshold, args.limit, args.block_size))
+        print(f"Matching: {len(pares):,} pares > {args.threshold} en {time.perf_counter() - start:.2f}s")
+
+    if args.dry_run:
+        return
+
+    if pares:
+        with metrics.phase("upsert"), BulkUpserter(supabase, 'quipu_promesa_declaracion',
+                          on_conflict='promesa_id,declaracion_id',
+                          total=len(pares)) as upserter:
+            for promesa_id, declaracion_id, similarity in pares:
+                upserter.submit({
+                    'promesa_id': promesa_id,
+                    'declaracion_id': declaracion_id,
+                    'similarity': similarity,
+                })
+        print(f"✓ {upserter.stats.summary()}")
+
+    state['last_declaracion_id'] = max(desde_id, max_id)
+    state['sin_embedding'] = sorted(sin_embedding)
+    save_state(state)
+
+
+if __name__ == "__main__":
+    main()
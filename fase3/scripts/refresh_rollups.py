@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Recalcula los rollups del Dashboard (fase3/migrations/024_dashboard_rollups.sql).
+
+Corre solo al final de las migraciones y del sync; este script sirve para
+lanzarlo a mano. Un grupo cuya huella de fuentes no cambió se salta.
+
+Uso:
+    python refresh_rollups.py                     # Todos los grupos con cambios
+    python refresh_rollups.py --only promesas     # Solo un grupo
+    python refresh_rollups.py --force             # Recalcular aunque la huella no cambie
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quipu import metrics
+from quipu.rollups import GRUPOS, refresh_rollups
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula los rollups del Dashboard")
+    parser.add_argument("--only", choices=sorted(GRUPOS), action="append", help="Grupo a recalcular (repetible)")
+    parser.add_argument("--force", action="store_true", help="Ignorar la huella de fuentes")
+    args = parser.parse_args()
+    metrics.start_run(Path(__file__).stem)
+
+    supabase = metrics.instrument_supabase(create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY")))
+
+    print("ROLLUPS: Dashboard\n")
+    refresh_rollups(supabase, grupos=args.only or tuple(GRUPOS), force=args.force)
+
+
+if __name__ == "__main__":
+    main()
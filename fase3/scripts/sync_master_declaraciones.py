@@ -1,73 +1,230 @@
 #!/usr/bin/env python3
 """
 Sincroniza QUIPU_MASTER → quipu_declaraciones
+
+Incremental: guarda una marca de agua (la fecha más nueva sincronizada) en
+.sync_master_state.json y en la siguiente corrida solo lee entradas con
+fecha >= marca - lookback o sin fecha, paginando por id (keyset). Las
+declaraciones ya existentes se detectan con una consulta por página, no una
+por interacción.
+
+La marca es la fecha de la entrada, no la de ingesta (QUIPU_MASTER no tiene
+una columna de ingesta ordenable: el id es UUID). Una entrada que llega con
+una fecha anterior a marca - lookback no se ve en el incremental: para
+recuperarla, correr --full (las declaraciones ya insertadas se saltean) o
+subir --lookback-days.
+
+Los embeddings no bloquean la ingesta: cada declaración se inserta sin vector
+y una cola en segundo plano (quipu/embedding_queue.py) los genera por lotes y
+los escribe en bloque con quipu_set_declaracion_embeddings
+(fase3/migrations/023_declaraciones_embeddings_bulk.sql).
+
+Las entradas de cada página se procesan en paralelo (--workers) bajo un
+rate limit global de requests de escritura (--rpm). Al terminar cada página
+se guarda un checkpoint con el cursor (id) en el mismo archivo de estado; si
+la corrida se corta, la siguiente continúa desde la última página completa.
+Las entradas con algún insert fallido se guardan en `pendientes` y se
+vuelven a procesar al inicio de la corrida siguiente (las declaraciones que
+sí entraron se saltean), así el cursor y la marca pueden avanzar sin
+perderlas.
+
+Uso:
+    python sync_master_declaraciones.py                    # Incremental desde la marca de agua
+    python sync_master_declaraciones.py --full             # Recorre todo QUIPU_MASTER (recupera entradas retrofechadas)
+    python sync_master_declaraciones.py --lookback-days 3  # Re-revisa los últimos 3 días
+    python sync_master_declaraciones.py --workers 16 --rpm 1200  # Más paralelismo
+    python sync_master_declaraciones.py --reset            # Descarta el checkpoint de una corrida cortada
+    python sync_master_declaraciones.py --backfill-embeddings  # Solo completa embeddings NULL
 """
 import os
+import sys
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
 from dotenv import load_dotenv
 from supabase import create_client, Client
-import google.generativeai as genai
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from quipu import metrics
+from quipu.candidato_resolver import CandidatoResolver
+from quipu.embedding_queue import EmbeddingQueue
+from quipu.embeddings import EmbeddingService, create_genai_client
+from quipu.rate_limit import RateLimiter
+from quipu.rollups import refresh_after_run
+from quipu.tema_matcher import TemaMatcher
 
 load_dotenv()
 
-supabase: Client = create_client(
+supabase: Client = metrics.instrument_supabase(create_client(
     os.getenv("SUPABASE_URL"),
     os.getenv("SUPABASE_SERVICE_KEY")
-)
+))
+
+STATE_PATH = Path(__file__).parent / ".sync_master_state.json"
+PAGE_SIZE = 100
+WORKERS = 8
+REQUESTS_PER_MINUTE = 1200  # Inserts a Supabase, compartido entre workers
+MIN_CONFIDENCE = 0.5  # Por debajo se guarda la declaración sin candidato_id
+
 
-if os.getenv("GEMINI_API_KEY"):
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Se construyen una vez por corrida (ver quipu/tema_matcher.py y quipu/candidato_resolver.py).
+# Los temas se releen siempre: editar keywords no mueve count ni max(id), así
+# que el snapshot en disco podría seguir pareciendo al día.
+_tema_matcher = None
+_resolver = None
 
 
-def normalizar(texto):
-    import unicodedata
-    texto = unicodedata.normalize('NFD', texto)
-    return ''.join(c for c in texto if unicodedata.category(c) != 'Mn').lower().strip()
+def cargar_indices():
+    """Construye matcher y resolver antes de lanzar los workers."""
+    global _tema_matcher, _resolver
+    if _tema_matcher is None:
+        _tema_matcher = TemaMatcher.from_supabase(supabase, refresh=True)
+    if _resolver is None:
+        _resolver = CandidatoResolver.from_supabase(supabase)
 
 
 def buscar_candidato(stakeholder):
+    global _resolver
     if not stakeholder:
         return None
-    apellido = stakeholder.strip().split()[-1]
-    r = supabase.table('quipu_candidatos').select('id').ilike('nombre_completo', f'%{apellido}%').limit(1).execute()
-    return r.data[0]['id'] if r.data else None
+    if _resolver is None:
+        _resolver = CandidatoResolver.from_supabase(supabase)
+    match = _resolver.resolve(stakeholder)
+    return match.candidato_id if match.confidence >= MIN_CONFIDENCE else None
 
 
 def buscar_tema(tema_raw):
+    global _tema_matcher
     if not tema_raw:
         return None
-    temas = supabase.table('quipu_temas').select('id, nombre, keywords').execute()
-    tema_norm = normalizar(tema_raw)
-    for t in temas.data:
-        if normalizar(t['nombre']) == tema_norm:
-            return t['id']
-        for kw in (t.get('keywords') or []):
-            if normalizar(kw) in tema_norm:
-                return t['id']
-    return None
-
-
-def generar_embedding(texto):
-    if not os.getenv("GEMINI_API_KEY") or not texto:
+    if _tema_matcher is None:
+        _tema_matcher = TemaMatcher.from_supabase(supabase, refresh=True)
+    return _tema_matcher.match(tema_raw)
+
+
+def escribir_embeddings(pares):
+    """Escribe [(declaracion_id, vector), ...] en un solo request."""
+    supabase.rpc('quipu_set_declaracion_embeddings', {
+        'p_ids': [declaracion_id for declaracion_id, _ in pares],
+        'p_embeddings': [json.dumps(vector) for _, vector in pares],
+    }).execute()
+
+
+def crear_cola_embeddings():
+    """Cola de embeddings, o None si no hay API key de Gemini."""
+    if not (os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")):
+        print("[WARN] Sin GEMINI_API_KEY: las declaraciones quedan sin embedding (usar --backfill-embeddings luego)\n")
+        return None
+    service = EmbeddingService(create_genai_client(), task_type="RETRIEVAL_DOCUMENT")
+    return EmbeddingQueue(service, escribir_embeddings)
+
+
+def backfill_embeddings(cola, page_size=1000):
+    """Encola todas las declaraciones con embedding NULL."""
+    last_id = 0
+    total = 0
+    while True:
+        rows = (supabase.table('quipu_declaraciones')
+                .select('id, contenido')
+                .is_('embedding', 'null')
+                .gt('id', last_id)
+                .order('id')
+                .limit(page_size)
+                .execute()).data
+        for r in rows:
+            if r.get('contenido'):
+                cola.submit(r['id'], r['contenido'])
+                total += 1
+        if len(rows) < page_size:
+            return total
+        last_id = rows[-1]['id']
+
+
+def load_state():
+    if STATE_PATH.exists():
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    with open(STATE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def parse_fecha(fecha):
+    """Fecha de QUIPU_MASTER (date o timestamp ISO) como date, o None."""
+    if not fecha:
         return None
     try:
-        r = genai.embed_content(model="models/text-embedding-004", content=texto, task_type="retrieval_document")
-        return r['embedding']
-    except:
+        return datetime.fromisoformat(str(fecha)[:10]).date()
+    except ValueError:
         return None
 
 
-def sync_entry(entry):
+def fetch_master_pages(fecha_desde=None, page_size=PAGE_SIZE, last_id=None):
+    """Páginas de QUIPU_MASTER con fecha >= fecha_desde o sin fecha, paginadas por id > último."""
+    while True:
+        query = supabase.table('QUIPU_MASTER').select('*').order('id').limit(page_size)
+        if fecha_desde:
+            # Las entradas sin fecha nunca quedan detrás de la marca: se revisan siempre
+            query = query.or_(f"fecha.is.null,fecha.gte.{fecha_desde.isoformat()}")
+        if last_id:
+            query = query.gt('id', last_id)
+        page = query.execute().data
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]['id']
+
+
+def fetch_master_entries(ids, page_size=PAGE_SIZE):
+    """Páginas de QUIPU_MASTER con esos ids (entradas pendientes de una corrida anterior)."""
+    ids = list(ids)
+    for i in range(0, len(ids), page_size):
+        page = supabase.table('QUIPU_MASTER').select('*').in_('id', ids[i:i + page_size]).execute().data
+        if page:
+            yield page
+
+
+def existing_keys(master_ids, page_size=1000):
+    """(master_id, indice_interaccion) ya insertados para un conjunto de entradas."""
+    keys = set()
+    if not master_ids:
+        return keys
+    last_id = 0
+    while True:
+        rows = (supabase.table('quipu_declaraciones')
+                .select('id, master_id, indice_interaccion')
+                .in_('master_id', list(master_ids))
+                .gt('id', last_id)
+                .order('id')
+                .limit(page_size)
+                .execute()).data
+        keys.update((str(r['master_id']), r['indice_interaccion']) for r in rows)
+        if len(rows) < page_size:
+            return keys
+        last_id = rows[-1]['id']
+
+
+def sync_entry(entry, existentes, cola=None, limiter=None):
+    """Inserta las interacciones nuevas de una entrada. Devuelve (insertadas, fallidas)."""
     master_id = entry['id']
     interacciones = entry.get('interacciones') or []
     count = 0
+    fallidas = 0
 
     for idx, inter in enumerate(interacciones):
         contenido = inter.get('content', '')
         if not contenido:
             continue
 
-        exists = supabase.table('quipu_declaraciones').select('id').eq('master_id', master_id).eq('indice_interaccion', idx).execute()
-        if exists.data:
+        if (str(master_id), idx) in existentes:
             continue
 
         data = {
@@ -86,28 +243,156 @@ def sync_entry(entry):
             'resumen_master': entry.get('resumen'),
         }
 
-        emb = generar_embedding(contenido)
-        if emb:
-            data['embedding'] = emb
-
+        if limiter is not None:
+            limiter.acquire()
         try:
-            supabase.table('quipu_declaraciones').insert(data).execute()
+            result = supabase.table('quipu_declaraciones').insert(data).execute()
             count += 1
+            if cola is not None and result.data:
+                cola.submit(result.data[0]['id'], contenido)
             print(f"  + {inter.get('stakeholder', 'N/A')[:30]}")
         except Exception as e:
+            fallidas += 1
             print(f"  ! Error: {e}")
 
-    return count
+    return count, fallidas
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Sincroniza QUIPU_MASTER → quipu_declaraciones")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignorar la marca de agua y recorrer todo (recupera entradas con fecha anterior al lookback)")
+    parser.add_argument("--lookback-days", type=int, default=1,
+                        help="Días antes de la marca de agua que se vuelven a revisar (default: 1)")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help=f"Entradas por página (default: {PAGE_SIZE})")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help=f"Entradas procesadas en paralelo (default: {WORKERS})")
+    parser.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE,
+                        help=f"Máximo de inserts por minuto entre todos los workers, 0 = sin límite (default: {REQUESTS_PER_MINUTE})")
+    parser.add_argument("--reset", action="store_true", help="Descartar el checkpoint de una corrida incompleta")
+    parser.add_argument("--backfill-embeddings", action="store_true",
+                        help="No sincronizar: solo generar embeddings de declaraciones con embedding NULL")
+    args = parser.parse_args()
+    metrics.start_run(Path(__file__).stem)
+
+    cola = crear_cola_embeddings()
+
+    if args.backfill_embeddings:
+        if cola is None:
+            return
+        print("BACKFILL: embeddings de quipu_declaraciones\n")
+        with metrics.phase("backfill"):
+            print(f"Encoladas: {backfill_embeddings(cola)}")
+            print(f"Embeddings: {cola.close().summary()}")
+        return
+
     print("SYNC: QUIPU_MASTER → quipu_declaraciones\n")
-    entries = supabase.table('QUIPU_MASTER').select('*').order('fecha', desc=True).execute()
-    total = 0
-    for i, entry in enumerate(entries.data, 1):
-        print(f"[{i}/{len(entries.data)}] {entry.get('canal', 'N/A')}")
-        total += sync_entry(entry)
-    print(f"\nTotal: {total} declaraciones insertadas")
+
+    state = {} if args.full else load_state()
+    if args.reset:
+        state.pop('en_curso', None)
+    marca = parse_fecha(state.get('fecha_max'))
+    # master_id de entradas con inserts fallidos, a reintentar
+    pendientes = set(state.get('pendientes', []))
+
+    en_curso = state.get('en_curso')
+    if en_curso:
+        # Continuar una corrida cortada desde la última página completa
+        fecha_desde = parse_fecha(en_curso.get('fecha_desde'))
+        last_id = en_curso['last_id']
+        total = en_curso.get('insertadas', 0)
+        leidas = en_curso.get('leidas', 0)
+        fecha_max = parse_fecha(en_curso.get('fecha_max')) or marca
+        print(f"Retomando checkpoint: id > {last_id} ({leidas} entradas ya revisadas)\n")
+    else:
+        fecha_desde = marca - timedelta(days=args.lookback_days) if marca else None
+        last_id = None
+        total = 0
+        leidas = 0
+        fecha_max = marca
+        if fecha_desde:
+            print(f"Incremental: fecha >= {fecha_desde.isoformat()} o sin fecha (marca {marca.isoformat()})\n")
+        else:
+            print("Corrida completa\n")
+
+    limiter = RateLimiter(args.rpm) if args.rpm > 0 else None
+    with metrics.phase("indices"):
+        cargar_indices()
+
+    def procesar(entry, existentes):
+        return sync_entry(entry, existentes, cola, limiter)
+
+    def procesar_pagina(pool, page):
+        """Sincroniza una página; actualiza `pendientes` y devuelve las declaraciones insertadas."""
+        existentes = existing_keys({e['id'] for e in page})
+        resultados = list(pool.map(procesar, page, [existentes] * len(page)))
+        pendientes.difference_update(e['id'] for e in page)
+        pendientes.update(e['id'] for e, (_, fallidas) in zip(page, resultados) if fallidas)
+        return sum(insertadas for insertadas, _ in resultados)
+
+    completa = False
+    try:
+        with metrics.phase("sync"), ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            if pendientes:
+                reintentar = sorted(pendientes, key=str)
+                print(f"Reintentando {len(reintentar)} entradas con inserts fallidos\n")
+                vistas = set()
+                for page in fetch_master_entries(reintentar, args.page_size):
+                    total += procesar_pagina(pool, page)
+                    vistas.update(e['id'] for e in page)
+                # Las que ya no están en QUIPU_MASTER no se pueden reintentar
+                pendientes.difference_update(set(reintentar) - vistas)
+                state['pendientes'] = sorted(pendientes, key=str)
+                save_state(state)
+
+            for page in fetch_master_pages(fecha_desde, args.page_size, last_id):
+                total += procesar_pagina(pool, page)
+                leidas += len(page)
+                for entry in page:
+                    fecha = parse_fecha(entry.get('fecha'))
+                    if fecha and (fecha_max is None or fecha > fecha_max):
+                        fecha_max = fecha
+
+                # Checkpoint: la página está procesada; lo que falló queda en pendientes
+                state['en_curso'] = {
+                    'fecha_desde': fecha_desde.isoformat() if fecha_desde else None,
+                    'last_id': page[-1]['id'],
+                    'leidas': leidas,
+                    'insertadas': total,
+                    'fecha_max': fecha_max.isoformat() if fecha_max else None,
+                }
+                state['pendientes'] = sorted(pendientes, key=str)
+                save_state(state)
+                print(f"[{leidas}] entradas revisadas, {total} declaraciones insertadas")
+        completa = True
+    except KeyboardInterrupt:
+        print(f"\n\n[INTERRUMPIDO] Checkpoint en id > {state.get('en_curso', {}).get('last_id')}")
+
+    if cola is not None:
+        print("\nEsperando cola de embeddings...")
+        with metrics.phase("embeddings"):
+            print(f"Embeddings: {cola.close().summary()}")
+
+    if not completa:
+        return
+
+    # La marca solo avanza cuando la corrida terminó completa
+    state.pop('en_curso', None)
+    if fecha_max:
+        state['fecha_max'] = fecha_max.isoformat()
+    state['pendientes'] = sorted(pendientes, key=str)
+    state['ultima_corrida'] = datetime.now().isoformat(timespec='seconds')
+    save_state(state)
+
+    # Interacciones nuevas en entradas existentes no cambian la huella de
+    # QUIPU_MASTER: si hubo inserts, recalcular igual
+    with metrics.phase("rollups"):
+        refresh_after_run(supabase, grupos=("declaraciones",), force=total > 0)
+
+    print(f"\nEntradas revisadas: {leidas}")
+    print(f"Total: {total} declaraciones insertadas")
+    if pendientes:
+        print(f"Con inserts fallidos: {len(pendientes)} entradas (se reintentan en la próxima corrida)")
 
 
 if __name__ == "__main__":
@@ -1,9 +1,10 @@
 import { useState } from 'react'
-import { cn, getInitials, buildFotoUrl } from '@/lib/utils'
+import { cn, getInitials, buildFotoUrl, buildFotoSrcSet } from '@/lib/utils'
 
 interface CandidatoAvatarProps {
   nombre: string
   fotoUrl?: string | null
+  fotoLocal?: string | null
   size?: 'sm' | 'md' | 'lg' | 'xl'
   className?: string
 }
@@ -15,15 +16,27 @@ const sizeStyles = {
   xl: 'h-24 w-24 text-2xl',
 }
 
+// Ancho en px de cada tamaño, para que el navegador elija la miniatura del srcset
+const sizePx = {
+  sm: 32,
+  md: 40,
+  lg: 64,
+  xl: 96,
+}
+
 export function CandidatoAvatar({
   nombre,
   fotoUrl,
+  fotoLocal,
   size = 'md',
   className,
 }: CandidatoAvatarProps) {
+  const thumb = buildFotoSrcSet(fotoLocal)
   const fullUrl = buildFotoUrl(fotoUrl)
+  const [thumbError, setThumbError] = useState(false)
   const [imgError, setImgError] = useState(false)
-  const showFallback = !fullUrl || imgError
+  const useThumb = !!thumb && !thumbError
+  const showFallback = !useThumb && (!fullUrl || imgError)
 
   return (
     <div
@@ -33,7 +46,18 @@ export function CandidatoAvatar({
         className
       )}
     >
-      {fullUrl && !imgError ? (
+      {useThumb ? (
+        <img
+          src={thumb.src}
+          srcSet={thumb.srcSet}
+          sizes={`${sizePx[size]}px`}
+          alt={nombre}
+          loading="lazy"
+          decoding="async"
+          className="h-full w-full object-cover"
+          onError={() => setThumbError(true)}
+        />
+      ) : fullUrl && !imgError ? (
         <img
           src={fullUrl}
           alt={nombre}
@@ -1,6 +1,5 @@
 import { useQuery } from '@tanstack/react-query'
 import { supabase } from '@/lib/supabase'
-import { normalizeKey } from '@/lib/utils'
 import { useAuth } from '@/contexts/AuthContext'
 import { useClienteCandidatos } from './useClienteCandidatos'
 
@@ -36,36 +35,21 @@ export function useDashboardStats() {
   })
 }
 
+/**
+ * Promesas por categoría desde quipu_rollup_categorias
+ * (precalculado por quipu/rollups.py; ver fase3/migrations/024_dashboard_rollups.sql)
+ */
 export function usePromesasPorCategoria() {
   return useQuery({
     queryKey: ['promesas-por-categoria'],
     queryFn: async () => {
-      // Paginate to avoid Supabase 1000-row default limit
-      const BATCH = 1000
-      let allRows: { categoria: string }[] = []
-      let offset = 0
-      while (true) {
-        const { data, error } = await supabase
-          .from('quipu_promesas_planes')
-          .select('categoria')
-          .range(offset, offset + BATCH - 1)
-        if (error) throw error
-        allRows = allRows.concat(data)
-        if (data.length < BATCH) break
-        offset += BATCH
-      }
-      // Count by category (normalize key for grouping, keep original label for display)
-      const counts: Record<string, { label: string; count: number }> = {}
-      for (const row of allRows) {
-        const key = normalizeKey(row.categoria)
-        if (!counts[key]) {
-          counts[key] = { label: row.categoria, count: 0 }
-        }
-        counts[key].count += 1
-      }
-      return Object.values(counts)
-        .map(({ label, count }) => ({ categoria: label, count }))
-        .sort((a, b) => b.count - a.count)
+      const { data, error } = await supabase
+        .from('quipu_rollup_categorias')
+        .select('categoria, total')
+        .gt('total', 0)
+        .order('total', { ascending: false })
+      if (error) throw error
+      return data.map(({ categoria, total }) => ({ categoria, count: total }))
     },
   })
 }
@@ -86,11 +70,12 @@ export function useTopPartidos() {
 }
 
 /**
- * Hook para contar categorías de declaraciones (categorias_interaccion de v_quipu_declaraciones)
+ * Hook para contar categorías de declaraciones (categorias_interaccion de QUIPU_MASTER)
  * Usado para "Categorías Más Discutidas" en el Dashboard
- * Normaliza keys para agrupar variantes (con/sin tildes) y guarda labels originales
+ * Lee los rollups precalculados por quipu/rollups.py (keys ya normalizadas con normalizeKey)
  *
- * MULTI-TENANT: Uses quipu_stakeholder_aliases for accurate filtering
+ * MULTI-TENANT: superadmin lee el total por tema; el resto suma solo las filas
+ * tema × candidato de sus candidatos (el stakeholder se resolvió con quipu_stakeholder_aliases)
  */
 export function useDeclaracionesPorTema() {
   const { clienteId, loading, isSuperadmin } = useAuth()
@@ -100,63 +85,37 @@ export function useDeclaracionesPorTema() {
   const clienteCandidatoIds = candidatosData?.map(c => c.candidato_id) ?? []
 
   const enabled = !loading && (isSuperadmin || clienteCandidatoIds.length > 0)
-  console.log('[useDeclaracionesPorTema DEBUG] State:', { loading, isSuperadmin, clienteCandidatoIds: clienteCandidatoIds.length, enabled })
 
   return useQuery({
     queryKey: ['declaraciones-por-tema', clienteId, clienteCandidatoIds, isSuperadmin],
     enabled,
     queryFn: async () => {
-      console.log('[useDeclaracionesPorTema DEBUG] queryFn EXECUTING')
-      // For non-superadmin users, first get aliases that map to their candidates
-      let aliasNormalized: string[] = []
-      if (!isSuperadmin && clienteCandidatoIds.length > 0) {
-        const { data: aliases } = await supabase
-          .from('quipu_stakeholder_aliases')
-          .select('alias_normalized')
-          .in('candidato_id', clienteCandidatoIds)
-
-        aliasNormalized = aliases?.map(a => a.alias_normalized) ?? []
+      if (isSuperadmin) {
+        const { data, error } = await supabase
+          .from('quipu_rollup_temas')
+          .select('tema_key, tema, total')
+          .gt('total', 0)
+          .order('total', { ascending: false })
+        if (error) throw error
+        return data.map(({ tema_key, tema, total }) => ({ key: tema_key, tema, count: total }))
       }
 
-      // Get all categorias from QUIPU_MASTER interacciones
-      const { data, error } = await supabase
-        .from('QUIPU_MASTER')
-        .select('interacciones')
+      // Security: No candidatos = No access to anything
+      if (clienteCandidatoIds.length === 0) return []
 
+      const { data, error } = await supabase
+        .from('quipu_rollup_tema_candidato')
+        .select('tema_key, tema, total')
+        .in('candidato_id', clienteCandidatoIds)
+        .gt('total', 0)
       if (error) throw error
 
-      // Count topics from all interactions (normalize to group variants)
       const counts: Record<string, { label: string; count: number }> = {}
-      for (const entry of data || []) {
-        const interacciones = entry.interacciones as Array<{ type?: string; categorias?: string; stakeholder?: string }> | null
-        if (!interacciones) continue
-
-        for (const i of interacciones) {
-          // Only count declarations (not mentions)
-          if (i.type !== 'declaration') continue
-          if (!i.categorias) continue
-
-          // MULTI-TENANT: Si no es superadmin, filtrar por aliases
-          if (!isSuperadmin) {
-            if (aliasNormalized.length === 0) continue // Security: No aliases = No access to anything
-
-            const stakeholderNorm = normalizeForMatch(i.stakeholder || '')
-            const matchesCliente = aliasNormalized.some(
-              alias => stakeholderNorm.includes(alias) || alias.includes(stakeholderNorm)
-            )
-            if (!matchesCliente) continue
-          }
-
-          // categorias can have multiple topics separated by ;
-          const categorias = i.categorias.split(';').map((t: string) => t.trim()).filter((t: string) => t)
-          for (const categoria of categorias) {
-            const key = normalizeKey(categoria)
-            if (!counts[key]) {
-              counts[key] = { label: categoria, count: 0 }
-            }
-            counts[key].count += 1
-          }
+      for (const row of data) {
+        if (!counts[row.tema_key]) {
+          counts[row.tema_key] = { label: row.tema, count: 0 }
         }
+        counts[row.tema_key].count += row.total
       }
 
       return Object.entries(counts)
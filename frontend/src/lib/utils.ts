@@ -108,3 +108,17 @@ export function buildFotoUrl(fotoUrl: string | null | undefined): string | null
   if (fotoUrl.startsWith('http')) return fotoUrl
   return JNE_FOTO_BASE + fotoUrl
 }
+
+const FOTOS_BUCKET_URL = `${import.meta.env.VITE_SUPABASE_URL}/storage/v1/object/public/candidatos-fotos/`
+const FOTO_THUMB_SIZES = [64, 128, 192]
+
+// Miniaturas WebP generadas por migrations/013_process_candidato_fotos.py;
+// foto_local es la key (hash del contenido) de la foto en el bucket
+export function buildFotoSrcSet(fotoLocal: string | null | undefined): { src: string; srcSet: string } | null {
+  if (!fotoLocal) return null
+  const base = FOTOS_BUCKET_URL + fotoLocal
+  return {
+    src: `${base}/s128.webp`,
+    srcSet: FOTO_THUMB_SIZES.map((size) => `${base}/s${size}.webp ${size}w`).join(', '),
+  }
+}
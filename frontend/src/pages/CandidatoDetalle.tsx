@@ -254,6 +254,7 @@ export function CandidatoDetalle() {
           <CandidatoAvatar
             nombre={candidato.nombre_completo || ''}
             fotoUrl={candidato.foto_url}
+            fotoLocal={candidato.foto_local}
             size="xl"
           />
           <div className="min-w-0 flex-1">
@@ -147,7 +147,7 @@ export function Candidatos() {
                 className="group rounded-xl border bg-card p-4 transition-all hover:shadow-sm hover:border-primary/30"
               >
                 <Link to={`/candidatos/${c.id}`} className="flex flex-col items-center text-center">
-                  <CandidatoAvatar nombre={c.nombre_completo || ''} fotoUrl={c.foto_url} size="lg" />
+                  <CandidatoAvatar nombre={c.nombre_completo || ''} fotoUrl={c.foto_url} fotoLocal={c.foto_local} size="lg" />
                   <h3 className="mt-3 font-semibold text-sm group-hover:text-primary transition-colors">
                     {c.nombre_completo}
                   </h3>
@@ -182,7 +182,7 @@ export function Candidatos() {
                 className="group flex items-center gap-4 p-4 transition-colors hover:bg-muted/30"
               >
                 <Link to={`/candidatos/${c.id}`} className="flex items-center gap-4 flex-1 min-w-0">
-                  <CandidatoAvatar nombre={c.nombre_completo || ''} fotoUrl={c.foto_url} size="md" />
+                  <CandidatoAvatar nombre={c.nombre_completo || ''} fotoUrl={c.foto_url} fotoLocal={c.foto_local} size="md" />
                   <div className="flex-1 min-w-0">
                     <p className="font-medium text-sm truncate group-hover:text-primary transition-colors">
                       {c.nombre_completo}
@@ -74,6 +74,7 @@ function CandidatoColumn({
         <CandidatoAvatar
           nombre={candidato.nombre_completo || ''}
           fotoUrl={candidato.foto_url}
+          fotoLocal={candidato.foto_local}
           size="lg"
           className="ring-2 ring-primary"
         />
@@ -380,6 +381,7 @@ export function Comparar() {
                   <CandidatoAvatar
                     nombre={c.nombre_completo || ''}
                     fotoUrl={c.foto_url}
+                    fotoLocal={c.foto_local}
                     size="sm"
                     className="h-6 w-6"
                   />
@@ -482,7 +484,7 @@ export function Comparar() {
                             onClick={() => addCandidato(c)}
                             className="w-full flex items-center gap-3 p-3 text-left hover:bg-muted/30 transition-colors"
                           >
-                            <CandidatoAvatar nombre={c.nombre_completo || ''} fotoUrl={c.foto_url} size="sm" />
+                            <CandidatoAvatar nombre={c.nombre_completo || ''} fotoUrl={c.foto_url} fotoLocal={c.foto_local} size="sm" />
                             <div className="min-w-0 flex-1">
                               <p className="text-sm font-medium truncate">{c.nombre_completo}</p>
                               <p className="text-xs text-muted-foreground">{c.partido_nombre}</p>
@@ -516,6 +518,7 @@ export function Comparar() {
                             <CandidatoAvatar
                               nombre={c.nombre_completo || ''}
                               fotoUrl={c.foto_url}
+                              fotoLocal={c.foto_local}
                               size="lg"
                               className="mx-auto mb-2"
                             />
@@ -566,6 +566,7 @@ function CandidatosPresidencialesSection({
                     <CandidatoAvatar
                       nombre={c.nombre_completo || ''}
                       fotoUrl={c.foto_url}
+                      fotoLocal={c.foto_local}
                       size="lg"
                       className="mx-auto mb-2"
                     />
@@ -699,6 +700,7 @@ function CandidatoCargoSection({
                 <CandidatoAvatar
                   nombre={c.nombre_completo || ''}
                   fotoUrl={c.foto_url}
+                  fotoLocal={c.foto_local}
                   size="lg"
                   className="mx-auto mb-2"
                 />
@@ -745,6 +747,7 @@ function CandidatoCargoSection({
               <CandidatoAvatar
                 nombre={c.nombre_completo || ''}
                 fotoUrl={c.foto_url}
+                fotoLocal={c.foto_local}
                 size="sm"
               />
               <div className="flex-1 min-w-0">
@@ -467,7 +467,7 @@ export function PartidoDetalle() {
                     to={`/candidatos/${c.id}`}
                     className="group rounded-xl border bg-card p-3 transition-all hover:shadow-sm hover:border-primary/30 flex flex-col items-center text-center"
                   >
-                    <CandidatoAvatar nombre={c.nombre_completo || ''} fotoUrl={c.foto_url} size="lg" />
+                    <CandidatoAvatar nombre={c.nombre_completo || ''} fotoUrl={c.foto_url} fotoLocal={c.foto_local} size="lg" />
                     <p className="mt-2 text-xs font-medium leading-tight group-hover:text-primary transition-colors">
                       {c.nombre_completo}
                     </p>
@@ -4,20 +4,44 @@ Proyecto: Quipu - Sistema Electoral Peru 2026
 
 Uso:
     python 002_migrate_to_supabase.py
+    python 002_migrate_to_supabase.py --max-batch-kb 4000 --in-flight 8
+    python 002_migrate_to_supabase.py --delta  # Solo filas nuevas o cambiadas (ver quipu/delta.py)
+    python 002_migrate_to_supabase.py --backend copy --database-url postgresql://...
+        # Promesas y hojas de vida por COPY + merge directo en Postgres (ver quipu/pg_copy.py)
+
+Todas las tablas se escriben con BulkUpserter sobre un WriteClient compartido
+(quipu/write_client.py): las filas rechazadas quedan en data/dead_letter/ y,
+como no entran al manifiesto, la próxima corrida con --delta las reintenta.
+
+Candidatos y hojas de vida se leen del cache Parquet (quipu/columnar.py), que
+se regenera solo si cambió el JSON; 014_build_parquet_cache.py lo arma aparte.
 
 Requiere:
-    - pip install supabase python-dotenv
+    - pip install supabase python-dotenv pyarrow
+    - pip install "psycopg[binary]" (solo --backend copy)
     - Archivo .env con SUPABASE_URL y SUPABASE_KEY
 """
 
 import os
+import sys
 import json
-import time
+import argparse
 import sqlite3
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quipu import columnar, metrics
+from quipu.bulk_upsert import BulkUpserter
+from quipu.delta import DeltaManifest, content_hash, diff_rows, report_removed
+from quipu.jne import JNE_FIELDS, candidato_key, map_candidato
+from quipu.pg_copy import CopyLoader, connect as pg_connect, database_url_from_env
+from quipu.rollups import refresh_after_run
+from quipu.snapshots import candidato_map as load_candidato_map
+from quipu.write_client import WriteClient
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -26,6 +50,11 @@ DATA_DIR = Path(__file__).parent.parent / "data"
 SQLITE_DB = DATA_DIR / "promesas_v2.db"
 HOJAS_VIDA_JSON = DATA_DIR / "hojas_vida_completas.json"
 CANDIDATOS_JSON = DATA_DIR / "candidatos_jne_2026.json"
+EMBEDDINGS_NPY = DATA_DIR / "promesas_embeddings.npy"  # Ver 010_convert_embeddings_npy.py
+
+# Columnas del cache Parquet que usa migrate_hojas_vida
+HOJAS_VIDA_COLUMNS = ('hv_id', 'dni', 'educacion', 'sentencias', 'bienes',
+                      'experiencia_laboral', 'cargos_partidarios', 'ingresos')
 
 # Supabase config
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -39,10 +68,10 @@ def get_supabase_client():
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise ValueError("Configurar SUPABASE_URL y SUPABASE_SERVICE_KEY en .env")
 
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    return metrics.instrument_supabase(create_client(SUPABASE_URL, SUPABASE_KEY))
 
 
-def migrate_partidos(sqlite_conn, supabase):
+def migrate_partidos(sqlite_conn, supabase, delta=False, writer=None):
     """Migra tabla partidos_politicos"""
     print("\n[1/4] Migrando partidos_politicos...")
 
@@ -61,71 +90,127 @@ def migrate_partidos(sqlite_conn, supabase):
                 partido['metadata'] = None
         partidos.append(partido)
 
+    manifest = DeltaManifest.for_table('quipu_partidos', SUPABASE_URL)
+    enviar, hashes = diff_rows(manifest, partidos, key=lambda p: p['id'], delta=delta)
+
+    def confirmar(batch):
+        manifest.commit((p['id'], hashes[str(p['id'])]) for p in batch)
+
     # Insertar en batches
-    batch_size = 50
-    for i in range(0, len(partidos), batch_size):
-        batch = partidos[i:i+batch_size]
-        supabase.table('quipu_partidos').upsert(batch).execute()
+    try:
+        with BulkUpserter(supabase, 'quipu_partidos', max_batch_rows=50, progress_every=0,
+                          on_sent=confirmar, writer=writer) as upserter:
+            for partido in enviar:
+                upserter.submit(partido)
+    finally:
+        manifest.save()
 
-    print(f"    ✓ {len(partidos)} partidos migrados")
+    print(f"    ✓ {upserter.stats.rows}/{len(partidos)} partidos migrados ({manifest.stats.summary()})")
+    report_removed(manifest, "partidos")
     return {p['nombre_oficial']: p['id'] for p in partidos}
 
 
-def migrate_promesas(sqlite_conn, supabase):
-    """Migra tabla promesas con embeddings"""
+def load_embedding_store(sqlite_conn):
+    """Matriz float32 de embeddings si existe y está al día con SQLite, si no None"""
+    if not EMBEDDINGS_NPY.exists():
+        return None
+
+    from quipu.embedding_store import EmbeddingStore
+
+    store = EmbeddingStore.load(EMBEDDINGS_NPY)
+    if not store.is_fresh(sqlite_conn):
+        print(f"    [WARN] {EMBEDDINGS_NPY.name} desactualizado, usando JSON (correr 010_convert_embeddings_npy.py)")
+        return None
+    return store
+
+
+def migrate_promesas(sqlite_conn, supabase, max_batch_bytes=2_000_000, max_in_flight=6, delta=False,
+                     writer=None, pg=None):
+    """Migra tabla promesas con embeddings (por PostgREST, o por COPY si se pasa la conexión `pg`)"""
     print("\n[2/4] Migrando promesas...")
 
     cursor = sqlite_conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM promesas")
     total = cursor.fetchone()[0]
     print(f"    Total a migrar: {total:,}")
-
-    cursor.execute("SELECT * FROM promesas")
+    if pg is None:
+        print(f"    Batches de hasta {max_batch_bytes / 1e6:.1f} MB, {max_in_flight} en vuelo")
+    else:
+        print("    COPY a staging + INSERT ... ON CONFLICT (id)")
+
+    store = load_embedding_store(sqlite_conn)
+    if store is not None:
+        # Embeddings desde el .npy: no leer ni parsear la columna JSON
+        print(f"    Embeddings desde {EMBEDDINGS_NPY.name} ({len(store):,} x {store.dim})")
+        cols = [r[1] for r in cursor.execute("PRAGMA table_info(promesas)") if r[1] != 'embedding']
+        cursor.execute(f"SELECT {', '.join(cols)} FROM promesas")
+    else:
+        cursor.execute("SELECT * FROM promesas")
     columns = [desc[0] for desc in cursor.description]
 
-    batch_size = 20  # Batches chicos por peso de embeddings (1536 floats)
-    migrated = 0
-
-    while True:
-        rows = cursor.fetchmany(batch_size)
-        if not rows:
-            break
-
-        promesas = []
-        for row in rows:
-            promesa = dict(zip(columns, row))
+    # El hash se calcula sobre la fila cruda (embedding como JSON TEXT o bytes
+    # del .npy), así las filas sin cambios ni siquiera se decodifican. Cambiar
+    # de fuente de embeddings cambia los hashes: la primera corrida envía todo.
+    manifest = DeltaManifest.for_table('quipu_promesas_planes', SUPABASE_URL)
+    hashes = {}
+
+    def confirmar(batch):
+        manifest.commit((p['id'], hashes.pop(p['id'])) for p in batch)
+
+    # La lectura y el decode de embeddings corren en este hilo mientras
+    # el upserter envía los batches anteriores en paralelo. Con COPY el
+    # embedding JSON pasa tal cual: '[0.1, ...]' ya es un literal de pgvector.
+    if pg is None:
+        upserter = BulkUpserter(supabase, 'quipu_promesas_planes',
+                                max_batch_bytes=max_batch_bytes,
+                                max_in_flight=max_in_flight,
+                                progress_every=500,
+                                total=total,
+                                on_sent=confirmar,
+                                writer=writer)
+    else:
+        upserter = CopyLoader(pg, 'quipu_promesas_planes', conflict=('id',))
+    try:
+        with upserter:
+            while True:
+                rows = cursor.fetchmany(500)
+                if not rows:
+                    break
+
+                for row in rows:
+                    submit_promesa(upserter, manifest, hashes, dict(zip(columns, row)), store, delta,
+                                   parse_embedding=pg is None)
+        if pg is not None:
+            confirmar([{'id': promesa_id} for promesa_id in list(hashes)])
+    finally:
+        manifest.save()
 
-            # Convertir embedding de JSON TEXT a array
-            if promesa.get('embedding'):
-                try:
-                    promesa['embedding'] = json.loads(promesa['embedding'])
-                except:
-                    promesa['embedding'] = None
+    print(f"    ✓ {upserter.stats.summary()}")
+    print(f"    ✓ Delta: {manifest.stats.summary()}")
+    report_removed(manifest, "promesas")
 
-            promesas.append(promesa)
 
-        # Retry con backoff por si hay timeout
-        for attempt in range(3):
-            try:
-                supabase.table('quipu_promesas_planes').upsert(promesas).execute()
-                break
-            except Exception as e:
-                if attempt < 2:
-                    wait = 2 ** (attempt + 1)
-                    print(f"    [RETRY] Timeout en batch, reintentando en {wait}s...")
-                    time.sleep(wait)
-                else:
-                    raise
-
-        migrated += len(promesas)
+def submit_promesa(upserter, manifest, hashes, promesa, store, delta, parse_embedding=True):
+    """Encola una promesa si es nueva o cambió (o siempre, sin delta)."""
+    vector = store.get(promesa['id']) if store is not None else None
+    digest = content_hash(promesa, vector.tobytes() if vector is not None else None)
+    if not manifest.check(promesa['id'], digest) and delta:
+        return
+    hashes[promesa['id']] = digest
 
-        if migrated % 500 == 0:
-            print(f"    {migrated:,}/{total:,} promesas...")
+    if store is not None:
+        promesa['embedding'] = vector.tolist() if vector is not None and parse_embedding else vector
+    # Convertir embedding de JSON TEXT a array
+    elif promesa.get('embedding') and parse_embedding:
+        try:
+            promesa['embedding'] = json.loads(promesa['embedding'])
+        except:
+            promesa['embedding'] = None
 
-    print(f"    ✓ {migrated:,} promesas migradas")
+    upserter.submit(promesa)
 
 
-def migrate_candidatos(supabase, partido_ids):
+def migrate_candidatos(supabase, partido_ids, delta=False, writer=None):
     """Migra candidatos desde JSON"""
     print("\n[3/4] Migrando candidatos...")
 
@@ -133,75 +218,40 @@ def migrate_candidatos(supabase, partido_ids):
         print("    [SKIP] candidatos_jne_2026.json no encontrado")
         return {}
 
-    with open(CANDIDATOS_JSON, 'r', encoding='utf-8') as f:
-        candidatos_raw = json.load(f)
-
-    candidatos = []
-    for c in candidatos_raw['candidatos']:
-        dni = c.get('strDocumentoIdentidad')
-        candidato = {
-            'dni': dni,
-            'nombres': c.get('strNombres'),
-            'apellido_paterno': c.get('strApellidoPaterno'),
-            'apellido_materno': c.get('strApellidoMaterno'),
-            'nombre_completo': f"{c.get('strNombres', '')} {c.get('strApellidoPaterno', '')} {c.get('strApellidoMaterno', '')}".strip(),
-            'sexo': c.get('strSexo'),
-            'organizacion_politica': c.get('strOrganizacionPolitica'),
-            'tipo_eleccion': c.get('strTipoEleccion'),
-            'cargo_postula': c.get('strCargo'),
-            'cargo_eleccion': c.get('idCargo'),
-            'ubigeo': c.get('strUbigeo'),
-            'departamento': c.get('strDepartamento'),
-            'provincia': c.get('strProvincia'),
-            'distrito': c.get('strDistrito'),
-            'foto_url': c.get('strNombre'),
-            'estado': c.get('strEstadoCandidato'),
-        }
+    candidatos_raw = columnar.read_rows("candidatos_jne", CANDIDATOS_JSON, columns=JNE_FIELDS)
+    candidatos = [map_candidato(c, partido_ids) for c in candidatos_raw]
 
-        # Vincular con partido
-        org = candidato['organizacion_politica']
-        if org and org in partido_ids:
-            candidato['partido_id'] = partido_ids[org]
+    manifest = DeltaManifest.for_table('quipu_candidatos', SUPABASE_URL)
+    enviar, hashes = diff_rows(manifest, candidatos, key=candidato_key, delta=delta)
 
-        candidatos.append(candidato)
+    def confirmar(batch):
+        manifest.commit((candidato_key(c), hashes[candidato_key(c)]) for c in batch)
 
     # Insertar en batches (upsert por DNI + cargo — un candidato puede postular a multiples cargos)
-    batch_size = 100
-    for i in range(0, len(candidatos), batch_size):
-        batch = candidatos[i:i+batch_size]
-        supabase.table('quipu_candidatos').upsert(batch, on_conflict='dni,cargo_eleccion').execute()
-
-        if (i + batch_size) % 1000 == 0:
-            print(f"    {i + batch_size:,}/{len(candidatos):,} candidatos...")
+    try:
+        with BulkUpserter(supabase, 'quipu_candidatos', on_conflict='dni,cargo_eleccion',
+                          max_batch_rows=100, total=len(enviar), on_sent=confirmar, writer=writer) as upserter:
+            for candidato in enviar:
+                upserter.submit(candidato)
+    finally:
+        manifest.save()
 
-    print(f"    ✓ {len(candidatos):,} candidatos migrados")
+    print(f"    ✓ {upserter.stats.rows:,}/{len(candidatos):,} candidatos migrados ({manifest.stats.summary()})")
+    report_removed(manifest, "candidatos (dni|cargo)")
 
     # Retornar mapeo dni -> id para vincular hojas_vida
     # Nota: candidatos con multiples postulaciones (85 DNIs) tendran
     # el ultimo ID registrado; la hoja de vida es por persona,
     # asi que vincularlo a cualquiera de sus registros es suficiente.
     # El frontend hace fallback por DNI para cubrir ambos registros.
-    # Paginar porque Supabase retorna max 1000 rows por defecto
-    candidato_map = {}
-    offset = 0
-    page_size = 1000
-    while True:
-        result = (supabase.table('quipu_candidatos')
-                  .select('id, dni')
-                  .range(offset, offset + page_size - 1)
-                  .execute())
-        for c in result.data:
-            if c.get('dni'):
-                candidato_map[c['dni']] = c['id']
-        if len(result.data) < page_size:
-            break
-        offset += page_size
+    # Snapshot local revalidado por count/max(id) (ver quipu/snapshots.py)
+    candidato_map = load_candidato_map(supabase)
 
     print(f"    Mapeo DNI→ID: {len(candidato_map):,} candidatos")
     return candidato_map
 
 
-def migrate_hojas_vida(supabase, candidato_ids):
+def migrate_hojas_vida(supabase, candidato_ids, writer=None, pg=None):
     """Migra hojas de vida desde JSON"""
     print("\n[4/4] Migrando hojas de vida...")
 
@@ -209,11 +259,10 @@ def migrate_hojas_vida(supabase, candidato_ids):
         print("    [SKIP] hojas_vida_completas.json no encontrado")
         return
 
-    with open(HOJAS_VIDA_JSON, 'r', encoding='utf-8') as f:
-        hojas_raw = json.load(f)
+    hojas_raw = columnar.read_rows("hojas_vida", HOJAS_VIDA_JSON, columns=HOJAS_VIDA_COLUMNS)
 
     hojas = []
-    for h in hojas_raw['hojas_vida']:
+    for h in hojas_raw:
         id_hv = h.get('hv_id')
         educacion = h.get('educacion', {})
         sentencias = h.get('sentencias', {})
@@ -241,19 +290,36 @@ def migrate_hojas_vida(supabase, candidato_ids):
         }
         hojas.append(hoja)
 
-    # Insertar en batches
-    batch_size = 100
-    for i in range(0, len(hojas), batch_size):
-        batch = hojas[i:i+batch_size]
-        supabase.table('quipu_hojas_vida').upsert(batch, on_conflict='id_hoja_vida').execute()
+    # Insertar en batches (o COPY + merge)
+    if pg is None:
+        upserter = BulkUpserter(supabase, 'quipu_hojas_vida', on_conflict='id_hoja_vida',
+                                max_batch_rows=100, total=len(hojas), writer=writer)
+    else:
+        upserter = CopyLoader(pg, 'quipu_hojas_vida', conflict=('id_hoja_vida',))
+    with upserter:
+        for hoja in hojas:
+            upserter.submit(hoja)
 
-        if (i + batch_size) % 1000 == 0:
-            print(f"    {i + batch_size:,}/{len(hojas):,} hojas...")
-
-    print(f"    ✓ {len(hojas):,} hojas de vida migradas")
+    print(f"    ✓ {upserter.stats.summary()}")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Migra SQLite → Supabase")
+    parser.add_argument("--max-batch-kb", type=int, default=2000,
+                        help="Tamaño máximo de payload por batch de promesas en KB (default: 2000)")
+    parser.add_argument("--in-flight", type=int, default=6,
+                        help="Batches de promesas enviándose en paralelo (default: 6)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Enviar solo filas nuevas o cambiadas según el manifiesto local de hashes")
+    parser.add_argument("--backend", choices=("postgrest", "copy"), default="postgrest",
+                        help="Promesas y hojas de vida por upserts PostgREST o por COPY directo (default: postgrest)")
+    parser.add_argument("--database-url", default=database_url_from_env(),
+                        help="Conexión Postgres para --backend copy (default: DATABASE_URL)")
+    args = parser.parse_args()
+    if args.backend == "copy" and not args.database_url:
+        parser.error("--backend copy necesita --database-url o DATABASE_URL en .env")
+    metrics.start_run(Path(__file__).stem)
+
     print("=" * 60)
     print("MIGRACIÓN SQLite → Supabase")
     print("Proyecto: Quipu - Sistema Electoral Peru 2026")
@@ -266,23 +332,44 @@ def main():
     # Conectar Supabase
     print("Conectando a Supabase...")
     supabase = get_supabase_client()
+    writer = WriteClient(supabase, max_concurrency=args.in_flight)
+    pg = None
+    if args.backend == "copy":
+        print("Conectando a Postgres (COPY)...")
+        pg = pg_connect(args.database_url)
 
     try:
         # 1. Migrar partidos
-        partido_ids = migrate_partidos(sqlite_conn, supabase)
+        with metrics.phase("partidos"):
+            partido_ids = migrate_partidos(sqlite_conn, supabase, delta=args.delta, writer=writer)
 
         # 2. Migrar promesas
-        migrate_promesas(sqlite_conn, supabase)
+        with metrics.phase("promesas"):
+            migrate_promesas(sqlite_conn, supabase,
+                             max_batch_bytes=args.max_batch_kb * 1000,
+                             max_in_flight=args.in_flight,
+                             delta=args.delta,
+                             writer=writer,
+                             pg=pg)
 
         # 3. Migrar candidatos
-        candidato_ids = migrate_candidatos(supabase, partido_ids)
+        with metrics.phase("candidatos"):
+            candidato_ids = migrate_candidatos(supabase, partido_ids, delta=args.delta, writer=writer)
 
         # 4. Migrar hojas de vida
-        migrate_hojas_vida(supabase, candidato_ids)
+        with metrics.phase("hojas_vida"):
+            migrate_hojas_vida(supabase, candidato_ids, writer=writer, pg=pg)
+
+        # 5. Rollups del Dashboard (forzado: un upsert puede cambiar categorías sin mover la huella)
+        with metrics.phase("rollups"):
+            refresh_after_run(supabase, grupos=("promesas",), force=True)
 
         print("\n" + "=" * 60)
         print("MIGRACIÓN COMPLETADA")
         print("=" * 60)
+        if writer.dead_letters:
+            print(f"\n[WARN] {writer.dead_letters} filas rechazadas en {writer.dead_letter_dir}/ "
+                  "(corregir y re-ejecutar con --delta)")
 
         print("\n[POST] Ejecutar en Supabase SQL Editor para resetear sequences:")
         print("""
@@ -292,6 +379,8 @@ def main():
 
     finally:
         sqlite_conn.close()
+        if pg is not None:
+            pg.close()
 
 
 if __name__ == "__main__":
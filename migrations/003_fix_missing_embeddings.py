@@ -2,27 +2,44 @@
 Fix: Genera embeddings faltantes (99 promesas Partido Morado)
 Usa Gemini Embedding (gemini-embedding-001, 1536 dims)
 
+Los textos pasan por quipu.embeddings.EmbeddingService: batches de hasta 100,
+varios en paralelo bajo rate limit, y cache local por hash de
+(modelo, dims, task_type, texto). Re-ejecutar tras un fallo parcial solo
+embebe lo que faltó.
+
 Uso:
     python 003_fix_missing_embeddings.py
+    python 003_fix_missing_embeddings.py --workers 8 --rpm 600
 """
 
-import os
+import sys
 import json
 import sqlite3
+import argparse
 from pathlib import Path
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quipu.embedding_store import track_versions
+from quipu.embeddings import EmbeddingService, create_genai_client
 
 load_dotenv()
 
 DB_PATH = Path(__file__).parent.parent / "data" / "promesas_v2.db"
+EMBEDDINGS_NPY = Path(__file__).parent.parent / "data" / "promesas_embeddings.npy"  # Ver 010_convert_embeddings_npy.py
 EMBEDDING_MODEL = "gemini-embedding-001"
 EMBEDDING_DIMENSIONS = 1536
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Genera embeddings faltantes en promesas_v2.db")
+    parser.add_argument("--workers", type=int, default=4, help="Requests de embeddings en paralelo (default: 4)")
+    parser.add_argument("--rpm", type=int, default=300, help="Máximo de requests por minuto (default: 300)")
+    args = parser.parse_args()
+
     conn = sqlite3.connect(DB_PATH)
+    track_versions(conn)  # Invalida promesas_embeddings.npy al escribir (ver quipu/embedding_store.py)
     cursor = conn.cursor()
 
     # Obtener promesas sin embedding
@@ -43,33 +60,40 @@ def main():
     texts = [r[1] or r[2] for r in rows]  # Preferir normalizado, fallback a original
 
     # Generar embeddings con Gemini
-    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("Configurar GEMINI_API_KEY en .env")
-
-    client = genai.Client(api_key=api_key)
-
-    print(f"Generando {len(texts)} embeddings con {EMBEDDING_MODEL}...")
-    result = client.models.embed_content(
+    service = EmbeddingService(
+        create_genai_client(),
         model=EMBEDDING_MODEL,
-        contents=texts,
-        config=types.EmbedContentConfig(
-            task_type="RETRIEVAL_DOCUMENT",
-            output_dimensionality=EMBEDDING_DIMENSIONS
-        )
+        dimensions=EMBEDDING_DIMENSIONS,
+        task_type="RETRIEVAL_DOCUMENT",
+        max_workers=args.workers,
+        requests_per_minute=args.rpm,
     )
 
+    print(f"Generando {len(texts)} embeddings con {EMBEDDING_MODEL}...")
+    embeddings = service.embed(texts)
+    print(f"  {service.stats.summary()}")
+
     # Actualizar SQLite
     updated = 0
-    for i, embedding in enumerate(result.embeddings):
-        emb_json = json.dumps(embedding.values)
-        cursor.execute("UPDATE promesas SET embedding = ? WHERE id = ?", (emb_json, ids[i]))
+    for promesa_id, embedding in zip(ids, embeddings):
+        if embedding is None:
+            continue
+        cursor.execute("UPDATE promesas SET embedding = ? WHERE id = ?", (json.dumps(embedding), promesa_id))
         updated += 1
 
     conn.commit()
+
+    # Mantener al día la matriz float32 si ya se generó
+    if EMBEDDINGS_NPY.exists():
+        from quipu.embedding_store import convert_sqlite
+        meta = convert_sqlite(conn, EMBEDDINGS_NPY)
+        print(f"{EMBEDDINGS_NPY.name} regenerado: {meta['rows']:,} x {meta['dim']}")
+
     conn.close()
 
     print(f"OK: {updated} embeddings generados y guardados.")
+    if updated < len(ids):
+        print(f"Quedan {len(ids) - updated} sin embedding; volver a ejecutar para reintentar.")
 
 
 if __name__ == "__main__":
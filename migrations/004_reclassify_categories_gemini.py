@@ -6,15 +6,25 @@ Reemplaza las 15 categorías genéricas por las 267 categorías específicas de
 Uso:
     python 004_reclassify_categories_gemini.py [--limit N]  # Continúa automáticamente desde checkpoint
     python 004_reclassify_categories_gemini.py --reset      # Empieza desde cero
+    python 004_reclassify_categories_gemini.py --no-cache   # Ignora el cache de clasificaciones
+
+Las clasificaciones se guardan en data/.cache/clasificaciones.sqlite con clave
+(texto normalizado, hash del prompt). Textos que solo difieren en tildes o
+espacios comparten resultado, dentro de un batch se clasifican una sola vez,
+y un re-run con la misma taxonomía no vuelve a llamar a Gemini para textos
+ya vistos. Cambiar categorias.json cambia el hash y invalida el cache.
 
 Requiere:
     - SUPABASE_URL y SUPABASE_SERVICE_KEY en variables de entorno
     - GEMINI_API_KEY para Gemini
+    - 011_bulk_update_categorias.sql aplicado (si no, cae a un UPDATE por categoría)
 """
 
 import os
+import sys
 import json
 import time
+import hashlib
 import argparse
 import signal
 import asyncio
@@ -24,6 +34,14 @@ from typing import Optional
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quipu import metrics
+from quipu.cache import CACHE_DIR, SqliteCache
+from quipu.rollups import refresh_after_run
+from quipu.text import normalizar_espacios
+from quipu.write_client import classify_error
+
 # Cargar .env
 load_dotenv()
 
@@ -39,10 +57,21 @@ GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
 SCRIPT_DIR = Path(__file__).parent.parent
 CATEGORIES_PATH = SCRIPT_DIR / "docs" / "categorias.json"
 CHECKPOINT_PATH = Path(__file__).parent / ".reclassify_checkpoint.json"
+CLASSIFICATION_CACHE_PATH = CACHE_DIR / "clasificaciones.sqlite"
+GEMINI_MODEL = 'gemini-2.5-flash'
+MAX_TEXT_CHARS = 2000
+# classify_promesa: Gemini respondió algo fuera de la lista. Se aplica
+# FALLBACK_CATEGORIA pero no se cachea, así el próximo run lo vuelve a preguntar
+RESPUESTA_INVALIDA = "__respuesta_invalida__"
+FALLBACK_CATEGORIA = "Otros"
 
 with open(CATEGORIES_PATH, "r", encoding="utf-8") as f:
     CATEGORIES_267 = json.load(f)
 
+# Se apaga al primer error no transitorio de quipu_update_categorias (p.ej. 011
+# sin aplicar: PGRST202/42883); el resto del run usa directo el UPDATE por categoría
+rpc_bulk_disponible = True
+
 # Estado global para checkpoint
 checkpoint_state = {
     "last_id": 0,
@@ -50,6 +79,8 @@ checkpoint_state = {
     "total_updated": 0,
     "total_unchanged": 0,
     "total_errors": 0,
+    "total_cache_hits": 0,
+    "total_llm_calls": 0,
     "category_counts": {}
 }
 
@@ -95,6 +126,19 @@ PROPUESTA A CLASIFICAR:
 
 CATEGORÍA:"""
 
+# Cambia si cambian las categorías, el prompt o el modelo
+PROMPT_HASH = hashlib.sha256(f"{GEMINI_MODEL}\x1f{CLASSIFICATION_PROMPT}".encode("utf-8")).hexdigest()
+
+
+def texto_a_clasificar(promesa) -> str:
+    """Texto que se envía al clasificador (resumen si hay, si no el original)."""
+    return (promesa.get("resumen") or promesa["texto_original"])[:MAX_TEXT_CHARS]
+
+
+def classification_key(texto: str) -> str:
+    """Clave de cache: texto sin tildes/mayúsculas/espacios extra + hash del prompt."""
+    return hashlib.sha256(f"{PROMPT_HASH}\x1f{normalizar_espacios(texto)}".encode("utf-8")).hexdigest()
+
 
 def init_clients():
     """Inicializa clientes de Supabase y Gemini."""
@@ -103,20 +147,24 @@ def init_clients():
     if not GOOGLE_API_KEY:
         raise ValueError("Falta GEMINI_API_KEY o GOOGLE_API_KEY")
 
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    client = genai.Client(api_key=GOOGLE_API_KEY)
+    supabase: Client = metrics.instrument_supabase(create_client(SUPABASE_URL, SUPABASE_KEY))
+    client = metrics.instrument_genai(genai.Client(api_key=GOOGLE_API_KEY))
 
     return supabase, client
 
 
 def classify_promesa(client, texto: str, max_retries: int = 3) -> Optional[str]:
-    """Clasifica una promesa usando Gemini."""
-    prompt = CLASSIFICATION_PROMPT.replace("{texto}", texto[:2000])  # Limitar texto
+    """
+    Clasifica una promesa usando Gemini. Devuelve una categoría de
+    CATEGORIES_267, RESPUESTA_INVALIDA si la respuesta no es ninguna, o None
+    si la llamada falló.
+    """
+    prompt = CLASSIFICATION_PROMPT.replace("{texto}", texto[:MAX_TEXT_CHARS])  # Limitar texto
 
     for attempt in range(max_retries):
         try:
             response = client.models.generate_content(
-                model='gemini-2.5-flash',
+                model=GEMINI_MODEL,
                 contents=prompt
             )
             categoria = response.text.strip()
@@ -131,13 +179,14 @@ def classify_promesa(client, texto: str, max_retries: int = 3) -> Optional[str]:
                 if cat.lower() == categoria_lower:
                     return cat
 
-            print(f"  [WARN] Categoría no válida: '{categoria}', usando 'Otros'")
-            return "Otros"
+            print(f"  [WARN] Categoría no válida: '{categoria}', usando '{FALLBACK_CATEGORIA}' (sin cachear)")
+            return RESPUESTA_INVALIDA
 
         except Exception as e:
             if attempt < max_retries - 1:
                 wait = 2 ** attempt
                 print(f"  [RETRY] Error: {e}, esperando {wait}s...")
+                metrics.count_retry("gemini", "generate_content", GEMINI_MODEL)
                 time.sleep(wait)
             else:
                 print(f"  [ERROR] Falló después de {max_retries} intentos: {e}")
@@ -168,20 +217,59 @@ def count_remaining(supabase: Client, after_id: int) -> int:
     return result.count or 0
 
 
-def update_categoria(supabase: Client, promesa_id: int, nueva_categoria: str, dry_run: bool = False):
-    """Actualiza la categoría de una promesa."""
+def bulk_update_categorias(supabase: Client, cambios: list, dry_run: bool = False, max_retries: int = 3):
+    """
+    Escribe un batch de (id, categoria) en un solo request vía el RPC
+    quipu_update_categorias (migrations/011_bulk_update_categorias.sql).
+    Solo los errores transitorios se reintentan; si se agotan, o ante
+    cualquier otro error (que además apaga el RPC para el resto del run),
+    cae a un UPDATE ... IN (...) por categoría. Devuelve (actualizadas, fallidas).
+    """
+    global rpc_bulk_disponible
+    if not cambios:
+        return 0, 0
+
     if dry_run:
-        print(f"  [DRY-RUN] UPDATE id={promesa_id} SET categoria='{nueva_categoria}'")
-        return True
+        for promesa_id, nueva_categoria in cambios:
+            print(f"  [DRY-RUN] UPDATE id={promesa_id} SET categoria='{nueva_categoria}'")
+        return len(cambios), 0
+
+    ids = [promesa_id for promesa_id, _ in cambios]
+    categorias = [categoria for _, categoria in cambios]
+    for attempt in range(max_retries if rpc_bulk_disponible else 0):
+        try:
+            supabase.rpc("quipu_update_categorias", {"p_ids": ids, "p_categorias": categorias}).execute()
+            return len(cambios), 0
+        except Exception as e:
+            if classify_error(e) != "transient":
+                rpc_bulk_disponible = False
+                print(f"  [WARN] quipu_update_categorias no disponible ({e}); "
+                      f"se actualiza por categoría el resto del run")
+                break
+            if attempt < max_retries - 1:
+                wait = 2 ** attempt
+                print(f"  [RETRY] quipu_update_categorias: {e}, esperando {wait}s...")
+                metrics.count_retry("supabase", "rpc", "quipu_update_categorias")
+                time.sleep(wait)
+            else:
+                print(f"  [WARN] quipu_update_categorias falló ({e}), actualizando por categoría")
 
-    try:
-        supabase.table("quipu_promesas_planes").update({
-            "categoria": nueva_categoria
-        }).eq("id", promesa_id).execute()
-        return True
-    except Exception as e:
-        print(f"  [ERROR] No se pudo actualizar id={promesa_id}: {e}")
-        return False
+    # Fallback: un UPDATE por categoría distinta del batch
+    por_categoria = {}
+    for promesa_id, categoria in cambios:
+        por_categoria.setdefault(categoria, []).append(promesa_id)
+
+    actualizadas = fallidas = 0
+    for categoria, ids_categoria in por_categoria.items():
+        try:
+            supabase.table("quipu_promesas_planes").update({
+                "categoria": categoria
+            }).in_("id", ids_categoria).execute()
+            actualizadas += len(ids_categoria)
+        except Exception as e:
+            print(f"  [ERROR] No se pudo actualizar {len(ids_categoria)} promesas a '{categoria}': {e}")
+            fallidas += len(ids_categoria)
+    return actualizadas, fallidas
 
 
 def main():
@@ -194,7 +282,9 @@ def main():
     parser.add_argument("--delay", type=float, default=0.05, help="Delay entre llamadas a Gemini (segundos)")
     parser.add_argument("--workers", type=int, default=10, help="Número de workers paralelos (default: 10)")
     parser.add_argument("--reset", action="store_true", help="Eliminar checkpoint y empezar desde cero")
+    parser.add_argument("--no-cache", action="store_true", help="No leer ni escribir el cache de clasificaciones")
     args = parser.parse_args()
+    metrics.start_run(Path(__file__).stem)
 
     print("=" * 60)
     print("RECLASIFICACIÓN DE CATEGORÍAS CON GEMINI AI")
@@ -220,6 +310,7 @@ def main():
     print(f"Modo: {'DRY-RUN (sin cambios)' if args.dry_run else 'PRODUCCIÓN'}")
     print(f"Batch size: {args.batch_size}")
     print(f"Workers paralelos: {args.workers}")
+    print(f"Cache: {'desactivado' if args.no_cache else CLASSIFICATION_CACHE_PATH.name}")
     print()
 
     # Inicializar
@@ -228,8 +319,9 @@ def main():
     print("OK\n")
 
     # Contar promesas restantes
-    total_promesas = count_promesas(supabase)
-    remaining = count_remaining(supabase, start_after_id)
+    with metrics.phase("conteo"):
+        total_promesas = count_promesas(supabase)
+        remaining = count_remaining(supabase, start_after_id)
     target = min(args.limit, remaining) if args.limit else remaining
 
     print(f"Total promesas en BD: {total_promesas}")
@@ -256,17 +348,80 @@ def main():
     # Estadísticas de sesión
     session_processed = 0
 
-    # Función para procesar una promesa (para uso en paralelo)
-    def process_one(promesa):
-        promesa_id = promesa["id"]
-        texto = promesa.get("resumen") or promesa["texto_original"]
-        categoria_actual = promesa["categoria"]
+    cache = None if args.no_cache else SqliteCache(CLASSIFICATION_CACHE_PATH, table="clasificaciones")
+
+    # Función para clasificar un texto único (para uso en paralelo)
+    def process_one(item):
+        key, texto = item
         time.sleep(args.delay)  # Pequeño delay para evitar rate limit
-        nueva_categoria = classify_promesa(client, texto)
-        return promesa_id, categoria_actual, nueva_categoria
+        return key, classify_promesa(client, texto)
+
+    def classify_batch(promesas):
+        """
+        Clasifica un batch: primero el cache, luego colapsa textos duplicados
+        y solo envía a Gemini un representante por texto nuevo.
+        """
+        keys = {}
+        for promesa in promesas:
+            texto = texto_a_clasificar(promesa)
+            keys[promesa["id"]] = (classification_key(texto), texto)
+
+        resultados = {}
+        if cache is not None:
+            cached = cache.get_many(k for k, _ in keys.values())
+            resultados.update({k: v.decode("utf-8") for k, v in cached.items()})
+
+        pendientes = {}
+        for key, texto in keys.values():
+            if key not in resultados:
+                pendientes.setdefault(key, texto)
+
+        checkpoint_state["total_llm_calls"] += len(pendientes)
+        nuevos = dict(executor.map(process_one, pendientes.items()))
+        resultados.update(nuevos)
+
+        # Guardar solo categorías válidas (errores y respuestas inválidas se reintentan en el próximo run)
+        if cache is not None:
+            cache.put_many((k, v.encode("utf-8")) for k, v in nuevos.items() if v in CATEGORIES_267)
+
+        out = []
+        enviados = set()
+        for promesa in promesas:
+            key, _ = keys[promesa["id"]]
+            if key in pendientes and key not in enviados:
+                enviados.add(key)  # el representante que fue a Gemini
+            else:
+                checkpoint_state["total_cache_hits"] += 1
+            categoria = resultados.get(key)
+            if categoria == RESPUESTA_INVALIDA:
+                categoria = FALLBACK_CATEGORIA
+            out.append((promesa["id"], promesa["categoria"], categoria))
+        return out
+
+    # Las escrituras de cada batch corren en un hilo aparte mientras se
+    # clasifica el siguiente. El checkpoint solo avanza cuando la escritura
+    # del batch terminó, así un corte nunca salta promesas sin escribir.
+    writer = ThreadPoolExecutor(max_workers=1)
+    pendiente = None
+
+    def confirmar(pendiente):
+        future, last_id, stats = pendiente
+        actualizadas, fallidas = future.result()
+        checkpoint_state["total_updated"] += actualizadas
+        checkpoint_state["total_errors"] += stats["errors"] + fallidas
+        checkpoint_state["total_unchanged"] += stats["unchanged"]
+        checkpoint_state["total_processed"] += stats["processed"]
+        cat_counts = checkpoint_state["category_counts"]
+        for cat, count in stats["category_counts"].items():
+            cat_counts[cat] = cat_counts.get(cat, 0) + count
+        checkpoint_state["last_id"] = last_id
+        if not args.dry_run:
+            save_checkpoint()
+
+    updated_before = checkpoint_state["total_updated"]
 
     # Progress bar
-    with tqdm(total=target, desc="Clasificando", unit="promesas") as pbar:
+    with metrics.phase("clasificacion"), tqdm(total=target, desc="Clasificando", unit="promesas") as pbar:
         current_id = start_after_id
 
         with ThreadPoolExecutor(max_workers=args.workers) as executor:
@@ -277,41 +432,50 @@ def main():
                 if not promesas:
                     break
 
-                # Procesar batch en paralelo
-                futures = list(executor.map(process_one, promesas))
+                # Procesar batch en paralelo (cache + textos únicos)
+                futures = classify_batch(promesas)
+
+                # Confirmar la escritura del batch anterior antes de encolar otra
+                if pendiente is not None:
+                    confirmar(pendiente)
+                    pendiente = None
 
                 # Procesar resultados en orden
+                stats = {"processed": 0, "unchanged": 0, "errors": 0, "category_counts": {}}
+                cambios = []
                 for promesa_id, categoria_actual, nueva_categoria in futures:
                     current_id = promesa_id
-                    checkpoint_state["last_id"] = promesa_id
 
                     if nueva_categoria is None:
-                        checkpoint_state["total_errors"] += 1
+                        stats["errors"] += 1
                     else:
                         # Contabilizar
-                        cat_counts = checkpoint_state["category_counts"]
+                        cat_counts = stats["category_counts"]
                         cat_counts[nueva_categoria] = cat_counts.get(nueva_categoria, 0) + 1
 
-                        # Actualizar si cambió
+                        # Acumular si cambió
                         if nueva_categoria != categoria_actual:
-                            if update_categoria(supabase, promesa_id, nueva_categoria, args.dry_run):
-                                checkpoint_state["total_updated"] += 1
-                            else:
-                                checkpoint_state["total_errors"] += 1
+                            cambios.append((promesa_id, nueva_categoria))
                         else:
-                            checkpoint_state["total_unchanged"] += 1
+                            stats["unchanged"] += 1
 
-                    checkpoint_state["total_processed"] += 1
+                    stats["processed"] += 1
                     session_processed += 1
                     pbar.update(1)
-                    pbar.set_postfix(
-                        upd=checkpoint_state["total_updated"],
-                        err=checkpoint_state["total_errors"]
-                    )
 
-                # Guardar checkpoint cada batch
-                if not args.dry_run:
-                    save_checkpoint()
+                pbar.set_postfix(
+                    upd=checkpoint_state["total_updated"],
+                    err=checkpoint_state["total_errors"],
+                    cache=checkpoint_state["total_cache_hits"]
+                )
+
+                # Escribir el batch en segundo plano
+                future = writer.submit(bulk_update_categorias, supabase, cambios, args.dry_run)
+                pendiente = (future, current_id, stats)
+
+        if pendiente is not None:
+            confirmar(pendiente)
+    writer.shutdown()
 
     # Resumen final
     print("\n" + "=" * 60)
@@ -322,12 +486,19 @@ def main():
     print(f"Total actualizadas: {checkpoint_state['total_updated']}")
     print(f"Total sin cambio: {checkpoint_state['total_unchanged']}")
     print(f"Total errores: {checkpoint_state['total_errors']}")
+    print(f"Llamadas a Gemini: {checkpoint_state['total_llm_calls']}")
+    print(f"Resueltas desde cache/duplicados: {checkpoint_state['total_cache_hits']}")
     print(f"Último ID: {checkpoint_state['last_id']}")
     print()
     print("Top 20 categorías:")
     for cat, count in sorted(checkpoint_state["category_counts"].items(), key=lambda x: -x[1])[:20]:
         print(f"  {count:5d} - {cat}")
 
+    # Un UPDATE de categoría no cambia la huella de la tabla: forzar el rollup
+    if not args.dry_run and checkpoint_state["total_updated"] > updated_before:
+        with metrics.phase("rollups"):
+            refresh_after_run(supabase, grupos=("promesas",), force=True)
+
     # Verificar si terminamos
     remaining_after = count_remaining(supabase, checkpoint_state["last_id"])
     if remaining_after == 0:
@@ -5,13 +5,37 @@ Prerequisite: Run 004_fix_candidato_unique_constraint.sql in Supabase SQL Editor
 
 This script re-inserts all candidatos using the new composite unique constraint,
 which allows 85 candidates with multiple candidacies to have separate records.
+
+Usage:
+    python 004_remigrate_candidatos.py          # Upsert every candidato
+    python 004_remigrate_candidatos.py --delta  # Only new/changed rows (see quipu/delta.py)
+
+Writes go through BulkUpserter/WriteClient (quipu/write_client.py): retries with
+backoff, adaptive concurrency, and rejected rows isolated into
+data/dead_letter/quipu_candidatos.jsonl. They stay out of the manifest, so the
+next --delta run retries them.
+
+The JNE JSON is read through the Parquet cache (quipu/columnar.py), rebuilt
+only when the file changes, projecting just the fields map_candidato uses.
+
+Requires:
+    - pip install supabase python-dotenv pyarrow
 """
 
 import os
-import json
+import sys
+import argparse
 from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quipu import columnar, metrics
+from quipu.bulk_upsert import BulkUpserter
+from quipu.delta import DeltaManifest, diff_rows, report_removed
+from quipu.jne import JNE_FIELDS, candidato_key, map_candidato
+from quipu.snapshots import candidato_map as load_candidato_map, partido_map
+
 load_dotenv()
 
 DATA_DIR = Path(__file__).parent.parent / "data"
@@ -24,51 +48,28 @@ SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 def main():
     from supabase import create_client
 
+    parser = argparse.ArgumentParser(description="Re-migrate candidatos with UNIQUE(dni, cargo_eleccion)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Only upsert rows that are new or changed since the last run (local hash manifest)")
+    args = parser.parse_args()
+    metrics.start_run(Path(__file__).stem)
+
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise ValueError("Set SUPABASE_URL and SUPABASE_SERVICE_KEY in .env")
 
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = metrics.instrument_supabase(create_client(SUPABASE_URL, SUPABASE_KEY))
 
     # Load candidatos JSON
     print(f"Loading {CANDIDATOS_JSON}...")
-    with open(CANDIDATOS_JSON, 'r', encoding='utf-8') as f:
-        candidatos_raw = json.load(f)
+    candidatos_raw = columnar.read_rows("candidatos_jne", CANDIDATOS_JSON, columns=JNE_FIELDS)
 
     # Build partido_id map from existing DB
     print("Fetching partido IDs from Supabase...")
-    partido_ids = {}
-    result = supabase.table('quipu_partidos').select('id, nombre_oficial').execute()
-    for p in result.data:
-        partido_ids[p['nombre_oficial']] = p['id']
+    partido_ids = partido_map(supabase)
     print(f"  {len(partido_ids)} partidos found")
 
     # Prepare candidatos
-    candidatos = []
-    for c in candidatos_raw['candidatos']:
-        candidato = {
-            'dni': c.get('strDocumentoIdentidad'),
-            'nombres': c.get('strNombres'),
-            'apellido_paterno': c.get('strApellidoPaterno'),
-            'apellido_materno': c.get('strApellidoMaterno'),
-            'nombre_completo': f"{c.get('strNombres', '')} {c.get('strApellidoPaterno', '')} {c.get('strApellidoMaterno', '')}".strip(),
-            'sexo': c.get('strSexo'),
-            'organizacion_politica': c.get('strOrganizacionPolitica'),
-            'tipo_eleccion': c.get('strTipoEleccion'),
-            'cargo_postula': c.get('strCargo'),
-            'cargo_eleccion': c.get('idCargo'),
-            'ubigeo': c.get('strUbigeo'),
-            'departamento': c.get('strDepartamento'),
-            'provincia': c.get('strProvincia'),
-            'distrito': c.get('strDistrito'),
-            'foto_url': c.get('strNombre'),
-            'estado': c.get('strEstadoCandidato'),
-        }
-
-        org = candidato['organizacion_politica']
-        if org and org in partido_ids:
-            candidato['partido_id'] = partido_ids[org]
-
-        candidatos.append(candidato)
+    candidatos = [map_candidato(c, partido_ids) for c in candidatos_raw]
 
     # Count duplicates before insert
     from collections import Counter
@@ -83,16 +84,29 @@ def main():
     existing = supabase.table('quipu_candidatos').select('*', count='exact', head=True).execute()
     print(f"  Existing records in DB: {existing.count}")
 
-    # Upsert with new composite constraint
-    print(f"\nUpserting candidatos (on_conflict=dni,cargo_eleccion)...")
-    batch_size = 100
-    for i in range(0, len(candidatos), batch_size):
-        batch = candidatos[i:i+batch_size]
-        supabase.table('quipu_candidatos').upsert(batch, on_conflict='dni,cargo_eleccion').execute()
+    # Content-hash delta against the manifest of the last successful writes
+    manifest = DeltaManifest.for_table('quipu_candidatos', SUPABASE_URL)
+    enviar, hashes = diff_rows(manifest, candidatos, key=candidato_key, delta=args.delta)
+    print(f"  Delta: {manifest.stats.summary()}")
+    report_removed(manifest, "candidatos (dni|cargo)")
 
-        done = min(i + batch_size, len(candidatos))
-        if done % 1000 == 0 or done == len(candidatos):
-            print(f"    {done:,}/{len(candidatos):,}")
+    # Upsert with new composite constraint
+    print(f"\nUpserting {len(enviar):,} candidatos (on_conflict=dni,cargo_eleccion)...")
+
+    def commit(batch):
+        manifest.commit((candidato_key(c), hashes[candidato_key(c)]) for c in batch)
+
+    try:
+        with metrics.phase("upsert"), BulkUpserter(supabase, 'quipu_candidatos', on_conflict='dni,cargo_eleccion',
+                                                   max_batch_rows=100, total=len(enviar),
+                                                   on_sent=commit) as upserter:
+            for candidato in enviar:
+                upserter.submit(candidato)
+    finally:
+        manifest.save()
+    print(f"    {upserter.stats.summary()}")
+    if upserter.stats.dead_letter:
+        print(f"    WARNING: {upserter.stats.dead_letter} rejected rows in {upserter.writer.dead_letter_dir}/")
 
     # Verify final count
     final = supabase.table('quipu_candidatos').select('*', count='exact', head=True).execute()
@@ -101,21 +115,9 @@ def main():
 
     # Re-link hojas de vida for any new records
     print("\nRe-linking hojas de vida...")
-    # Build candidato_map (paginated)
-    candidato_map = {}
-    offset = 0
-    page_size = 1000
-    while True:
-        result = (supabase.table('quipu_candidatos')
-                  .select('id, dni')
-                  .range(offset, offset + page_size - 1)
-                  .execute())
-        for c in result.data:
-            if c.get('dni'):
-                candidato_map[c['dni']] = c['id']
-        if len(result.data) < page_size:
-            break
-        offset += page_size
+    # Build candidato_map from the local snapshot (quipu/snapshots.py)
+    candidato_map = load_candidato_map(supabase)
+    print(f"  {len(candidato_map):,} DNIs mapped")
 
     # Check hojas_vida with null candidato_id
     orphans = supabase.table('quipu_hojas_vida').select('id, id_hoja_vida, candidato_id', count='exact').is_('candidato_id', 'null').execute()
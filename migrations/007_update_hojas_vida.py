@@ -12,14 +12,49 @@ Nuevos campos:
 - indicadores (JSONB): 15 booleanos (tiene_experiencia_laboral, etc)
 - cargos_postula, titularidades, declaraciones_juradas (JSONB)
 - carne_extranjeria, ubigeo_nacimiento, ubigeo_domicilio
+
+Uso:
+    python 007_update_hojas_vida.py              # Carga todas las hojas en memoria
+    python 007_update_hojas_vida.py --stream     # De a batches, memoria acotada
+    python 007_update_hojas_vida.py --file otro_snapshot.json --stream
+    python 007_update_hojas_vida.py --stream --backend copy --database-url postgresql://...
+
+El JSON se lee del cache Parquet (quipu/columnar.py): la primera corrida con
+un snapshot nuevo lo convierte de a row groups y las siguientes leen las
+columnas tipadas sin volver a parsear los 53 MB. Con --stream y un snapshot
+sin convertir se parsea el JSON de forma incremental, sin esperar la conversión.
+
+Los upserts van por BulkUpserter (quipu/write_client.py): batches en paralelo
+con concurrencia adaptativa, reintentos con backoff y, si PostgREST rechaza un
+batch, bisección hasta aislar las filas inválidas, que quedan en
+data/dead_letter/quipu_hojas_vida.jsonl.
+
+Con --backend copy las hojas van por COPY a una staging y un solo
+INSERT ... ON CONFLICT (id_hoja_vida) directo en Postgres (quipu/pg_copy.py);
+Supabase se sigue usando para el mapa de candidatos y la verificación.
+
+Requiere:
+    - pip install supabase python-dotenv pyarrow
 """
 
 import os
-import json
+import sys
+import time
+import queue
+import argparse
+import threading
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quipu import columnar, metrics
+from quipu.bulk_upsert import BulkUpserter
+from quipu.pg_copy import CopyLoader, connect as pg_connect, database_url_from_env
+from quipu.snapshots import candidato_map as load_candidato_map
+from quipu.write_client import WriteClient
+
 load_dotenv()
 
 # Archivo fuente
@@ -123,117 +158,173 @@ def map_hoja_vida(h):
     }
 
 
-def main():
-    from supabase import create_client
+def vincular_candidato(hoja, h, candidato_map, stats):
+    """Asigna candidato_id por DNI y acumula contadores de registros sin vínculo"""
+    dni = h.get('dni') or h.get('strDocumentoIdentidad')
+    if dni:
+        if dni in candidato_map:
+            hoja['candidato_id'] = candidato_map[dni]
+        else:
+            stats['sin_candidato'] += 1
+    else:
+        stats['sin_dni'] += 1
+    return hoja
 
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        raise ValueError("Set SUPABASE_URL and SUPABASE_SERVICE_KEY in .env")
 
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def hojas_upserter(destino, batch_size, total=None, on_sent=None):
+    """
+    BulkUpserter de quipu_hojas_vida sobre el WriteClient del script, o
+    CopyLoader si `destino` es una conexión Postgres (--backend copy).
+    """
+    if isinstance(destino, WriteClient):
+        return BulkUpserter(destino.supabase, 'quipu_hojas_vida', on_conflict='id_hoja_vida',
+                            max_batch_rows=batch_size, progress_every=500, total=total,
+                            on_sent=on_sent, writer=destino)
+    return CopyLoader(destino, 'quipu_hojas_vida', conflict=('id_hoja_vida',))
 
-    # Verificar que existe el archivo JSON
-    if not JSON_FILE.exists():
-        raise FileNotFoundError(f"No se encuentra: {JSON_FILE}")
-
-    print(f"Cargando {JSON_FILE}...")
-    print(f"  Tamano: {JSON_FILE.stat().st_size / 1024 / 1024:.1f} MB")
-
-    with open(JSON_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    # El JSON tiene estructura {metadata, hojas_vida}
-    if isinstance(data, dict) and 'hojas_vida' in data:
-        hojas_raw = data['hojas_vida']
-    elif isinstance(data, list):
-        hojas_raw = data
-    elif isinstance(data, dict):
-        # Buscar la key que contiene la lista
-        for key in ['data', 'registros', 'candidatos']:
-            if key in data and isinstance(data[key], list):
-                hojas_raw = data[key]
-                break
-        else:
-            hojas_raw = list(data.values()) if all(isinstance(v, dict) for v in data.values()) else [data]
-    else:
-        raise ValueError(f"Formato JSON no reconocido: {type(data)}")
 
-    print(f"  Registros en JSON: {len(hojas_raw):,}")
+def rechazadas(upserter):
+    """Filas que terminaron en el dead-letter (COPY es todo o nada: 0 o excepción)."""
+    return upserter.stats.dead_letter if isinstance(upserter, BulkUpserter) else 0
 
-    # Contar registros existentes
-    existing = supabase.table('quipu_hojas_vida').select('*', count='exact', head=True).execute()
-    print(f"  Registros existentes en DB: {existing.count}")
 
-    # Construir mapa de candidato_id por DNI (paginado)
-    print("\nObteniendo mapa de candidatos...")
-    candidato_map = {}
-    offset = 0
-    page_size = 1000
-    while True:
-        result = (supabase.table('quipu_candidatos')
-                  .select('id, dni')
-                  .range(offset, offset + page_size - 1)
-                  .execute())
-        for c in result.data:
-            if c.get('dni'):
-                candidato_map[c['dni']] = c['id']
-        if len(result.data) < page_size:
-            break
-        offset += page_size
-    print(f"  {len(candidato_map):,} candidatos mapeados")
+def run_full(destino, json_file, candidato_map, batch_size):
+    """Modo original: lee todas las hojas, mapea todo y luego hace upsert"""
+    hojas_raw = columnar.read_rows("hojas_vida", json_file)
+    print(f"  Registros en JSON: {len(hojas_raw):,}")
 
     # Mapear hojas de vida
     print("\nMapeando hojas de vida...")
-    hojas = []
-    sin_dni = 0
-    sin_candidato = 0
-
-    for h in hojas_raw:
-        hoja = map_hoja_vida(h)
-
-        # Intentar vincular con candidato por DNI
-        dni = h.get('dni') or h.get('strDocumentoIdentidad')
-        if dni:
-            if dni in candidato_map:
-                hoja['candidato_id'] = candidato_map[dni]
-            else:
-                sin_candidato += 1
-        else:
-            sin_dni += 1
-
-        hojas.append(hoja)
+    stats = {'sin_dni': 0, 'sin_candidato': 0}
+    hojas = [vincular_candidato(map_hoja_vida(h), h, candidato_map, stats) for h in hojas_raw]
 
     print(f"  Total hojas mapeadas: {len(hojas):,}")
-    print(f"  Sin DNI: {sin_dni}")
-    print(f"  Con DNI pero sin candidato: {sin_candidato}")
+    print(f"  Sin DNI: {stats['sin_dni']}")
+    print(f"  Con DNI pero sin candidato: {stats['sin_candidato']}")
 
     # Upsert en batches
     print(f"\nUpsert hojas de vida (on_conflict=id_hoja_vida)...")
-    batch_size = 100
-    errores = 0
+    with hojas_upserter(destino, batch_size, total=len(hojas)) as upserter:
+        for hoja in hojas:
+            upserter.submit(hoja)
 
-    for i in range(0, len(hojas), batch_size):
-        batch = hojas[i:i+batch_size]
+    print(f"  {upserter.stats.summary()}")
+    return rechazadas(upserter)
+
+
+def run_streaming(destino, json_file, candidato_map, batch_size, queue_size):
+    """
+    Modo streaming: un hilo productor lee el Parquet (o el JSON, si el
+    cache no está al día) de a batches y los mapea; el hilo principal los
+    pasa al upserter. La cola acotada y el backpressure del upserter limitan
+    la memoria.
+    """
+    batches = queue.Queue(maxsize=queue_size)
+    stats = {'sin_dni': 0, 'sin_candidato': 0, 'leidos': 0}
+    fin = object()
+
+    def producer():
         try:
-            supabase.table('quipu_hojas_vida').upsert(
-                batch,
-                on_conflict='id_hoja_vida'
-            ).execute()
+            for raw in fuente:
+                stats['leidos'] += len(raw)
+                batches.put([vincular_candidato(map_hoja_vida(h), h, candidato_map, stats) for h in raw])
+            batches.put(fin)
         except Exception as e:
-            errores += 1
-            print(f"  Error en batch {i//batch_size}: {e}")
-            # Intentar uno por uno
+            batches.put(e)
+
+    # Sin cache al día se parsea el JSON incremental: convertir primero cargaría todo
+    # el snapshot antes del primer batch (014_build_parquet_cache.py lo convierte aparte)
+    if columnar.is_fresh("hojas_vida", json_file):
+        fuente = columnar.iter_batches("hojas_vida", json_file, batch_size=batch_size)
+    else:
+        print("  Snapshot sin cache Parquet: parseo incremental del JSON")
+        fuente = columnar.iter_source("hojas_vida", json_file, batch_size=batch_size)
+
+    print(f"\nUpsert en streaming (batch={batch_size}, cola={queue_size})...")
+    start = time.monotonic()
+    threading.Thread(target=producer, name="hojas-vida-parser", daemon=True).start()
+
+    primero = threading.Event()
+
+    def on_sent(batch):
+        if not primero.is_set():
+            primero.set()
+            print(f"  Primer batch escrito en {time.monotonic() - start:.1f}s")
+
+    done = 0
+    with hojas_upserter(destino, batch_size, on_sent=on_sent) as upserter:
+        while True:
+            batch = batches.get()
+            if batch is fin:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+
             for hoja in batch:
-                try:
-                    supabase.table('quipu_hojas_vida').upsert(
-                        [hoja],
-                        on_conflict='id_hoja_vida'
-                    ).execute()
-                except Exception as e2:
-                    print(f"    Error individual {hoja.get('id_hoja_vida')}: {e2}")
-
-        done = min(i + batch_size, len(hojas))
-        if done % 500 == 0 or done == len(hojas):
-            print(f"  {done:,}/{len(hojas):,}")
+                upserter.submit(hoja)
+            done += len(batch)
+
+    print(f"  Total hojas mapeadas: {done:,} en {time.monotonic() - start:.1f}s")
+    print(f"  {upserter.stats.summary()}")
+    print(f"  Sin DNI: {stats['sin_dni']}")
+    print(f"  Con DNI pero sin candidato: {stats['sin_candidato']}")
+    return rechazadas(upserter)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Actualiza quipu_hojas_vida desde el snapshot JNE")
+    parser.add_argument("--file", type=Path, default=JSON_FILE, help="JSON fuente (default: snapshot 2026-01-29)")
+    parser.add_argument("--stream", action="store_true", help="Lectura por batches con memoria acotada")
+    parser.add_argument("--batch-size", type=int, default=100, help="Hojas por upsert (default: 100)")
+    parser.add_argument("--queue-size", type=int, default=4, help="Batches en cola en modo --stream (default: 4)")
+    parser.add_argument("--in-flight", type=int, default=4,
+                        help="Máximo de batches en vuelo; baja solo ante throttling (default: 4)")
+    parser.add_argument("--backend", choices=("postgrest", "copy"), default="postgrest",
+                        help="Upserts PostgREST o COPY directo a Postgres (default: postgrest)")
+    parser.add_argument("--database-url", default=database_url_from_env(),
+                        help="Conexión Postgres para --backend copy (default: DATABASE_URL)")
+    args = parser.parse_args()
+    if args.backend == "copy" and not args.database_url:
+        parser.error("--backend copy necesita --database-url o DATABASE_URL en .env")
+    metrics.start_run(Path(__file__).stem)
+
+    from supabase import create_client
+
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("Set SUPABASE_URL and SUPABASE_SERVICE_KEY in .env")
+
+    supabase = metrics.instrument_supabase(create_client(SUPABASE_URL, SUPABASE_KEY))
+    writer = WriteClient(supabase, max_concurrency=args.in_flight)
+
+    # Verificar que existe el archivo JSON
+    json_file = args.file
+    if not json_file.exists():
+        raise FileNotFoundError(f"No se encuentra: {json_file}")
+
+    print(f"Fuente {json_file}...")
+    print(f"  Tamano: {json_file.stat().st_size / 1024 / 1024:.1f} MB")
+
+    # Contar registros existentes
+    existing = supabase.table('quipu_hojas_vida').select('*', count='exact', head=True).execute()
+    print(f"  Registros existentes en DB: {existing.count}")
+
+    # Mapa de candidato_id por DNI desde el snapshot local (quipu/snapshots.py)
+    print("\nObteniendo mapa de candidatos...")
+    with metrics.phase("candidato_map"):
+        candidato_map = load_candidato_map(supabase)
+    print(f"  {len(candidato_map):,} candidatos mapeados")
+
+    destino = writer if args.backend == "postgrest" else pg_connect(args.database_url)
+    try:
+        with metrics.phase("upsert"):
+            if args.stream:
+                errores = run_streaming(destino, json_file, candidato_map, args.batch_size, args.queue_size)
+            else:
+                print(f"Cargando {json_file}...")
+                errores = run_full(destino, json_file, candidato_map, args.batch_size)
+    finally:
+        if destino is not writer:
+            destino.close()
 
     # Verificar resultado
     print("\n" + "="*50)
@@ -266,7 +357,7 @@ def main():
     print(f"  Con indicadores: {con_indicadores.count:,}")
 
     if errores:
-        print(f"\n  ADVERTENCIA: {errores} batches con errores")
+        print(f"\n  ADVERTENCIA: {errores} hojas rechazadas, ver {writer.dead_letter_dir}/quipu_hojas_vida.jsonl")
 
     print("\nDone!")
 
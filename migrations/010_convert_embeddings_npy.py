@@ -0,0 +1,67 @@
+"""
+Convierte promesas.embedding (JSON TEXT) de promesas_v2.db a una matriz float32 .npy
+
+Genera al lado de la base:
+    data/promesas_embeddings.npy       (N x 1536 float32, se abre con mmap)
+    data/promesas_embeddings_ids.npy   (ids de promesas alineados a las filas)
+    data/promesas_embeddings.json      (metadata: dims, filas, huella de la fuente)
+
+002_migrate_to_supabase.py y 003_fix_missing_embeddings.py usan estos archivos
+si existen y están al día. La columna JSON no se modifica.
+
+Uso:
+    python 010_convert_embeddings_npy.py            # Convierte solo si está desactualizado
+    python 010_convert_embeddings_npy.py --force    # Regenera siempre
+
+Requiere:
+    - pip install numpy
+"""
+
+import sys
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quipu.embedding_store import EMBEDDINGS_NPY, EmbeddingStore, convert_sqlite
+
+DB_PATH = Path(__file__).parent.parent / "data" / "promesas_v2.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta embeddings de SQLite a .npy float32")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Base SQLite (default: data/promesas_v2.db)")
+    parser.add_argument("--out", type=Path, default=EMBEDDINGS_NPY, help="Archivo .npy de salida")
+    parser.add_argument("--force", action="store_true", help="Regenerar aunque esté al día")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if not args.force and EmbeddingStore.exists(args.out):
+            store = EmbeddingStore.load(args.out)
+            if store.is_fresh(conn):
+                print(f"{args.out.name} ya está al día ({len(store):,} x {store.dim}). Usar --force para regenerar.")
+                return
+
+        print(f"Convirtiendo embeddings de {args.db.name}...")
+        start = time.monotonic()
+        meta = convert_sqlite(conn, args.out)
+        print(f"  {meta['rows']:,} x {meta['dim']} float32 en {time.monotonic() - start:.1f}s")
+        if meta["skipped_ids"]:
+            print(f"  [WARN] {len(meta['skipped_ids'])} embeddings inválidos omitidos: {meta['skipped_ids'][:10]}...")
+    finally:
+        conn.close()
+
+    # Verificar que carga como memmap
+    start = time.perf_counter()
+    store = EmbeddingStore.load(args.out)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    size_mb = args.out.stat().st_size / 1024 / 1024
+    print(f"  {args.out.name}: {size_mb:.1f} MB, carga en {elapsed_ms:.1f} ms")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+-- =====================================================
+-- Migración: Update masivo de categorías de promesas
+-- Usada por 004_reclassify_categories_gemini.py para escribir un batch
+-- completo de reclasificaciones en un solo request (en vez de un
+-- UPDATE ... WHERE id = ? por promesa).
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION quipu_update_categorias(
+    p_ids INTEGER[],
+    p_categorias TEXT[]
+)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH cambios AS (
+        UPDATE quipu_promesas_planes p
+        SET categoria = u.categoria
+        FROM unnest(p_ids, p_categorias) AS u(id, categoria)
+        WHERE p.id = u.id
+          AND p.categoria IS DISTINCT FROM u.categoria
+        RETURNING 1
+    )
+    SELECT COUNT(*)::int FROM cambios;
+$$;
+
+-- Solo el service role (scripts de migración) puede reclasificar
+REVOKE EXECUTE ON FUNCTION quipu_update_categorias(INTEGER[], TEXT[]) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,275 @@
+"""
+Extrae promesas candidatas de los planes de gobierno (pdfs/) a promesas_v2.db
+
+Lee data/partido_pdf_map.json, extrae el texto página por página con un pool
+de procesos (rangos de PAGES_PER_TASK páginas de todos los PDFs a la vez, así
+el tiempo total depende de los cores y no de cuántos PDFs haya) y segmenta cada
+documento apenas terminan todas sus páginas.
+
+- El texto por página se cachea en data/.cache/pdf_pages/<sha256>.json: un PDF
+  que no cambió no se vuelve a abrir.
+- .extract_promesas_state.json guarda el sha256 y la versión del segmentador
+  de cada PDF ya cargado: si ninguno cambió, el script no hace nada.
+- Las promesas se insertan una vez por (partido_id, texto_original), con
+  pagina_pdf, seccion_pdf y confianza_extraccion, y con categoria
+  'sin_clasificar' para que 004_reclassify_categories_gemini.py las clasifique
+  una vez migradas. version_extraccion identifica al segmentador (1 = la
+  extracción original con LLM): un segmento que ya existía de un segmentador
+  anterior conserva id, categoría y embedding y pasa a la versión actual.
+- Al terminar, en cada partido cuyos PDFs cargados están todos
+  re-segmentados con la versión actual, se borran las promesas de versiones
+  anteriores del segmentador que el actual ya no produce. Las de la
+  extracción con LLM no se tocan.
+
+Uso:
+    python 012_extract_promesas_pdf.py                  # Solo PDFs nuevos o cambiados
+    python 012_extract_promesas_pdf.py --resumen        # Incluir también los resúmenes JNE
+    python 012_extract_promesas_pdf.py --force          # Re-segmentar todo (usa el cache de páginas)
+    python 012_extract_promesas_pdf.py --dry-run        # Extraer y contar sin escribir en la base
+
+Requiere:
+    - pip install pypdf
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import unicodedata
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quipu import metrics
+from quipu.pdf_extract import (
+    PAGES_PER_TASK, SEGMENTER_VERSION,
+    extract_pages, file_sha256, load_cached_pages, page_count, page_tasks,
+    resolve_pdf, save_cached_pages, segmentar,
+)
+from quipu.text import normalizar_espacios
+
+ROOT = Path(__file__).parent.parent
+DB_PATH = ROOT / "data" / "promesas_v2.db"
+PDF_DIR = ROOT / "pdfs"
+MAP_PATH = ROOT / "data" / "partido_pdf_map.json"
+STATE_FILE = Path(__file__).parent / ".extract_promesas_state.json"
+
+CATEGORIA_PENDIENTE = "sin_clasificar"
+VERSION_EXTRACCION = 1 + SEGMENTER_VERSION   # 1 = extracción original con LLM
+MIN_CONFIANZA = 0.5
+
+
+def load_state():
+    if STATE_FILE.exists():
+        with open(STATE_FILE, "r") as f:
+            return json.load(f)
+    return {"documentos": {}}
+
+
+def save_state(state):
+    with open(STATE_FILE, "w") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+
+
+def listar_documentos(pdf_map, pdf_dir, resumen):
+    """[(partido, info, tipo, path)] de los PDFs del mapa que existen en disco."""
+    documentos, faltantes = [], []
+    for partido, info in pdf_map["partidos"].items():
+        archivos = [("completo", info.get("pdf_completo"))]
+        if resumen:
+            archivos.append(("resumen", info.get("pdf_resumen")))
+        for tipo, nombre in archivos:
+            if not nombre:
+                continue
+            path = resolve_pdf(nombre, pdf_dir)
+            if path is None:
+                faltantes.append(nombre)
+            else:
+                documentos.append((partido, info, tipo, path))
+    return documentos, faltantes
+
+
+def get_partido_id(conn, partido, info):
+    conn.execute("""
+        INSERT OR IGNORE INTO partidos_politicos
+            (nombre_oficial, candidato_presidencial, pdf_plan_completo, pdf_resumen, total_candidatos)
+        VALUES (?, ?, ?, ?, ?)
+    """, (partido, info.get("candidato"), info.get("pdf_completo"),
+          info.get("pdf_resumen"), info.get("total_candidatos") or 0))
+    return conn.execute("SELECT id FROM partidos_politicos WHERE nombre_oficial = ?", (partido,)).fetchone()[0]
+
+
+def cargar_documento(conn, partido, info, pages, min_confianza, dry_run):
+    """Segmenta un documento e inserta sus promesas en una transacción. Devuelve (segmentos, insertadas)."""
+    segmentos = list(segmentar(pages, min_confianza))
+    if dry_run or not segmentos:
+        return len(segmentos), 0
+
+    with conn:
+        partido_id = get_partido_id(conn, partido, info)
+        contar = "SELECT COUNT(*) FROM promesas WHERE partido_id = ?"
+        antes = conn.execute(contar, (partido_id,)).fetchone()[0]
+        conn.executemany("""
+            INSERT INTO promesas
+                (partido_id, texto_original, texto_normalizado, categoria,
+                 pagina_pdf, seccion_pdf, confianza_extraccion, version_extraccion)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (partido_id, texto_original) DO UPDATE SET
+                pagina_pdf = excluded.pagina_pdf,
+                seccion_pdf = excluded.seccion_pdf,
+                confianza_extraccion = excluded.confianza_extraccion,
+                version_extraccion = excluded.version_extraccion
+            WHERE promesas.version_extraccion > 1
+        """, [
+            (partido_id, texto, normalizar_espacios(texto), CATEGORIA_PENDIENTE,
+             pagina, seccion, score, VERSION_EXTRACCION)
+            for pagina, seccion, texto, score in segmentos
+        ])
+        insertadas = conn.execute(contar, (partido_id,)).fetchone()[0] - antes
+    return len(segmentos), insertadas
+
+
+def limpiar_versiones_viejas(conn, pdf_map, state):
+    """
+    Borra las promesas de segmentadores anteriores (2 <= version_extraccion <
+    VERSION_EXTRACCION) de los partidos cuyos PDFs ya cargados están todos en
+    la versión actual; si uno no se re-segmentó (p.ej. el resumen sin
+    --resumen), sus promesas seguirían siendo de la versión vieja.
+    Devuelve (borradas, partidos pendientes).
+    """
+    borradas, pendientes = 0, []
+    # El estado usa el nombre en disco, que puede tener otra forma Unicode que el mapa
+    documentos = {unicodedata.normalize("NFC", n): d for n, d in state["documentos"].items()}
+    for partido, info in pdf_map["partidos"].items():
+        nombres = [info.get("pdf_completo"), info.get("pdf_resumen")]
+        cargados = [documentos[n] for n in (unicodedata.normalize("NFC", n) for n in nombres if n)
+                    if n in documentos]
+        if not cargados:
+            continue
+        if any(d["segmentador"] != SEGMENTER_VERSION for d in cargados):
+            pendientes.append(partido)
+            continue
+        with conn:
+            borradas += conn.execute("""
+                DELETE FROM promesas
+                WHERE partido_id = (SELECT id FROM partidos_politicos WHERE nombre_oficial = ?)
+                  AND version_extraccion BETWEEN 2 AND ?
+            """, (partido, VERSION_EXTRACCION - 1)).rowcount
+    return borradas, pendientes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extrae promesas de los PDFs de planes de gobierno")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Base SQLite (default: data/promesas_v2.db)")
+    parser.add_argument("--pdf-dir", type=Path, default=PDF_DIR, help="Carpeta de PDFs (default: pdfs/)")
+    parser.add_argument("--map", type=Path, default=MAP_PATH, help="Mapa partido → PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos de extracción (default: cores)")
+    parser.add_argument("--pages-per-task", type=int, default=PAGES_PER_TASK, help="Páginas por tarea del pool")
+    parser.add_argument("--min-confianza", type=float, default=MIN_CONFIANZA, help="Score mínimo de un segmento")
+    parser.add_argument("--resumen", action="store_true", help="Procesar también los resúmenes JNE")
+    parser.add_argument("--force", action="store_true", help="Re-segmentar aunque el PDF no haya cambiado")
+    parser.add_argument("--dry-run", action="store_true", help="No escribir en la base ni en el estado")
+    args = parser.parse_args()
+    metrics.start_run(Path(__file__).stem)
+
+    with open(args.map, "r", encoding="utf-8") as f:
+        pdf_map = json.load(f)
+    state = load_state()
+    start = time.monotonic()
+
+    documentos, faltantes = listar_documentos(pdf_map, args.pdf_dir, args.resumen)
+    print(f"PDFs en el mapa: {len(documentos)} encontrados, {len(faltantes)} faltantes")
+    for nombre in faltantes:
+        print(f"  [WARN] No existe: {nombre}")
+
+    # Qué hay que procesar y qué ya está en el cache de páginas
+    listos, por_extraer = [], []
+    for partido, info, tipo, path in documentos:
+        sha = file_sha256(path)
+        previo = state["documentos"].get(path.name)
+        if not args.force and previo == {"sha256": sha, "segmentador": SEGMENTER_VERSION}:
+            continue
+        pages = load_cached_pages(sha)
+        if pages is not None:
+            listos.append((partido, info, path, sha, pages))
+        else:
+            por_extraer.append((partido, info, path, sha))
+
+    sin_cambios = len(documentos) - len(listos) - len(por_extraer)
+    print(f"Sin cambios: {sin_cambios} | En cache: {len(listos)} | A extraer: {len(por_extraer)}")
+    if not listos and not por_extraer:
+        print("Nada que hacer. Usar --force para re-segmentar.")
+        return
+
+    conn = None if args.dry_run else sqlite3.connect(args.db)
+    stats = {"documentos": 0, "paginas": 0, "segmentos": 0, "insertadas": 0, "borradas": 0}
+
+    def terminar(partido, info, path, sha, pages):
+        segmentos, insertadas = cargar_documento(conn, partido, info, pages, args.min_confianza, args.dry_run)
+        stats["documentos"] += 1
+        stats["paginas"] += len(pages)
+        stats["segmentos"] += segmentos
+        stats["insertadas"] += insertadas
+        print(f"  {path.name}: {len(pages)} págs, {segmentos} segmentos, {insertadas} nuevas")
+        if not args.dry_run:
+            state["documentos"][path.name] = {"sha256": sha, "segmentador": SEGMENTER_VERSION}
+            save_state(state)
+
+    try:
+        with metrics.phase("desde_cache"):
+            for doc in listos:
+                terminar(*doc)
+
+        if por_extraer:
+            with metrics.phase("extraccion"), ProcessPoolExecutor(max_workers=args.workers) as pool:
+                paths = [str(path) for _, _, path, _ in por_extraer]
+                totales = dict(zip(paths, pool.map(page_count, paths)))
+
+                pendientes = {}   # path → [páginas, tareas restantes, doc]
+                futures = []
+                for partido, info, path, sha in por_extraer:
+                    tareas = page_tasks(path, totales[str(path)], args.pages_per_task)
+                    pendientes[str(path)] = [[""] * totales[str(path)], len(tareas), (partido, info, path, sha)]
+                    futures.extend(pool.submit(extract_pages, *t) for t in tareas)
+                print(f"Extrayendo {sum(totales.values()):,} páginas en {len(futures)} tareas "
+                      f"({args.workers} procesos)...")
+
+                for future in as_completed(futures):
+                    path, inicio, textos = future.result()
+                    pages, restantes, doc = pendientes[path]
+                    pages[inicio:inicio + len(textos)] = textos
+                    pendientes[path][1] = restantes - 1
+                    if restantes == 1:
+                        partido, info, pdf_path, sha = doc
+                        save_cached_pages(sha, pdf_path.name, pages)
+                        terminar(partido, info, pdf_path, sha, pages)
+                        del pendientes[path]
+
+        if not args.dry_run:
+            borradas, sin_limpiar = limpiar_versiones_viejas(conn, pdf_map, state)
+            stats["borradas"] = borradas
+            if sin_limpiar:
+                print(f"  [WARN] Con PDFs de un segmentador anterior (correr con --resumen/--force): "
+                      f"{', '.join(sin_limpiar)}")
+    except KeyboardInterrupt:
+        print("\n[INTERRUMPIDO] Los documentos terminados quedaron guardados; correr de nuevo para seguir.")
+    finally:
+        if conn is not None:
+            conn.close()
+
+    elapsed = time.monotonic() - start
+    print(f"\n{'=' * 50}")
+    print(f"Documentos: {stats['documentos']} | Páginas: {stats['paginas']:,}")
+    print(f"Segmentos: {stats['segmentos']:,} | Insertadas: {stats['insertadas']:,} | "
+          f"Borradas (segmentador anterior): {stats['borradas']:,}")
+    print(f"Tiempo: {elapsed:.1f}s")
+    if stats["insertadas"]:
+        print("Siguiente paso: 003_fix_missing_embeddings.py, 002_migrate_to_supabase.py --delta "
+              "y 004_reclassify_categories_gemini.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Procesa las fotos de candidatos (foto_url del JNE) a miniaturas WebP
+
+1. Baja las fotos originales que todavía no están en data/.cache/fotos/
+   (con --refetch revalida las conocidas con ETag / Last-Modified)
+2. Deduplica por sha256 del contenido: ~8,100 candidatos, bastantes menos fotos
+3. Genera las variantes de cada foto nueva en un pool de procesos
+   (data/fotos/<key>/s64.webp, s128, s192, w320, w640)
+4. Con --upload las sube al bucket candidatos-fotos y guarda la key en
+   quipu_candidatos.foto_local (fase3/migrations/025_candidato_fotos.sql)
+
+data/fotos/manifest.json mapea foto_url → key, key → variantes y
+candidato id → {dni, key}. En una re-ejecución solo se bajan fotos nuevas y
+solo se procesan/suben keys que no estaban.
+
+Uso:
+    python 013_process_candidato_fotos.py                 # Bajar y procesar lo nuevo
+    python 013_process_candidato_fotos.py --upload        # Además subir y actualizar foto_local
+    python 013_process_candidato_fotos.py --refetch       # Revalidar también las fotos conocidas
+    python 013_process_candidato_fotos.py --force         # Regenerar todas las variantes
+
+Requiere:
+    - pip install supabase python-dotenv pillow
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quipu import metrics
+from quipu.photos import (
+    OUTPUT_DIR, PIPELINE_VERSION,
+    asset_ok, download, load_manifest, original_path, render_variants, save_manifest, variant_names,
+)
+from quipu.snapshots import load_snapshot
+
+load_dotenv()
+
+BUCKET = "candidatos-fotos"
+DOWNLOAD_WORKERS = 16
+UPLOAD_WORKERS = 8
+RPC_BATCH = 1000
+CACHE_CONTROL = "31536000"   # Las keys son hashes de contenido: inmutables
+
+
+def descargar(urls, manifest, refetch, workers):
+    """Baja las fotos en paralelo (I/O) y actualiza manifest['sources']."""
+    sources = manifest["sources"]
+    pendientes = [u for u in urls if refetch or u not in sources or not original_path(u).exists()]
+    print(f"Fotos referenciadas: {len(urls):,} | A descargar: {len(pendientes):,}")
+    errores = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(download, url, sources.get(url)): url for url in pendientes}
+        for i, future in enumerate(as_completed(futures), 1):
+            url = futures[future]
+            try:
+                sources[url] = future.result()
+            except Exception as e:
+                errores += 1
+                if errores <= 10:
+                    print(f"  [WARN] {url}: {e}")
+            if i % 500 == 0:
+                print(f"  {i:,}/{len(pendientes):,} descargadas")
+    if errores:
+        print(f"  [WARN] {errores:,} fotos no se pudieron bajar (se reintentan en la próxima corrida)")
+
+
+def procesar(keys, origen, manifest, output_dir, force, workers):
+    """Genera las variantes de las keys que faltan en un pool de procesos."""
+    assets = manifest["assets"]
+    pendientes = [k for k in keys if force or not asset_ok(assets.get(k), output_dir / k)]
+    print(f"Fotos únicas: {len(keys):,} | A procesar: {len(pendientes):,}")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_variants, str(origen[k]), str(output_dir / k)): k for k in pendientes}
+        for i, future in enumerate(as_completed(futures), 1):
+            key = futures[future]
+            try:
+                _, variants = future.result()
+            except Exception as e:   # Imagen corrupta o formato no soportado
+                print(f"  [WARN] {key}: {e}")
+                continue
+            assets[key] = {"version": PIPELINE_VERSION, "variants": variants, "uploaded": False}
+            if i % 500 == 0:
+                print(f"  {i:,}/{len(pendientes):,} procesadas")
+                save_manifest(manifest, output_dir)
+
+
+def subir(supabase, manifest, output_dir, workers):
+    """Sube al bucket las keys que todavía no se subieron."""
+    storage = supabase.storage.from_(BUCKET)
+    pendientes = [k for k, a in manifest["assets"].items() if not a.get("uploaded")]
+    print(f"Subiendo {len(pendientes):,} fotos a {BUCKET}...")
+
+    def subir_key(key):
+        for name in variant_names():
+            with open(output_dir / key / f"{name}.webp", "rb") as f:
+                storage.upload(f"{key}/{name}.webp", f.read(), file_options={
+                    "content-type": "image/webp",
+                    "cache-control": CACHE_CONTROL,
+                    "upsert": "true",
+                })
+        return key
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(subir_key, k) for k in pendientes]
+        for future in as_completed(futures):
+            try:
+                manifest["assets"][future.result()]["uploaded"] = True
+            except Exception as e:
+                print(f"  [WARN] {e}")
+
+
+def actualizar_foto_local(supabase, candidatos, manifest):
+    """Escribe foto_local solo donde cambió y la key ya está en el bucket."""
+    assets = manifest["assets"]
+    cambios = [
+        (c["id"], info["key"]) for c in candidatos
+        if (info := manifest["candidatos"].get(str(c["id"])))
+        and assets.get(info["key"], {}).get("uploaded")
+        and c.get("foto_local") != info["key"]
+    ]
+    actualizadas = 0
+    for i in range(0, len(cambios), RPC_BATCH):
+        lote = cambios[i:i + RPC_BATCH]
+        actualizadas += supabase.rpc("quipu_set_candidato_fotos", {
+            "p_ids": [cid for cid, _ in lote],
+            "p_keys": [key for _, key in lote],
+        }).execute().data or 0
+    print(f"foto_local actualizado en {actualizadas:,} candidatos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Miniaturas WebP de fotos de candidatos")
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR, help="Carpeta de salida (default: data/fotos)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos para generar variantes")
+    parser.add_argument("--download-workers", type=int, default=DOWNLOAD_WORKERS, help="Descargas en paralelo")
+    parser.add_argument("--refetch", action="store_true", help="Revalidar fotos ya descargadas")
+    parser.add_argument("--force", action="store_true", help="Regenerar variantes aunque existan")
+    parser.add_argument("--upload", action="store_true", help="Subir al bucket y actualizar foto_local")
+    args = parser.parse_args()
+    metrics.start_run(Path(__file__).stem)
+
+    supabase = metrics.instrument_supabase(create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY")))
+    start = time.monotonic()
+    manifest = load_manifest(args.output)
+
+    print("Cargando candidatos...")
+    with metrics.phase("candidatos"):
+        candidatos = load_snapshot(supabase, "quipu_candidatos", columns="id, dni, foto_url, foto_local", refresh=True).rows
+    urls = sorted({c["foto_url"] for c in candidatos if c.get("foto_url")})
+
+    with metrics.phase("descarga"):
+        descargar(urls, manifest, args.refetch, args.download_workers)
+    save_manifest(manifest, args.output)
+
+    origen = {}
+    for url in urls:
+        if url in manifest["sources"]:
+            origen.setdefault(manifest["sources"][url]["key"], original_path(url))
+    with metrics.phase("variantes"):
+        procesar(sorted(origen), origen, manifest, args.output, args.force, args.workers)
+
+    manifest["candidatos"] = {
+        str(c["id"]): {"dni": c.get("dni"), "key": manifest["sources"][c["foto_url"]]["key"]}
+        for c in candidatos
+        if c.get("foto_url") in manifest["sources"] and manifest["sources"][c["foto_url"]]["key"] in manifest["assets"]
+    }
+    save_manifest(manifest, args.output)
+
+    if args.upload:
+        with metrics.phase("subida"):
+            subir(supabase, manifest, args.output, UPLOAD_WORKERS)
+        save_manifest(manifest, args.output)
+        with metrics.phase("foto_local"):
+            actualizar_foto_local(supabase, candidatos, manifest)
+
+    bytes_thumb = sum(a["variants"]["s128"]["bytes"] for a in manifest["assets"].values())
+    n_assets = len(manifest["assets"]) or 1
+    print(f"\n{'=' * 50}")
+    print(f"Candidatos con foto: {len(manifest['candidatos']):,} | Fotos únicas: {len(manifest['assets']):,}")
+    print(f"Miniatura s128 promedio: {bytes_thumb / n_assets / 1024:.1f} KB")
+    print(f"Tiempo: {time.monotonic() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Convierte las fuentes del JNE al cache Parquet (data/.cache/parquet/)
+
+- data/candidatos_jne_2026.json    → candidatos_jne
+- data/hojas_vida_completas.json   → hojas_vida
+- snapshot de hojas de vida de 007 → hojas_vida (o los que se pasen con --hojas-vida)
+- excel/CANDIDATOS_JNE_2026.xlsx   → candidatos_xlsx (hoja Consolidado)
+
+002, 004_remigrate y 007 convierten solos lo que les falta al leer; este
+script sirve para hacerlo por adelantado (p.ej. apenas llega un snapshot
+nuevo) y para ver qué secciones quedaron como texto JSON en vez de
+columnas anidadas. Una fuente que no cambió (tamaño y mtime) no se toca.
+
+Uso:
+    python 014_build_parquet_cache.py                 # Convierte lo que cambió
+    python 014_build_parquet_cache.py --force         # Reconvierte todo
+    python 014_build_parquet_cache.py --hojas-vida C:/ruta/hojas_vida_jne_2026_otro.json
+
+Requiere:
+    - pip install pyarrow openpyxl
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quipu import columnar, metrics
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "data"
+EXCEL_DIR = ROOT / "excel"
+
+SOURCES = [
+    ("candidatos_jne", DATA_DIR / "candidatos_jne_2026.json"),
+    ("hojas_vida", DATA_DIR / "hojas_vida_completas.json"),
+    ("candidatos_xlsx", EXCEL_DIR / "CANDIDATOS_JNE_2026.xlsx"),
+]
+# Snapshot que lee 007_update_hojas_vida.py por defecto
+HOJAS_VIDA_SNAPSHOT = Path("C:/Entornos/candidatos/actualizar_vidas/hojas_vida_jne_2026_20260129_143748.json")
+
+
+def convertir(kind, source, force):
+    if not source.exists():
+        print(f"  [SKIP] {source.name} no encontrado")
+        return
+    path = columnar.parquet_path(kind, source)
+    if not force and columnar.is_fresh(kind, source):
+        print(f"  [OK] {source.name}: al día ({path.name})")
+        return
+
+    start = time.monotonic()
+    with metrics.phase(kind):
+        path, filas, json_columns = columnar.convert(kind, source)
+    origen, destino = source.stat().st_size / 1e6, path.stat().st_size / 1e6
+    print(f"  ✓ {source.name} → {path.name}: {filas:,} registros, "
+          f"{origen:.1f} MB → {destino:.1f} MB en {time.monotonic() - start:.1f}s")
+    if json_columns:
+        print(f"    Como texto JSON (no entran en un tipo Arrow): {', '.join(json_columns)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte las fuentes JNE al cache Parquet")
+    parser.add_argument("--force", action="store_true", help="Reconvertir aunque la fuente no haya cambiado")
+    parser.add_argument("--hojas-vida", type=Path, action="append",
+                        help="Snapshot(s) de hojas de vida adicionales (default: el de 007)")
+    args = parser.parse_args()
+    metrics.start_run(Path(__file__).stem)
+
+    sources = SOURCES + [("hojas_vida", p) for p in (args.hojas_vida or [HOJAS_VIDA_SNAPSHOT])]
+    print(f"Cache Parquet en {columnar.PARQUET_DIR}")
+    for kind, source in sources:
+        convertir(kind, source, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+Utilidades compartidas por los scripts de migración y sincronización de Quipu.
+
+Los scripts de migrations/ y fase3/scripts/ se ejecutan sueltos, así que agregan
+la raíz del repo a sys.path antes de importar este paquete:
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+"""
@@ -0,0 +1,146 @@
+"""
+Upsert masivo a Supabase con batches por tamaño de payload y varios requests en vuelo.
+
+El productor (normalmente el hilo que lee SQLite/JSON) llama a submit() por
+fila; las filas se agrupan hasta `max_batch_bytes` de JSON serializado y cada
+batch se envía en un pool de hilos. Un semáforo limita los batches en vuelo,
+así que si la red es más lenta que la lectura el productor se bloquea en vez
+de acumular memoria.
+
+Cada batch se escribe con WriteClient (quipu/write_client.py): reintentos con
+backoff y jitter, concurrencia AIMD (max_in_flight es el techo) y bisección
+de batches rechazados, con las filas que fallan solas al dead-letter.
+on_sent recibe solo las filas efectivamente escritas.
+"""
+
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from quipu.write_client import WriteClient
+
+
+@dataclass
+class UpsertStats:
+    rows: int = 0
+    bytes: int = 0
+    batches: int = 0
+    retries: int = 0
+    dead_letter: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: float = None
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_s(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_s(self):
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"{self.rows:,} filas, {self.batches:,} batches, {self.bytes / 1e6:.1f} MB "
+                f"en {self.elapsed:.1f}s ({self.rows_per_s:,.0f} filas/s, "
+                f"{self.bytes_per_s / 1e6:.2f} MB/s, {self.retries} reintentos"
+                + (f", {self.dead_letter} al dead-letter)" if self.dead_letter else ")"))
+
+
+class BulkUpserter:
+    """Agrupa filas por bytes y las envía con upsert concurrente."""
+
+    def __init__(self, supabase, table, on_conflict=None, max_batch_bytes=2_000_000,
+                 max_batch_rows=500, max_in_flight=4, max_retries=6, progress_every=1000,
+                 total=None, on_sent=None, writer=None):
+        """
+        on_sent: callback opcional con las filas escritas de cada batch (desde el hilo del pool).
+        writer: WriteClient compartido (p.ej. entre tablas de un mismo script); si no, uno propio.
+        """
+        self.supabase = supabase
+        self.writer = writer or WriteClient(supabase, max_concurrency=max_in_flight, max_retries=max_retries)
+        self.table = table
+        self.on_conflict = on_conflict
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_rows = max_batch_rows
+        self.progress_every = progress_every
+        self.total = total
+        self.on_sent = on_sent
+
+        self.stats = UpsertStats()
+        self._batch = []
+        self._batch_bytes = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"upsert-{table}")
+        self._error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True)
+
+    def submit(self, row):
+        """Encola una fila; envía el batch actual si supera los límites."""
+        self._raise_if_failed()
+        size = len(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+        if self._batch and (self._batch_bytes + size > self.max_batch_bytes
+                            or len(self._batch) >= self.max_batch_rows):
+            self.flush()
+        self._batch.append(row)
+        self._batch_bytes += size
+
+    def flush(self):
+        if not self._batch:
+            return
+        batch, size = self._batch, self._batch_bytes
+        self._batch, self._batch_bytes = [], 0
+        self._slots.acquire()  # backpressure: espera si ya hay max_in_flight batches
+        self._executor.submit(self._send, batch, size)
+
+    def close(self):
+        """Envía lo pendiente, espera a que terminen todos los batches y devuelve las estadísticas."""
+        self.flush()
+        self._executor.shutdown(wait=True)
+        self.stats.finished = time.monotonic()
+        self._raise_if_failed()
+        return self.stats
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+
+    def _send(self, batch, size):
+        try:
+            result = self.writer.upsert(self.table, batch, on_conflict=self.on_conflict)
+            with self._lock:
+                self.stats.retries += result.retries
+                self.stats.dead_letter += len(result.failed)
+            if result.failed:
+                size = size * len(result.written) // len(batch)
+            self._record(len(result.written), size)
+            if self.on_sent is not None and result.written:
+                self.on_sent(result.written)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._slots.release()
+
+    def _record(self, rows, size):
+        with self._lock:
+            prev = self.stats.rows
+            self.stats.rows += rows
+            self.stats.bytes += size
+            self.stats.batches += 1
+            if self.progress_every and self.stats.rows // self.progress_every > prev // self.progress_every:
+                total = f"/{self.total:,}" if self.total else ""
+                print(f"    {self.stats.rows:,}{total} {self.table} "
+                      f"({self.stats.rows_per_s:,.0f} filas/s, {self.stats.bytes_per_s / 1e6:.2f} MB/s)")
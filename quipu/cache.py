@@ -0,0 +1,64 @@
+"""
+Cache clave → valor persistente en un archivo SQLite local.
+
+Pensado para resultados caros de recomputar (embeddings, clasificaciones
+LLM). Es seguro usarlo desde varios hilos: una sola conexión protegida por
+un lock, con escrituras en lote.
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# QUIPU_CACHE_DIR permite aislar el cache (p.ej. benchmarks/ corre con uno temporal)
+CACHE_DIR = Path(os.getenv("QUIPU_CACHE_DIR") or Path(__file__).resolve().parent.parent / "data" / ".cache")
+
+
+class SqliteCache:
+    def __init__(self, path, table="cache"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        self.conn.commit()
+
+    def get_many(self, keys):
+        """Dict con los valores encontrados para `keys` (las faltantes no aparecen)."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, value in self.conn.execute(
+                        f"SELECT key, value FROM {self.table} WHERE key IN ({marks})", chunk):
+                    found[key] = value
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """Guarda pares (key, value); sobrescribe si ya existían."""
+        items = list(items)
+        if not items:
+            return
+        with self.lock:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)", items)
+            self.conn.commit()
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,153 @@
+"""
+Resolución local de stakeholders (texto libre de medios) → quipu_candidatos.
+
+Carga candidatos y quipu_stakeholder_aliases una sola vez y arma índices
+normalizados en memoria. El orden de resolución sigue auto_match_stakeholder
+(fase3/migrations/010_stakeholder_aliases.sql):
+
+1. alias conocido (usa su confidence; un alias verificado sin candidato
+   se respeta como "sin match")
+2. nombre completo exacto → 1.0
+3. apellidos/nombres: bloqueo por tokens de apellido, score por cobertura
+   de tokens y apellido paterno; desempate por partido y cargo
+
+Los resultados se memoizan por stakeholder normalizado, así que resolver la
+misma mención miles de veces cuesta un lookup de dict.
+"""
+
+import re
+from collections import defaultdict, namedtuple
+
+from quipu.snapshots import fetch_all, load_snapshot
+from quipu.text import normalizar
+
+Resolucion = namedtuple("Resolucion", ["candidato_id", "confidence", "method"])
+
+SIN_MATCH = Resolucion(None, 0.0, "none")
+STOPWORDS = {"de", "del", "la", "las", "los", "y", "e"}
+MAX_CONFIDENCE_APELLIDOS = 0.95
+
+
+def normalize_stakeholder(texto):
+    """Equivalente Python de normalize_stakeholder() en SQL."""
+    texto = re.sub(r"[^a-z0-9\s]", "", normalizar(texto or ""))
+    return " ".join(texto.split())
+
+
+def orden_cargo(cargo):
+    """Mismo orden que v_quipu_candidatos_unicos (menor = más importante)."""
+    cargo = (cargo or "").upper()
+    if "PRESIDENTE DE LA REP" in cargo:
+        return 1
+    if "VICEPRESIDENTE" in cargo:
+        return 2
+    if "SENADOR" in cargo:
+        return 3
+    if "DIPUTADO" in cargo:
+        return 4
+    return 5
+
+
+def _tokens(texto):
+    return [t for t in normalize_stakeholder(texto).split() if t not in STOPWORDS]
+
+
+class CandidatoResolver:
+    def __init__(self, candidatos, aliases=()):
+        self.candidatos = candidatos
+        self.full_names = defaultdict(list)
+        self.apellidos = defaultdict(set)   # token de apellido -> índices de candidatos
+        self.vocab = set()
+        self.tokens = []                    # por candidato: (paterno, materno, nombres)
+
+        for i, c in enumerate(candidatos):
+            paterno = set(_tokens(c.get("apellido_paterno")))
+            materno = set(_tokens(c.get("apellido_materno")))
+            nombres = set(_tokens(c.get("nombres")))
+            if not (paterno or materno) and c.get("nombre_completo"):
+                # Sin apellidos separados: asumir que los dos últimos tokens son apellidos
+                partes = _tokens(c["nombre_completo"])
+                paterno, materno, nombres = set(partes[-2:-1]), set(partes[-1:]), set(partes[:-2])
+            self.tokens.append((paterno, materno, nombres))
+            for t in paterno | materno:
+                self.apellidos[t].add(i)
+            self.vocab |= paterno | materno | nombres
+            if c.get("nombre_completo"):
+                self.full_names[normalize_stakeholder(c["nombre_completo"])].append(i)
+
+        self.aliases = {}
+        for a in aliases:
+            key = a.get("alias_normalized") or normalize_stakeholder(a.get("alias"))
+            if a.get("candidato_id") is not None or a.get("verified"):
+                self.aliases[key] = a
+
+        self._memo = {}
+
+    @classmethod
+    def from_supabase(cls, supabase):
+        # Candidatos desde el snapshot local; los aliases cambian seguido y se leen siempre
+        candidatos = load_snapshot(supabase, "quipu_candidatos").rows
+        aliases = fetch_all(
+            supabase, "quipu_stakeholder_aliases",
+            "id, alias, alias_normalized, candidato_id, confidence, match_method, verified")
+        return cls(candidatos, aliases)
+
+    def resolve(self, stakeholder, partido_id=None):
+        """Resolucion(candidato_id, confidence, method) para un texto de stakeholder."""
+        norm = normalize_stakeholder(stakeholder)
+        key = (norm, partido_id)
+        if key not in self._memo:
+            self._memo[key] = self._resolve(norm, partido_id)
+        return self._memo[key]
+
+    def _mejor(self, indices, partido_id):
+        """Entre registros empatados, preferir el partido indicado y el cargo más alto."""
+        return min(indices, key=lambda i: (
+            partido_id is not None and self.candidatos[i].get("partido_id") != partido_id,
+            orden_cargo(self.candidatos[i].get("cargo_postula")),
+            self.candidatos[i]["id"],
+        ))
+
+    def _resolve(self, norm, partido_id):
+        if len(norm) < 3:
+            return SIN_MATCH
+
+        alias = self.aliases.get(norm)
+        if alias is not None:
+            if alias.get("candidato_id") is None:
+                return SIN_MATCH
+            return Resolucion(alias["candidato_id"], float(alias.get("confidence") or 0), "alias")
+
+        exactos = self.full_names.get(norm)
+        if exactos:
+            return Resolucion(self.candidatos[self._mejor(exactos, partido_id)]["id"], 1.0, "exact")
+
+        # Tokens que son nombres/apellidos conocidos (ignora "congresista", "alcalde", etc.)
+        tokens = {t for t in norm.split() if t not in STOPWORDS and t in self.vocab}
+        bloque = set()
+        for t in tokens:
+            bloque |= self.apellidos.get(t, set())
+        if not bloque:
+            return SIN_MATCH
+
+        scores = defaultdict(list)
+        for i in bloque:
+            paterno, materno, nombres = self.tokens[i]
+            todos = paterno | materno | nombres
+            cobertura = len(tokens & todos) / len(tokens)
+            score = (0.5 * cobertura
+                     + 0.3 * bool(tokens & paterno)
+                     + 0.2 * bool(tokens & (materno | nombres)))
+            scores[round(score, 4)].append(i)
+
+        top = max(scores)
+        empatados = scores[top]
+        if partido_id is not None:
+            del_partido = [i for i in empatados if self.candidatos[i].get("partido_id") == partido_id]
+            empatados = del_partido or empatados
+
+        # Un DNI puede tener varias postulaciones: cuentan como una sola persona
+        personas = {self.candidatos[i].get("dni") or self.candidatos[i]["id"] for i in empatados}
+        confidence = min(top, MAX_CONFIDENCE_APELLIDOS) / len(personas)
+        return Resolucion(self.candidatos[self._mejor(empatados, partido_id)]["id"],
+                          round(confidence, 2), "apellidos")
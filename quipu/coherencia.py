@@ -0,0 +1,71 @@
+"""
+Matching batch declaraciones → promesas (quipu_promesa_declaracion).
+
+Reproduce buscar_promesas_para_declaracion (fase3/migrations/005_quipu_coherencia.sql)
+para muchas declaraciones a la vez:
+
+- similitud = 1 - distancia coseno, corte estricto `> threshold`, top `limit`
+- si la declaración tiene candidato, solo promesas del partido de ese
+  candidato (un candidato sin partido no matchea nada, como en SQL);
+  sin candidato, todas las promesas
+
+Las declaraciones se agrupan por partido y cada grupo se resuelve con
+PromesaSearchIndex.search_raw: producto matricial por bloques contra la
+submatriz del partido + argpartition.
+
+Requiere:
+    - pip install numpy
+"""
+
+import json
+from collections import defaultdict
+
+import numpy as np
+
+from quipu.semantic_search import normalize_rows
+
+SIN_PARTIDO = object()  # candidato vinculado pero sin partido_id
+
+
+def parse_vector(value):
+    """Embedding de PostgREST (texto '[0.1,...]' o lista) → lista de floats, o None."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+def partido_de(candidato_id, candidato_partidos):
+    """Clave de grupo: None = sin filtro, SIN_PARTIDO = no matchea, o el partido_id."""
+    if candidato_id is None:
+        return None
+    partido_id = candidato_partidos.get(candidato_id)
+    return SIN_PARTIDO if partido_id is None else partido_id
+
+
+def match_declaraciones(index, declaracion_ids, matrix, grupos, threshold=0.7, limit=5, block_size=1024):
+    """
+    Genera (promesa_id, declaracion_id, similarity) para cada declaración.
+
+    index: PromesaSearchIndex de las promesas.
+    declaracion_ids, matrix: ids y embeddings (n, d) alineados.
+    grupos: clave de partido por declaración (ver partido_de).
+    """
+    matrix = normalize_rows(matrix)
+    por_grupo = defaultdict(list)
+    for fila, grupo in enumerate(grupos):
+        if grupo is not SIN_PARTIDO:
+            por_grupo[grupo].append(fila)
+
+    for grupo, filas in por_grupo.items():
+        filas = np.asarray(filas)
+        resultados = index.search_raw(matrix[filas], threshold, limit,
+                                      filter_partido_id=grupo, block_size=block_size)
+        for fila, (r_idx, r_sims) in zip(filas, resultados):
+            declaracion_id = int(declaracion_ids[fila])
+            for i, sim in zip(r_idx, r_sims):
+                yield int(index.ids[i]), declaracion_id, round(float(sim), 6)
@@ -0,0 +1,370 @@
+"""
+Cache columnar (Parquet) de las fuentes del JNE.
+
+candidatos_jne_2026.json, las hojas de vida (hojas_vida_completas.json y el
+snapshot de 53 MB) y excel/CANDIDATOS_JNE_2026.xlsx se convierten una vez a
+data/.cache/parquet/. Cada clave de primer nivel de un registro es una
+columna tipada; las secciones JSONB (educacion, bienes, sentencias,
+experiencia_laboral, ...) quedan como columnas anidadas (struct / list), así
+que leer dni y hv_id no decodifica la historia educativa ni patrimonial.
+
+Los registros mantienen el orden del archivo fuente y las claves originales
+del JNE: quipu/jne.py y los map_* de los scripts se aplican igual que sobre
+el JSON. Normalización al convertir:
+- hojas de vida: hv_id (o id_hoja_vida) y dni (o strDocumentoIdentidad) como
+  texto en las columnas `hv_id` y `dni`
+- candidatos JNE: strDocumentoIdentidad como texto
+- Excel: hoja Consolidado, columnas en snake_case sin tildes, Posicion
+  entera y Fecha Nacimiento como fecha
+
+Una sección cuyo contenido no sobrevive la conversión a un tipo Arrow (tipos
+mezclados entre registros, objetos con claves distintas, objetos vacíos) se
+guarda como texto JSON y se decodifica al leer; convert() las informa.
+
+El Parquet se regenera solo si cambia el tamaño o el mtime de la fuente.
+
+Uso:
+    from quipu import columnar
+
+    rows = columnar.read_rows("hojas_vida", HOJAS_VIDA_JSON, columns=["hv_id", "dni", "estado_hv"],
+                              filters=[("estado_hv", "=", "CONFIRMADA")])
+    for batch in columnar.iter_batches("hojas_vida", path, batch_size=500):
+        ...
+
+`filters` es la forma DNF de pyarrow ([(col, op, valor), ...]); se evalúa
+sobre las estadísticas de cada row group antes de leerlo.
+
+Requiere:
+    - pip install pyarrow
+    - pip install openpyxl (solo candidatos_xlsx)
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+from quipu.cache import CACHE_DIR
+from quipu.json_stream import iter_json_array
+from quipu.text import normalizar
+
+PARQUET_DIR = CACHE_DIR / "parquet"
+FORMAT_VERSION = 1
+ROW_GROUP_ROWS = 512         # Registros por chunk de conversión y por row group
+COMPRESSION = "zstd"
+
+# Claves bajo las que viene la lista de registros en cada export
+LIST_KEYS = {
+    "candidatos_jne": ("candidatos",),
+    "hojas_vida": ("hojas_vida", "data", "registros", "candidatos"),
+}
+XLSX_SHEET = "Consolidado"
+KINDS = ("candidatos_jne", "hojas_vida", "candidatos_xlsx")
+
+_META = b"quipu"
+
+
+def parquet_path(kind, source, cache_dir=PARQUET_DIR):
+    """Ruta del Parquet de `source` (una por archivo fuente, aunque se llamen igual)."""
+    source = Path(source).resolve()
+    digest = hashlib.sha1(str(source).encode("utf-8")).hexdigest()[:8]
+    return Path(cache_dir) / f"{kind}.{source.stem}.{digest}.parquet"
+
+
+def _source_info(source):
+    st = os.stat(source)
+    return {"source": str(Path(source).resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _metadata(path):
+    import pyarrow.parquet as pq
+
+    try:
+        raw = (pq.read_schema(path).metadata or {}).get(_META)
+    except (OSError, ValueError):
+        return None
+    return json.loads(raw) if raw else None
+
+
+def is_fresh(kind, source, cache_dir=PARQUET_DIR):
+    meta = _metadata(parquet_path(kind, source, cache_dir))
+    return (meta is not None
+            and meta.get("version") == FORMAT_VERSION
+            and meta.get("kind") == kind
+            and {k: meta.get(k) for k in ("source", "size", "mtime_ns")} == _source_info(source))
+
+
+# --- lectura de las fuentes ---
+
+def _hojas_vida(path):
+    for h in iter_json_array(path, keys=LIST_KEYS["hojas_vida"]):
+        hv_id = h.get("hv_id") or h.get("id_hoja_vida")
+        dni = h.get("dni") or h.get("strDocumentoIdentidad")
+        yield {**h, "hv_id": str(hv_id) if hv_id else None, "dni": str(dni) if dni else None}
+
+
+def _candidatos_jne(path):
+    for c in iter_json_array(path, keys=LIST_KEYS["candidatos_jne"]):
+        dni = c.get("strDocumentoIdentidad")
+        yield {**c, "strDocumentoIdentidad": str(dni) if dni else None}
+
+
+def _columna_xlsx(nombre):
+    return "_".join(normalizar(str(nombre)).replace("/", " ").split())
+
+
+def _celda_xlsx(columna, valor):
+    if isinstance(valor, str):
+        valor = valor.strip() or None
+    if valor is None:
+        return None
+    if columna == "dni":
+        return str(valor)
+    if columna == "posicion":
+        return int(valor) if str(valor).isdigit() else None
+    if columna == "fecha_nacimiento" and isinstance(valor, str):
+        try:
+            return datetime.strptime(valor, "%d/%m/%Y").date()
+        except ValueError:
+            return None
+    return valor
+
+
+def _candidatos_xlsx(path):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        filas = wb[XLSX_SHEET].iter_rows(values_only=True)
+        columnas = [_columna_xlsx(c) for c in next(filas)]
+        for fila in filas:
+            if any(v is not None for v in fila):
+                yield {col: _celda_xlsx(col, v) for col, v in zip(columnas, fila)}
+    finally:
+        wb.close()
+
+
+READERS = {
+    "candidatos_jne": _candidatos_jne,
+    "hojas_vida": _hojas_vida,
+    "candidatos_xlsx": _candidatos_xlsx,
+}
+
+
+# --- conversión ---
+
+def _sin_struct_vacio(tipo):
+    """Parquet no puede escribir structs sin campos (objetos {} en todos los registros)."""
+    import pyarrow as pa
+
+    if pa.types.is_struct(tipo):
+        return tipo.num_fields > 0 and all(_sin_struct_vacio(tipo.field(i).type) for i in range(tipo.num_fields))
+    if pa.types.is_list(tipo) or pa.types.is_large_list(tipo):
+        return _sin_struct_vacio(tipo.value_type)
+    return True
+
+
+def _dump(values):
+    return json.dumps(values, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _fiel(array, values):
+    """
+    True si `array` devuelve los mismos valores que `values`. En tipos
+    anidados se compara el contenido (un struct une las claves de todos los
+    objetos); en escalares, que los valores Python sean de la clase del tipo
+    (pyarrow convierte 2.5 a 2 si el tipo fijado es int64).
+    """
+    import pyarrow as pa
+
+    tipo = array.type
+    if pa.types.is_struct(tipo) or pa.types.is_list(tipo) or pa.types.is_large_list(tipo):
+        return _dump(array.to_pylist()) == _dump(values)
+    for es_tipo, clase in ((pa.types.is_boolean, bool), (pa.types.is_integer, int),
+                           (pa.types.is_floating, float), (pa.types.is_string, str)):
+        if es_tipo(tipo):
+            return all(type(v) is clase for v in values if v is not None)
+    return array.to_pylist() == values
+
+
+def _columna(values, tipo=None):
+    """Array Arrow de `values` (con `tipo` si ya está fijado), o None si no entra sin perder datos."""
+    import pyarrow as pa
+
+    try:
+        array = pa.array(values, type=tipo)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OverflowError):
+        return None
+    return array if _sin_struct_vacio(array.type) and _fiel(array, values) else None
+
+
+def _chunks(registros, size):
+    chunk = []
+    for registro in registros:
+        chunk.append(registro)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Reintentar(Exception):
+    """Un chunk no entra en el schema ya escrito: hay que volver a empezar con `tipos` corregido."""
+
+
+def _arrays(chunk, tipos):
+    """
+    Arrays de un chunk con los tipos de `tipos` (None = inferir). Devuelve
+    (arrays, cambio): cambio=True si hubo que corregir algún tipo fijado
+    (valores que no entran → "json"; columna null hasta ahora → tipo inferido).
+    """
+    import pyarrow as pa
+
+    for registro in chunk:
+        for key in registro:
+            tipos.setdefault(key, None)
+
+    arrays, cambio = {}, False
+    for key, tipo in tipos.items():
+        values = [r.get(key) for r in chunk]
+        if tipo != "json":
+            array = _columna(values, tipo)
+            if array is None and tipo is not None and pa.types.is_null(tipo):
+                array = _columna(values)
+            if array is not None:
+                cambio |= tipo is not None and array.type != tipo
+                tipos[key] = array.type
+                arrays[key] = array
+                continue
+            cambio |= tipo is not None
+            tipos[key] = "json"
+        arrays[key] = pa.array([None if v is None else json.dumps(v, ensure_ascii=False) for v in values],
+                               type=pa.string())
+    return arrays, cambio
+
+
+def _escribir(kind, source, tmp, tipos):
+    """
+    Una pasada de conversión de a ROW_GROUP_ROWS registros con el schema que
+    fija el primer chunk. Si un chunk posterior trae claves nuevas o valores
+    que no entran, `tipos` queda corregido y se levanta _Reintentar.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    filas = 0
+    try:
+        for chunk in _chunks(READERS[kind](source), ROW_GROUP_ROWS):
+            columnas = len(tipos)
+            arrays, cambio = _arrays(chunk, tipos)
+            if writer is None:
+                schema = pa.schema([(k, a.type) for k, a in arrays.items()])
+                meta = {**_source_info(source), "version": FORMAT_VERSION, "kind": kind,
+                        "json_columns": [k for k, t in tipos.items() if t == "json"]}
+                writer = pq.ParquetWriter(tmp, schema.with_metadata({_META: json.dumps(meta).encode("utf-8")}),
+                                          compression=COMPRESSION)
+            elif cambio or len(tipos) != columnas:
+                raise _Reintentar()
+            writer.write_table(pa.table(arrays, schema=writer.schema), row_group_size=ROW_GROUP_ROWS)
+            filas += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return filas, writer is not None
+
+
+def convert(kind, source, cache_dir=PARQUET_DIR):
+    """
+    Convierte `source` a Parquet y devuelve (ruta, filas, columnas JSON).
+
+    Lee y escribe de a ROW_GROUP_ROWS registros, así que la memoria no
+    depende del tamaño de la fuente. El schema se fija con el primer chunk;
+    si uno posterior no entra (clave nueva, tipo distinto) se vuelve a
+    empezar con el schema corregido, a lo sumo unas pocas veces por columna.
+    Escribe a un temporal y lo renombra: un lector nunca ve un archivo a medias.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = parquet_path(kind, source, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tipos = {}
+    while True:
+        try:
+            filas, escrito = _escribir(kind, source, tmp, tipos)
+            break
+        except _Reintentar:
+            continue
+    if not escrito:
+        meta = {**_source_info(source), "version": FORMAT_VERSION, "kind": kind, "json_columns": []}
+        pq.write_table(pa.table({}).replace_schema_metadata({_META: json.dumps(meta).encode("utf-8")}), tmp)
+    tmp.replace(path)
+    return path, filas, [k for k, t in tipos.items() if t == "json"]
+
+
+def ensure(kind, source, cache_dir=PARQUET_DIR):
+    """Ruta del Parquet de `source`, convirtiéndolo si falta o la fuente cambió."""
+    if not is_fresh(kind, source, cache_dir):
+        convert(kind, source, cache_dir)
+    return parquet_path(kind, source, cache_dir)
+
+
+# --- lectura del cache ---
+
+def _dataset(kind, source, columns, filters, cache_dir):
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    path = ensure(kind, source, cache_dir)
+    dataset = ds.dataset(path, format="parquet")
+    # Una columna pedida que la fuente no trae se lee como ausente
+    if columns is not None:
+        columns = [c for c in columns if c in dataset.schema.names]
+    expr = pq.filters_to_expression(filters) if filters else None
+    json_columns = set(_metadata(path)["json_columns"])
+    return dataset, columns, expr, json_columns
+
+
+def _registros(batch, json_columns):
+    """Filas como dicts; las claves null (o ausentes en la fuente) no aparecen."""
+    rows = batch.to_pylist()
+    for row in rows:
+        for key in [k for k, v in row.items() if v is None]:
+            del row[key]
+        for key in json_columns & row.keys():
+            row[key] = json.loads(row[key])
+    return rows
+
+
+def read_rows(kind, source, columns=None, filters=None, cache_dir=PARQUET_DIR):
+    """Registros de `source` (lista de dicts) con solo `columns` y las filas que pasan `filters`."""
+    dataset, columns, expr, json_columns = _dataset(kind, source, columns, filters, cache_dir)
+    return _registros(dataset.to_table(columns=columns, filter=expr), json_columns)
+
+
+def iter_batches(kind, source, columns=None, filters=None, batch_size=1000, cache_dir=PARQUET_DIR):
+    """
+    Como read_rows pero de a `batch_size` registros. Se lee un row group por
+    vez (el scanner de pyarrow.dataset adelanta varios y la memoria crecía
+    con el archivo); los row groups que `filters` descarta no se leen.
+    """
+    dataset, columns, expr, json_columns = _dataset(kind, source, columns, filters, cache_dir)
+    for fragment in dataset.get_fragments():
+        for row_group in fragment.split_by_row_group(expr):
+            table = row_group.to_table(columns=columns, filter=expr)
+            for batch in table.to_batches(max_chunksize=batch_size):
+                if batch.num_rows:
+                    yield _registros(batch, json_columns)
+
+
+def iter_source(kind, source, batch_size=1000):
+    """
+    Los mismos registros que iter_batches pero leídos de la fuente de forma
+    incremental, sin pasar por el Parquet (para no esperar la conversión).
+    """
+    for chunk in _chunks(READERS[kind](source), batch_size):
+        yield [{k: v for k, v in registro.items() if v is not None} for registro in chunk]
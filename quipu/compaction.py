@@ -0,0 +1,252 @@
+"""
+Representaciones compactas de los embeddings de promesas y su recall@k.
+
+Modos (MODES):
+- full: float32 con todas las dimensiones (1536), la referencia
+- mrl768 / mrl512: primeras N dimensiones renormalizadas. Los embeddings de
+  Gemini son Matryoshka: el prefijo ya es un embedding válido
+- halfvec / halfvec768: float16, lo que guarda el tipo halfvec de pgvector
+  (fase3/migrations/026_promesas_embedding_halfvec.sql)
+- int8 / int8_768: cuantización escalar simétrica por dimensión para el
+  índice local (escala = máximo absoluto de la dimensión / 127), con la norma
+  de cada fila decodificada guardada aparte para que el score siga siendo
+  coseno
+
+CompactMatrix guarda la matriz en el modo elegido y calcula scores contra
+consultas float32 de dimensión completa (se truncan igual que el corpus).
+PromesaSearchIndex.compacted(modo) arma un índice local sobre ella.
+
+Con truncado la similitud no es la misma que con 1536 dims: un corte
+`match_threshold` calibrado para full no es equivalente.
+
+El benchmark usa promesas al azar como consultas (excluyendo a la propia
+promesa del ranking) y compara el top-k exacto de cada modo con el de full.
+Mide la pérdida de la representación sola, sin la aproximación de HNSW.
+
+Uso:
+    python -m quipu.compaction                                  # Todos los modos, 1000 consultas
+    python -m quipu.compaction --modes full halfvec int8 --k 10 50 --queries 3000
+    python -m quipu.compaction --json recall.json
+
+Requiere:
+    - pip install numpy
+"""
+
+import json
+import time
+import sqlite3
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from quipu.semantic_search import DB_PATH, load_promesas_matrix, normalize_rows, top_k
+
+BLOCK_ROWS = 8192        # Filas que se decodifican a float32 por vez al calcular scores
+DEFAULT_K = (1, 10, 50)
+
+
+@dataclass(frozen=True)
+class Compaction:
+    name: str
+    dims: int = None          # None = todas
+    dtype: str = "float32"    # float32, float16 o int8
+
+
+MODES = {c.name: c for c in (
+    Compaction("full"),
+    Compaction("mrl768", dims=768),
+    Compaction("mrl512", dims=512),
+    Compaction("halfvec", dtype="float16"),
+    Compaction("halfvec768", dims=768, dtype="float16"),
+    Compaction("int8", dtype="int8"),
+    Compaction("int8_768", dims=768, dtype="int8"),
+)}
+
+
+def get_mode(mode):
+    """Compaction a partir de su nombre en MODES (o la misma Compaction)."""
+    if isinstance(mode, Compaction):
+        return mode
+    try:
+        return MODES[mode]
+    except KeyError:
+        raise ValueError(f"Modo desconocido: {mode} (disponibles: {', '.join(MODES)})") from None
+
+
+def truncate(matrix, dims=None):
+    """Primeras `dims` dimensiones con filas renormalizadas (Matryoshka)."""
+    return normalize_rows(np.asarray(matrix)[..., :dims])
+
+
+class CompactMatrix:
+    """
+    Matriz de embeddings normalizados en un modo compacto. `codes` es la
+    matriz guardada; para int8 además `scale` (por dimensión) e `inv_norm`
+    (por fila).
+    """
+
+    def __init__(self, mode, codes, scale=None, inv_norm=None):
+        self.mode = mode
+        self.codes = codes
+        self.scale = scale
+        self.inv_norm = inv_norm
+
+    @classmethod
+    def build(cls, matrix, mode):
+        mode = get_mode(mode)
+        rows = truncate(matrix, mode.dims)
+        if mode.dtype == "float32":
+            return cls(mode, rows)
+        if mode.dtype == "float16":
+            return cls(mode, rows.astype(np.float16))
+        if mode.dtype != "int8":
+            raise ValueError(f"dtype no soportado: {mode.dtype}")
+
+        scale = np.abs(rows).max(axis=0) / 127
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint(rows / scale), -127, 127).astype(np.int8)
+        norms = np.linalg.norm(codes * scale, axis=1)
+        norms[norms == 0] = 1.0
+        return cls(mode, codes, scale.astype(np.float32), (1 / norms).astype(np.float32))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, rows):
+        """Subconjunto de filas (mismo modo y escala)."""
+        return CompactMatrix(self.mode, self.codes[rows], self.scale,
+                             None if self.inv_norm is None else self.inv_norm[rows])
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        extra = sum(a.nbytes for a in (self.scale, self.inv_norm) if a is not None)
+        return self.codes.nbytes + extra
+
+    def decode(self):
+        """Filas como float32 (aproximación de las originales normalizadas y truncadas)."""
+        if self.mode.dtype == "int8":
+            return self.codes * self.scale * self.inv_norm[:, None]
+        return self.codes.astype(np.float32)
+
+    def scores(self, queries):
+        """Similitud coseno (n_consultas, n_filas) contra consultas float32 de dimensión completa."""
+        queries = truncate(np.atleast_2d(queries), self.mode.dims)
+        if self.mode.dtype == "float32":
+            return queries @ self.codes.T
+        if self.mode.dtype == "int8":
+            queries = queries * self.scale
+        out = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), BLOCK_ROWS):
+            block = self.codes[start:start + BLOCK_ROWS].astype(np.float32)
+            out[:, start:start + BLOCK_ROWS] = queries @ block.T
+        if self.inv_norm is not None:
+            out *= self.inv_norm
+        return out
+
+
+def recall_at_k(reference, candidate, k):
+    """Fracción promedio del top-k de referencia que aparece en el top-k candidato."""
+    hits = [len(np.intersect1d(r[:k], c[:k], assume_unique=True)) for r, c in zip(reference, candidate)]
+    return float(np.mean(hits)) / k
+
+
+def _ranking(scores, query_rows, k):
+    # La consulta es una promesa del corpus: sacarla para no contar el match trivial
+    scores[np.arange(len(query_rows)), query_rows] = -np.inf
+    return top_k(scores, k)[0]
+
+
+def benchmark(matrix, modes=None, ks=DEFAULT_K, n_queries=1000, seed=0, block_size=512):
+    """
+    Recall@k de cada modo contra `full` usando `n_queries` filas de `matrix`
+    como consultas. Devuelve una lista de dicts por modo.
+    """
+    modes = [get_mode(m) for m in (modes or MODES)]
+    ks = sorted(set(ks))
+    k_max = ks[-1]
+    matrix = np.asarray(matrix, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(matrix), size=min(n_queries, len(matrix)), replace=False)
+    queries = matrix[query_rows]
+
+    reference = CompactMatrix.build(matrix, "full")
+    ref_rank = np.concatenate([
+        _ranking(reference.scores(queries[i:i + block_size]), query_rows[i:i + block_size], k_max)
+        for i in range(0, len(queries), block_size)
+    ])
+
+    results = []
+    for mode in modes:
+        start = time.perf_counter()
+        compact = CompactMatrix.build(matrix, mode)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rank = np.concatenate([
+            _ranking(compact.scores(queries[i:i + block_size]), query_rows[i:i + block_size], k_max)
+            for i in range(0, len(queries), block_size)
+        ])
+        search_s = time.perf_counter() - start
+
+        results.append({
+            "mode": mode.name,
+            "dims": compact.shape[1],
+            "dtype": mode.dtype,
+            "bytes_per_vector": compact.nbytes / len(compact),
+            "index_mb": compact.nbytes / 1e6,
+            "build_s": build_s,
+            "queries_per_s": len(queries) / search_s if search_s > 0 else 0.0,
+            **{f"recall@{k}": recall_at_k(ref_rank, rank, k) for k in ks},
+        })
+    return results
+
+
+def print_results(results, ks):
+    header = (f"{'modo':<12}{'dims':>6}{'dtype':>9}{'bytes/vec':>11}{'índice MB':>11}{'consultas/s':>13}"
+              + "".join(f"{f'recall@{k}':>11}" for k in ks))
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['mode']:<12}{r['dims']:>6}{r['dtype']:>9}{r['bytes_per_vector']:>11,.0f}{r['index_mb']:>11.1f}"
+              f"{r['queries_per_s']:>13,.0f}" + "".join(f"{r[f'recall@{k}']:>11.4f}" for k in ks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k de los modos compactos de embeddings vs float32 completo")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Base SQLite (default: data/promesas_v2.db)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), metavar="modo",
+                        help=f"Modos a medir (default: todos): {', '.join(MODES)}")
+    parser.add_argument("--k", type=int, nargs="+", default=list(DEFAULT_K), help="Valores de k (default: 1 10 50)")
+    parser.add_argument("--queries", type=int, default=1000, help="Promesas al azar usadas como consultas")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    desconocidos = [m for m in args.modes if m not in MODES]
+    if desconocidos:
+        parser.error(f"modos desconocidos: {', '.join(desconocidos)} (disponibles: {', '.join(MODES)})")
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    ids, matrix = load_promesas_matrix(conn)
+    conn.close()
+    print(f"Corpus: {len(ids):,} promesas x {matrix.shape[1]} dims ({time.perf_counter() - start:.1f}s)")
+
+    results = benchmark(matrix, args.modes, args.k, args.queries, args.seed)
+    print(f"{min(args.queries, len(ids)):,} consultas, referencia: full (búsqueda exacta)\n")
+    print_results(results, sorted(set(args.k)))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"corpus": len(ids), "queries": args.queries, "seed": args.seed, "results": results}, f, indent=2)
+        print(f"\nResultados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Migraciones delta: solo se envían las filas nuevas o cambiadas.
+
+Cada fila mapeada se resume en un hash de contenido estable (JSON con claves
+ordenadas + blobs opcionales como el embedding en bytes). Un manifiesto
+local por tabla y por proyecto de Supabase guarda clave → hash de lo último
+que se escribió con éxito; en la siguiente corrida se compara contra él.
+
+Las claves del manifiesto que no aparecen en la fuente se reportan como
+removidas pero no se borran de la base (ni del manifiesto): eso queda como
+decisión manual.
+
+Uso:
+    manifest = DeltaManifest.for_table('quipu_candidatos', SUPABASE_URL)
+    enviar, hashes = diff_rows(manifest, filas, key=candidato_key)
+    ... upsert de `enviar` ...
+    manifest.commit((k, hashes[k]) for k in claves_escritas)
+    manifest.save()
+"""
+
+import json
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from quipu.cache import CACHE_DIR
+
+MANIFEST_DIR = CACHE_DIR / "delta"
+
+
+def content_hash(row, *blobs):
+    """Hash estable de una fila (dict JSON-serializable) y blobs binarios extra."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps(row, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+    for blob in blobs:
+        h.update(b"\0")
+        h.update(blob or b"")
+    return h.hexdigest()
+
+
+@dataclass
+class DeltaStats:
+    nuevas: int = 0
+    cambiadas: int = 0
+    sin_cambios: int = 0
+
+    def summary(self):
+        return f"{self.nuevas:,} nuevas, {self.cambiadas:,} cambiadas, {self.sin_cambios:,} sin cambios"
+
+
+class DeltaManifest:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.hashes = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.hashes = json.load(f)
+        self.stats = DeltaStats()
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_table(cls, table, target="", directory=MANIFEST_DIR):
+        """Manifiesto de `table` para un destino (p.ej. SUPABASE_URL)."""
+        digest = hashlib.sha1((target or "").encode("utf-8")).hexdigest()[:8]
+        return cls(Path(directory) / f"{table}.{digest}.json")
+
+    def check(self, key, digest):
+        """'nueva', 'cambiada' o None si la fila no cambió desde la última escritura."""
+        key = str(key)
+        self._seen.add(key)
+        previo = self.hashes.get(key)
+        if previo is None:
+            self.stats.nuevas += 1
+            return "nueva"
+        if previo != digest:
+            self.stats.cambiadas += 1
+            return "cambiada"
+        self.stats.sin_cambios += 1
+        return None
+
+    def commit(self, items):
+        """Registra (clave, hash) de filas ya escritas con éxito. Thread-safe."""
+        with self._lock:
+            self.hashes.update((str(k), h) for k, h in items)
+
+    def removed(self):
+        """Claves conocidas que no se vieron en esta corrida."""
+        return sorted(set(self.hashes) - self._seen)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with self._lock, open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.hashes, f, separators=(",", ":"))
+        tmp.replace(self.path)
+
+
+def diff_rows(manifest, rows, key, delta=True):
+    """
+    Filas a enviar y {clave: hash} de esas filas.
+
+    Con delta=False se envía todo, pero igual se calculan los hashes para
+    dejar el manifiesto al día.
+    """
+    enviar = []
+    hashes = {}
+    for row in rows:
+        k = str(key(row))
+        digest = content_hash(row)
+        if manifest.check(k, digest) or not delta:
+            enviar.append(row)
+            hashes[k] = digest
+    return enviar, hashes
+
+
+def report_removed(manifest, label, limit=10):
+    """Imprime las claves que desaparecieron de la fuente; devuelve la lista."""
+    removidas = manifest.removed()
+    if removidas:
+        muestra = ", ".join(removidas[:limit]) + (" ..." if len(removidas) > limit else "")
+        print(f"    [DELTA] {len(removidas):,} {label} ya no están en la fuente (no se borran): {muestra}")
+    return removidas
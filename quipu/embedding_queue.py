@@ -0,0 +1,115 @@
+"""
+Cola de embeddings en segundo plano.
+
+Los productores (p.ej. el sync de declaraciones) insertan filas sin vector y
+llaman a submit(id, texto). Un hilo agrupa los textos pendientes, los embebe
+con EmbeddingService (batches multi-texto, cache, rate limit) y entrega los
+vectores a `writer` en bloque. Los textos que fallan se reencolan hasta
+`max_attempts` veces; los que siguen fallando quedan en `failed` y la fila
+queda con embedding NULL para un backfill posterior.
+"""
+
+import time
+import queue
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass
+class QueueStats:
+    submitted: int = 0
+    written: int = 0
+    retried: int = 0
+    write_errors: int = 0
+    failed: list = field(default_factory=list)
+
+    def summary(self):
+        return (f"{self.submitted:,} encolados, {self.written:,} escritos, "
+                f"{self.retried} reintentos, {len(self.failed)} sin embedding")
+
+
+class EmbeddingQueue:
+    def __init__(self, service, writer, batch_size=100, max_wait=2.0, max_attempts=3):
+        """
+        service: EmbeddingService (o cualquier objeto con embed(textos)).
+        writer: callable que recibe [(row_id, vector), ...] y los persiste.
+        """
+        self.service = service
+        self.writer = writer
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_attempts = max_attempts
+        self.stats = QueueStats()
+        self._lock = threading.Lock()   # submit() se llama desde varios workers
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="embedding-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, row_id, text):
+        with self._lock:
+            self.stats.submitted += 1
+        self._queue.put((row_id, text, 0))
+
+    def close(self):
+        """Procesa todo lo pendiente y detiene el hilo."""
+        self._closed.set()
+        self._thread.join()
+        return self.stats
+
+    def _next_batch(self):
+        """Hasta batch_size items; espera como máximo max_wait desde el primero."""
+        items = []
+        deadline = None
+        while len(items) < self.batch_size:
+            timeout = 0.2 if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                items.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                if self._closed.is_set() or (items and time.monotonic() >= deadline):
+                    break
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait
+        return items
+
+    def _run(self):
+        while True:
+            items = self._next_batch()
+            if not items:
+                if self._closed.is_set() and self._queue.empty():
+                    return
+                continue
+            self._process(items)
+
+    def _process(self, items):
+        try:
+            vectors = self.service.embed([text for _, text, _ in items])
+        except Exception as e:
+            print(f"  [WARN] Cola de embeddings: {e}")
+            vectors = [None] * len(items)
+
+        listos = []
+        for (row_id, text, attempts), vector in zip(items, vectors):
+            if vector is not None:
+                listos.append((row_id, vector))
+            elif attempts + 1 < self.max_attempts:
+                self.stats.retried += 1
+                self._queue.put((row_id, text, attempts + 1))
+            else:
+                self.stats.failed.append(row_id)
+
+        if not listos:
+            return
+        for attempt in range(self.max_attempts):
+            try:
+                self.writer(listos)
+                self.stats.written += len(listos)
+                return
+            except Exception as e:
+                if attempt == self.max_attempts - 1:
+                    print(f"  [ERROR] No se pudieron escribir {len(listos)} embeddings: {e}")
+                    self.stats.write_errors += 1
+                    self.stats.failed.extend(row_id for row_id, _ in listos)
+                else:
+                    time.sleep(2 ** attempt)
@@ -0,0 +1,216 @@
+"""
+Embeddings de promesas en formato binario (.npy float32, memory-mapped).
+
+En promesas_v2.db la columna promesas.embedding es un array JSON en TEXT
+(~30 KB por fila). Este módulo mantiene al lado de la base una matriz
+float32 N×D y un vector de ids alineado fila a fila:
+
+    data/promesas_embeddings.npy       # float32 (N, 1536)
+    data/promesas_embeddings_ids.npy   # int64 (N,), ids de promesas ordenados
+    data/promesas_embeddings.json      # metadata para detectar si quedó desactualizado
+
+Para saber si la matriz quedó vieja sin releer la columna JSON, la base
+lleva un contador (tabla embeddings_version) que unos triggers sobre
+promesas.embedding incrementan en cada insert/update/delete. Los instala
+track_versions(), que llaman convert_sqlite y 003_fix_missing_embeddings.py.
+
+EmbeddingStore.load() abre la matriz con mmap_mode='r', así que cargar los
+22k vectores es solo mapear el archivo: no hay parseo ni copia.
+
+Requiere:
+    - pip install numpy
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+EMBEDDINGS_NPY = DATA_DIR / "promesas_embeddings.npy"
+
+
+def ids_path(path):
+    path = Path(path)
+    return path.with_name(f"{path.stem}_ids.npy")
+
+
+def meta_path(path):
+    return Path(path).with_suffix(".json")
+
+
+def track_versions(conn):
+    """Crea (si faltan) embeddings_version y los triggers que la incrementan."""
+    bump = "BEGIN UPDATE embeddings_version SET version = version + 1 WHERE id = 1; END;"
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS embeddings_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO embeddings_version (id, version) VALUES (1, 0);
+        CREATE TRIGGER IF NOT EXISTS trg_promesas_embedding_insert
+            AFTER INSERT ON promesas WHEN NEW.embedding IS NOT NULL {bump}
+        CREATE TRIGGER IF NOT EXISTS trg_promesas_embedding_update
+            AFTER UPDATE OF embedding ON promesas {bump}
+        CREATE TRIGGER IF NOT EXISTS trg_promesas_embedding_delete
+            AFTER DELETE ON promesas WHEN OLD.embedding IS NOT NULL {bump}
+    """)
+
+
+def source_fingerprint(conn):
+    """
+    (count, max_id, version) de las promesas con embedding en SQLite.
+    `version` (embeddings_version) detecta embeddings regenerados en filas
+    que ya tenían uno, que no cambian count ni max_id; es None si la base
+    todavía no tiene los triggers.
+    """
+    count, max_id = conn.execute(
+        "SELECT COUNT(*), MAX(id) FROM promesas WHERE embedding IS NOT NULL"
+    ).fetchone()
+    try:
+        row = conn.execute("SELECT version FROM embeddings_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    return count, max_id, row[0] if row else None
+
+
+def modal_dim(conn):
+    """(dimensión más frecuente, filas con esa dimensión), contando comas del JSON sin parsearlo."""
+    return conn.execute("""
+        SELECT length(embedding) - length(replace(embedding, ',', '')) + 1 AS dim, COUNT(*) AS n
+        FROM promesas WHERE embedding IS NOT NULL
+        GROUP BY dim ORDER BY n DESC, dim DESC LIMIT 1
+    """).fetchone()
+
+
+class EmbeddingStore:
+    """Matriz de embeddings alineada a ids de promesas."""
+
+    def __init__(self, ids, matrix, meta=None):
+        self.ids = ids
+        self.matrix = matrix
+        self.meta = meta or {}
+        self._index = None
+
+    @classmethod
+    def load(cls, path=EMBEDDINGS_NPY, mmap=True):
+        path = Path(path)
+        matrix = np.load(path, mmap_mode="r" if mmap else None)
+        ids = np.load(ids_path(path))
+        if len(ids) != len(matrix):
+            raise ValueError(f"{path.name}: {len(matrix)} filas pero {len(ids)} ids")
+        meta = {}
+        if meta_path(path).exists():
+            with open(meta_path(path), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        return cls(ids, matrix, meta)
+
+    @classmethod
+    def exists(cls, path=EMBEDDINGS_NPY):
+        path = Path(path)
+        return path.exists() and ids_path(path).exists()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def is_fresh(self, conn):
+        """True si la matriz corresponde al estado actual de promesas_v2.db."""
+        count, max_id, version = source_fingerprint(conn)
+        return (version is not None
+                and self.meta.get("source_count") == count
+                and self.meta.get("source_max_id") == max_id
+                and self.meta.get("source_version") == version)
+
+    def row(self, promesa_id):
+        """Índice de fila para un id de promesa, o None si no tiene embedding."""
+        if self._index is None:
+            self._index = {int(pid): i for i, pid in enumerate(self.ids)}
+        return self._index.get(int(promesa_id))
+
+    def get(self, promesa_id):
+        """Vector (vista sobre el mmap) de una promesa, o None."""
+        i = self.row(promesa_id)
+        return None if i is None else self.matrix[i]
+
+    def rows_for(self, promesa_ids):
+        """Índices de fila para varios ids (ids sin embedding se omiten)."""
+        idx = np.searchsorted(self.ids, promesa_ids)
+        idx = np.clip(idx, 0, len(self.ids) - 1)
+        return idx[self.ids[idx] == promesa_ids]
+
+
+def convert_sqlite(conn, path=EMBEDDINGS_NPY, chunk_size=2000):
+    """
+    Exporta promesas.embedding (JSON TEXT) a la matriz .npy + ids.
+
+    Se escribe en streaming sobre un memmap, así que no hace falta tener
+    todos los vectores como listas Python a la vez. Filas con JSON inválido
+    o dimensión distinta a la mayoritaria (modal_dim, calculada antes de
+    convertir) se omiten y se reportan.
+    """
+    path = Path(path)
+    track_versions(conn)
+    count, max_id, version = source_fingerprint(conn)
+    if not count:
+        raise ValueError("No hay promesas con embedding en SQLite")
+
+    dim, _ = modal_dim(conn)
+
+    tmp = path.with_name(f"{path.stem}.tmp.npy")
+    matrix = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(count, dim))
+    ids = np.empty(count, dtype=np.int64)
+
+    n = 0
+    skipped = []
+    cursor = conn.execute("SELECT id, embedding FROM promesas WHERE embedding IS NOT NULL ORDER BY id")
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for promesa_id, emb_json in rows:
+            try:
+                values = json.loads(emb_json)
+            except (TypeError, ValueError):
+                skipped.append(promesa_id)
+                continue
+            if len(values) != dim:
+                skipped.append(promesa_id)
+                continue
+            matrix[n] = values
+            ids[n] = promesa_id
+            n += 1
+
+    matrix.flush()
+    del matrix
+
+    if n < count:
+        # Recortar las filas reservadas para registros omitidos
+        full = np.load(tmp, mmap_mode="r")
+        np.save(path, full[:n])
+        del full
+        os.remove(tmp)
+    else:
+        os.replace(tmp, path)
+    np.save(ids_path(path), ids[:n])
+
+    meta = {
+        "rows": n,
+        "dim": dim,
+        "dtype": "float32",
+        "source_count": count,
+        "source_max_id": max_id,
+        "source_version": version,
+        "skipped_ids": skipped,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(meta_path(path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
@@ -0,0 +1,177 @@
+"""
+Servicio de embeddings Gemini con batches, concurrencia, rate limit y cache.
+
+- Los textos se deduplican y se buscan primero en un cache local
+  (data/.cache/embeddings.sqlite) con clave sha256(modelo, dims, task_type, texto),
+  así que re-ejecutar un backfill o embeber textos repetidos no gasta llamadas.
+- Los faltantes se parten en chunks de hasta `batch_size` textos (límite de
+  embed_content por request) y se envían en paralelo bajo un RateLimiter.
+- Cada chunk exitoso se persiste apenas llega: si el proceso se corta a la
+  mitad, lo ya embebido queda en el cache.
+- Los vectores se devuelven siempre redondeados a float32, como se guardan
+  en el cache: un texto da el mismo vector venga del cache o de la API.
+
+Uso:
+    from quipu.embeddings import EmbeddingService, create_genai_client
+
+    service = EmbeddingService(create_genai_client())
+    vectores = service.embed(textos)   # lista alineada a textos, None si falló
+
+Requiere:
+    - pip install google-genai
+"""
+
+import os
+import time
+import random
+import hashlib
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from quipu import metrics
+from quipu.cache import CACHE_DIR, SqliteCache
+from quipu.rate_limit import RateLimiter
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+EMBEDDING_DIMENSIONS = 1536
+MAX_BATCH_SIZE = 100  # Máximo de textos por request de embed_content
+CACHE_PATH = CACHE_DIR / "embeddings.sqlite"
+
+
+def create_genai_client():
+    """Cliente google-genai (instrumentado, ver quipu/metrics.py) con GEMINI_API_KEY o GOOGLE_API_KEY."""
+    from google import genai
+
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("Configurar GEMINI_API_KEY en .env")
+    return metrics.instrument_genai(genai.Client(api_key=api_key))
+
+
+def cache_key(model, dimensions, task_type, text):
+    raw = "\x1f".join([model, str(dimensions), task_type or "", text])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def pack_vector(values):
+    return array("f", values).tobytes()
+
+
+def unpack_vector(blob):
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+@dataclass
+class EmbeddingStats:
+    requested: int = 0
+    unique: int = 0
+    cache_hits: int = 0
+    api_calls: int = 0
+    embedded: int = 0
+    failed: int = 0
+    retries: int = 0
+
+    def summary(self):
+        return (f"{self.requested:,} textos ({self.unique:,} únicos): {self.cache_hits:,} en cache, "
+                f"{self.embedded:,} embebidos en {self.api_calls:,} llamadas, "
+                f"{self.failed:,} fallidos, {self.retries} reintentos")
+
+
+class EmbeddingService:
+    def __init__(self, client, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS,
+                 task_type="RETRIEVAL_DOCUMENT", cache_path=CACHE_PATH, batch_size=MAX_BATCH_SIZE,
+                 max_workers=4, requests_per_minute=300, max_retries=5, rate_limiter=None):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.task_type = task_type
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.limiter = rate_limiter or RateLimiter(requests_per_minute, per=60.0)
+        self.cache = SqliteCache(cache_path, table="embeddings") if cache_path else None
+        self.stats = EmbeddingStats()
+        self._lock = threading.Lock()
+
+    def key(self, text):
+        return cache_key(self.model, self.dimensions, self.task_type, text)
+
+    def embed(self, texts):
+        """
+        Embeddings para `texts`, en el mismo orden. Los textos que no se
+        pudieron embeber tras los reintentos quedan como None.
+        """
+        texts = list(texts)
+        keys = [self.key(t) for t in texts]
+        unique = dict(zip(keys, texts))  # key -> texto, preserva orden
+
+        vectors = {}
+        if self.cache is not None:
+            for k, blob in self.cache.get_many(unique).items():
+                vectors[k] = unpack_vector(blob)
+        with self._lock:
+            self.stats.requested += len(texts)
+            self.stats.unique += len(unique)
+            self.stats.cache_hits += len(vectors)
+
+        pending = [(k, t) for k, t in unique.items() if k not in vectors]
+        chunks = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        if chunks:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._embed_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    vectors.update(future.result())
+
+        return [vectors.get(k) for k in keys]
+
+    def embed_one(self, text):
+        return self.embed([text])[0]
+
+    def _call(self, texts):
+        from google.genai import types
+
+        self.limiter.acquire()
+        with self._lock:
+            self.stats.api_calls += 1
+        result = self.client.models.embed_content(
+            model=self.model,
+            contents=texts,
+            config=types.EmbedContentConfig(
+                task_type=self.task_type,
+                output_dimensionality=self.dimensions,
+            ),
+        )
+        return [e.values for e in result.embeddings]
+
+    def _embed_chunk(self, chunk):
+        """Embebe un chunk con reintentos; devuelve {key: vector} de lo exitoso."""
+        texts = [t for _, t in chunk]
+        for attempt in range(self.max_retries):
+            try:
+                values = self._call(texts)
+                break
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    print(f"  [ERROR] embed_content falló {self.max_retries} veces ({len(chunk)} textos): {e}")
+                    with self._lock:
+                        self.stats.failed += len(chunk)
+                    return {}
+                wait = min(60, 2 ** attempt) * (0.5 + random.random())
+                print(f"  [RETRY] embed_content: {e}, esperando {wait:.1f}s...")
+                with self._lock:
+                    self.stats.retries += 1
+                metrics.count_retry("gemini", "embed_content", self.model)
+                time.sleep(wait)
+
+        packed = {k: pack_vector(v) for (k, _), v in zip(chunk, values)}
+        if self.cache is not None:
+            self.cache.put_many(packed.items())
+        out = {k: unpack_vector(blob) for k, blob in packed.items()}
+        with self._lock:
+            self.stats.embedded += len(out)
+        return out
@@ -0,0 +1,328 @@
+"""
+Búsqueda híbrida (léxica + semántica) sobre promesas y declaraciones.
+
+- Léxica: índice invertido BM25 sobre tokens plegados con quipu.text.normalizar
+  (sin tildes, minúsculas), así "educacion" encuentra "Educación" sin armar
+  variantes de acentos como useSearch.ts. Indexa texto + resumen, e incluye
+  las promesas que todavía no tienen embedding.
+- Semántica: similitud coseno contra la matriz de embeddings (1536-d).
+- Fusión: reciprocal-rank fusion (RRF) de ambos rankings, sobre los dos
+  corpus a la vez.
+
+Filtros: partido_id (promesas por su partido, declaraciones por el partido
+de su candidato), categoria (solo promesas) y candidato_id (solo
+declaraciones). Un filtro que no aplica a un corpus lo excluye.
+
+Uso:
+    from quipu.hybrid_search import HybridSearch
+
+    index = HybridSearch.from_sources(sqlite3.connect("data/promesas_v2.db"), declaraciones)
+    index.search("seguridad ciudadana", query_vector=vec, partido_id=3, k=20)
+
+    python -m quipu.hybrid_search "reforma de pensiones" --partido-id 3
+    python -m quipu.hybrid_search --bench 500          # latencia con promesas como consultas
+
+Requiere:
+    - pip install numpy
+"""
+
+import re
+import time
+import sqlite3
+import argparse
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from quipu.semantic_search import DB_PATH, SUBSET_CACHE_SIZE, LRUCache, PromesaSearchIndex, normalize_rows, top_k
+from quipu.text import normalizar
+
+PROMESA = "promesa"
+DECLARACION = "declaracion"
+RRF_K = 60           # Constante estándar de RRF
+DEPTH = 100          # Candidatos por ranking antes de fusionar
+
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "e", "el", "en", "es", "la", "las", "lo", "los",
+    "o", "para", "por", "que", "se", "su", "sus", "u", "un", "una", "y",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(texto):
+    """Tokens plegados (normalizar) sin stopwords ni tokens de una letra."""
+    return [t for t in _TOKEN_RE.findall(normalizar(texto or ""))
+            if len(t) > 1 and t not in STOPWORDS]
+
+
+class BM25Index:
+    """Índice invertido con postings en arrays numpy; score denso por consulta."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(documents)
+        self.doc_len = np.zeros(self.n_docs, dtype=np.float32)
+
+        postings = defaultdict(lambda: ([], []))
+        for doc, tokens in enumerate(documents):
+            self.doc_len[doc] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                ids, tfs = postings[term]
+                ids.append(doc)
+                tfs.append(tf)
+
+        avgdl = float(self.doc_len.mean()) if self.n_docs else 0.0
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / (avgdl or 1.0))
+        self.postings = {}
+        for term, (ids, tfs) in postings.items():
+            ids = np.asarray(ids, dtype=np.int32)
+            tfs = np.asarray(tfs, dtype=np.float32)
+            df = len(ids)
+            idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            # Peso BM25 precomputado por posting: idf * tf(k1+1) / (tf + norm)
+            self.postings[term] = (ids, (idf * tfs * (self.k1 + 1) / (tfs + norm[ids])).astype(np.float32))
+
+    def scores(self, tokens):
+        """Score BM25 de todos los documentos (0 si no contiene ningún término)."""
+        out = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokens):
+            posting = self.postings.get(term)
+            if posting is not None:
+                ids, weights = posting
+                out[ids] += weights
+        return out
+
+
+class HybridSearch:
+    def __init__(self, docs, matrix, vector_dims=None):
+        """
+        docs: dicts con tipo, id, texto, resumen opcional y metadatos
+        (partido_id, categoria, candidato_id, ...), alineados a las filas de
+        `matrix`. BM25 indexa texto + resumen.
+        matrix: (n, d) embeddings; filas en cero = sin embedding.
+        vector_dims: usar solo las primeras N dimensiones (los embeddings de
+        Gemini son Matryoshka). El producto matriz-vector está limitado por
+        memoria, así que 768 de 1536 dims lo hace ~2x más rápido.
+        """
+        self.docs = docs
+        self.vector_dims = vector_dims
+        self.matrix = normalize_rows(np.asarray(matrix)[:, :vector_dims])
+        self.tipos = np.array([d["tipo"] for d in docs], dtype=object)
+        self.partido_ids = np.array([d.get("partido_id") or -1 for d in docs], dtype=np.int64)
+        self.categorias = np.array([d.get("categoria") for d in docs], dtype=object)
+        self.candidato_ids = np.array([d.get("candidato_id") or -1 for d in docs], dtype=np.int64)
+        self.bm25 = BM25Index([tokenize(f"{d['texto']} {d.get('resumen') or ''}") for d in docs])
+        self._masks = LRUCache(4 * SUBSET_CACHE_SIZE)   # Un bool por documento cada una
+        self._subsets = LRUCache(SUBSET_CACHE_SIZE)
+
+    @classmethod
+    def from_sources(cls, conn, declaraciones=(), candidato_partidos=None, vector_dims=None):
+        """
+        Todas las promesas con partido de promesas_v2.db (embeddings vía
+        PromesaSearchIndex; las que no tienen quedan en cero y solo entran a
+        BM25) y declaraciones ya leídas de Supabase: dicts con id, contenido,
+        candidato_id y embedding (lista o None).
+        """
+        promesas = PromesaSearchIndex.from_sqlite(conn)
+        candidato_partidos = candidato_partidos or {}
+        fila_vector = {int(pid): i for i, pid in enumerate(promesas.ids)}
+        dim = promesas.matrix.shape[1]
+
+        docs = []
+        vector_de = []
+        for pid, texto, resumen, categoria, partido_id, partido, candidato in conn.execute("""
+                SELECT p.id, p.texto_original, p.resumen, p.categoria, p.partido_id,
+                       pp.nombre_oficial, pp.candidato_presidencial
+                FROM promesas p
+                JOIN partidos_politicos pp ON p.partido_id = pp.id
+                ORDER BY p.id"""):
+            docs.append({
+                "tipo": PROMESA,
+                "id": pid,
+                "texto": texto or "",
+                "texto_original": texto,
+                "resumen": resumen,
+                "categoria": categoria,
+                "partido": partido,
+                "candidato": candidato,
+                "partido_id": partido_id,
+            })
+            vector_de.append(fila_vector.get(pid, -1))
+
+        filas_prom = np.zeros((len(docs), dim), dtype=np.float32)
+        vector_de = np.asarray(vector_de, dtype=np.int64)
+        con_vector = vector_de >= 0
+        filas_prom[con_vector] = promesas.matrix[vector_de[con_vector]]
+        vectores = [filas_prom]
+
+        filas_decl = np.zeros((len(declaraciones), dim), dtype=np.float32)
+        for i, d in enumerate(declaraciones):
+            docs.append({
+                "tipo": DECLARACION,
+                "id": d["id"],
+                "texto": d.get("contenido") or "",
+                "candidato_id": d.get("candidato_id"),
+                "partido_id": candidato_partidos.get(d.get("candidato_id")),
+                "fecha": d.get("fecha"),
+                "canal": d.get("canal"),
+            })
+            if d.get("embedding") is not None and len(d["embedding"]) == dim:
+                filas_decl[i] = d["embedding"]
+        vectores.append(filas_decl)
+
+        return cls(docs, np.vstack(vectores), vector_dims)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _mask(self, corpora, partido_id, categoria, candidato_id):
+        def build():
+            mask = np.isin(self.tipos, list(corpora))
+            if partido_id is not None:
+                mask &= self.partido_ids == partido_id
+            if categoria is not None:
+                mask &= self.categorias == categoria       # declaraciones no tienen categoría
+            if candidato_id is not None:
+                mask &= self.candidato_ids == candidato_id  # promesas no tienen candidato
+            return mask
+        return self._masks.get((corpora, partido_id, categoria, candidato_id), build)
+
+    def _subset(self, key, mask):
+        """(filas, submatriz) de una máscara, cacheado: con filtros el matvec es más chico."""
+        def build():
+            rows = np.flatnonzero(mask)
+            return rows, self.matrix[rows] if len(rows) < len(mask) else self.matrix
+        return self._subsets.get(key, build)
+
+    def _ranking(self, scores, mask, depth):
+        """Filas con score > 0 dentro de la máscara, mejor primero (máx. depth)."""
+        scores = np.where(mask, scores, -np.inf)
+        idx, vals = top_k(scores[None, :], depth)
+        return idx[0][vals[0] > 0]
+
+    def search(self, query, query_vector=None, k=20, corpora=(PROMESA, DECLARACION),
+               partido_id=None, categoria=None, candidato_id=None, rrf_k=RRF_K, depth=DEPTH):
+        """
+        Resultados ordenados por RRF: dicts del documento + score, bm25,
+        similarity y rank en cada ranking (None si no entró).
+        """
+        key = (tuple(corpora), partido_id, categoria, candidato_id)
+        mask = self._mask(*key)
+
+        bm25 = self.bm25.scores(tokenize(query))
+        rankings = {"bm25": self._ranking(bm25, mask, depth)}
+
+        sims = None
+        if query_vector is not None:
+            q = normalize_rows(np.atleast_2d(query_vector)[:, :self.vector_dims])[0]
+            rows, sub = self._subset(key, mask)
+            sub_sims = sub @ q
+            idx, vals = top_k(sub_sims[None, :], depth)
+            rankings["vector"] = rows[idx[0][vals[0] > 0]]
+            sims = np.zeros(len(self.docs), dtype=np.float32)
+            sims[rows] = sub_sims
+
+        fused = defaultdict(float)
+        ranks = defaultdict(dict)
+        for nombre, filas in rankings.items():
+            for rank, fila in enumerate(filas, start=1):
+                fused[fila] += 1.0 / (rrf_k + rank)
+                ranks[fila][nombre] = rank
+
+        mejores = sorted(fused, key=fused.get, reverse=True)[:k]
+        return [{
+            **self.docs[fila],
+            "score": round(fused[fila], 6),
+            "bm25": float(bm25[fila]),
+            "similarity": float(sims[fila]) if sims is not None else None,
+            "rank_bm25": ranks[fila].get("bm25"),
+            "rank_vector": ranks[fila].get("vector"),
+        } for fila in mejores]
+
+
+def load_declaraciones(supabase, page_size=200):
+    """Declaraciones con texto y embedding desde Supabase (keyset por id)."""
+    from quipu.coherencia import parse_vector
+
+    rows = []
+    last_id = 0
+    while True:
+        page = (supabase.table("quipu_declaraciones")
+                .select("id, contenido, candidato_id, fecha, canal, embedding")
+                .gt("id", last_id).order("id").limit(page_size).execute()).data
+        for r in page:
+            r["embedding"] = parse_vector(r.get("embedding"))
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_id = page[-1]["id"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda híbrida BM25 + embeddings")
+    parser.add_argument("query", nargs="?", help="Texto a buscar")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Base SQLite (default: data/promesas_v2.db)")
+    parser.add_argument("--declaraciones", action="store_true", help="Incluir quipu_declaraciones (requiere .env de Supabase)")
+    parser.add_argument("--partido-id", type=int)
+    parser.add_argument("--categoria")
+    parser.add_argument("--candidato-id", type=int)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--dims", type=int, help="Usar solo las primeras N dimensiones del embedding")
+    parser.add_argument("--bench", type=int, default=0, help="Medir latencia con N promesas al azar como consultas")
+    args = parser.parse_args()
+
+    declaraciones, candidato_partidos, supabase = [], {}, None
+    if args.declaraciones:
+        import os
+        from dotenv import load_dotenv
+        from supabase import create_client
+        from quipu.snapshots import load_snapshot
+
+        load_dotenv()
+        supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+        declaraciones = load_declaraciones(supabase)
+        candidato_partidos = {c["id"]: c.get("partido_id") for c in load_snapshot(supabase, "quipu_candidatos").rows}
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(args.db)
+    index = HybridSearch.from_sources(conn, declaraciones, candidato_partidos, args.dims)
+    conn.close()
+    print(f"Índice: {len(index):,} documentos, {len(index.bm25.postings):,} términos "
+          f"en {time.perf_counter() - start:.2f}s")
+
+    if args.bench:
+        rng = np.random.default_rng(0)
+        promesas = np.flatnonzero((index.tipos == PROMESA) & index.matrix.any(axis=1))
+        sample = rng.choice(promesas, size=min(args.bench, len(promesas)), replace=False)
+        start = time.perf_counter()
+        for fila in sample:
+            texto = " ".join(tokenize(index.docs[fila]["texto"])[:6])
+            index.search(texto, index.matrix[fila], k=args.k)
+        elapsed = time.perf_counter() - start
+        print(f"{len(sample):,} consultas en {elapsed:.2f}s ({elapsed / len(sample) * 1000:.1f} ms/consulta)")
+        return
+
+    if not args.query:
+        parser.error("falta la consulta (o usar --bench)")
+
+    query_vector = None
+    try:
+        from quipu.embeddings import EmbeddingService, create_genai_client
+        service = EmbeddingService(create_genai_client(), task_type="RETRIEVAL_QUERY")
+        query_vector = service.embed_one(args.query)
+    except Exception as e:
+        print(f"[WARN] Sin embedding de la consulta, solo BM25: {e}")
+
+    start = time.perf_counter()
+    resultados = index.search(args.query, query_vector, k=args.k, partido_id=args.partido_id,
+                              categoria=args.categoria, candidato_id=args.candidato_id)
+    print(f"{len(resultados)} resultados en {(time.perf_counter() - start) * 1000:.1f} ms\n")
+    for r in resultados:
+        print(f"[{r['tipo']} {r['id']}] score={r['score']:.4f} bm25#{r['rank_bm25']} vec#{r['rank_vector']}")
+        print(f"    {r['texto'][:160]}")
+
+
+if __name__ == "__main__":
+    main()
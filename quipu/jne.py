@@ -0,0 +1,43 @@
+"""
+Mapeo de registros del JNE (candidatos_jne_2026.json) a filas de quipu_candidatos.
+"""
+
+# Campos crudos que lee map_candidato (proyección sobre el cache Parquet, ver quipu/columnar.py)
+JNE_FIELDS = (
+    'strDocumentoIdentidad', 'strNombres', 'strApellidoPaterno', 'strApellidoMaterno', 'strSexo',
+    'strOrganizacionPolitica', 'strTipoEleccion', 'strCargo', 'idCargo', 'strUbigeo',
+    'strDepartamento', 'strProvincia', 'strDistrito', 'strNombre', 'strEstadoCandidato',
+)
+
+
+def map_candidato(c, partido_ids):
+    """Registro crudo del JNE → fila de quipu_candidatos (partido_id si el partido existe)."""
+    candidato = {
+        'dni': c.get('strDocumentoIdentidad'),
+        'nombres': c.get('strNombres'),
+        'apellido_paterno': c.get('strApellidoPaterno'),
+        'apellido_materno': c.get('strApellidoMaterno'),
+        'nombre_completo': f"{c.get('strNombres', '')} {c.get('strApellidoPaterno', '')} {c.get('strApellidoMaterno', '')}".strip(),
+        'sexo': c.get('strSexo'),
+        'organizacion_politica': c.get('strOrganizacionPolitica'),
+        'tipo_eleccion': c.get('strTipoEleccion'),
+        'cargo_postula': c.get('strCargo'),
+        'cargo_eleccion': c.get('idCargo'),
+        'ubigeo': c.get('strUbigeo'),
+        'departamento': c.get('strDepartamento'),
+        'provincia': c.get('strProvincia'),
+        'distrito': c.get('strDistrito'),
+        'foto_url': c.get('strNombre'),
+        'estado': c.get('strEstadoCandidato'),
+    }
+
+    org = candidato['organizacion_politica']
+    if org and org in partido_ids:
+        candidato['partido_id'] = partido_ids[org]
+
+    return candidato
+
+
+def candidato_key(candidato):
+    """Clave natural de quipu_candidatos: UNIQUE (dni, cargo_eleccion)."""
+    return f"{candidato.get('dni')}|{candidato.get('cargo_eleccion')}"
@@ -0,0 +1,129 @@
+"""
+Lectura incremental de JSON grandes (snapshots JNE de decenas de MB).
+
+Solo se soporta la forma que usan nuestros exports: un array en la raíz, o un
+objeto en la raíz con el array bajo alguna clave ({metadata, hojas_vida}). Los
+elementos del array se decodifican de a uno con json.JSONDecoder.raw_decode,
+así que la memoria queda acotada por el tamaño de un registro y del chunk de
+lectura, no por el tamaño del archivo.
+"""
+
+import json
+
+CHUNK_SIZE = 1 << 20  # 1M caracteres por lectura
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """Buffer de texto sobre un archivo que se rellena a demanda."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Lee otro chunk. Devuelve False si ya no hay más datos."""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Descartar lo ya consumido para que el buffer no crezca sin límite
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Siguiente caracter no-blanco (sin consumirlo), o '' al final."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inválido: se esperaba '{char}' y se encontró '{found or 'EOF'}'")
+        self.pos += 1
+
+    def value(self, decoder):
+        """Decodifica el siguiente valor JSON completo."""
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # Un número o literal al borde del buffer puede estar truncado
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _iter_array(reader, decoder):
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value(decoder)
+        sep = reader.peek()
+        reader.pos += 1
+        if sep == "]":
+            return
+        if sep != ",":
+            raise ValueError(f"JSON inválido: separador inesperado '{sep or 'EOF'}' en array")
+
+
+def iter_json_array(path, keys=None, chunk_size=CHUNK_SIZE):
+    """
+    Itera los elementos de un array JSON sin cargar el archivo completo.
+
+    Si la raíz es un array, se itera directamente. Si es un objeto, se itera el
+    primer valor tipo array cuya clave esté en `keys` (en el orden en que
+    aparecen en el archivo); los demás valores se decodifican y descartan, por
+    lo que deben ser chicos (p.ej. `metadata`).
+    """
+    keys = set(keys or ())
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _Reader(f, chunk_size)
+        first = reader.peek()
+
+        if first == "[":
+            yield from _iter_array(reader, decoder)
+            return
+        if first != "{":
+            raise ValueError(f"Formato JSON no soportado para streaming: empieza con '{first or 'EOF'}'")
+
+        reader.pos += 1
+        if reader.peek() == "}":
+            raise ValueError(f"No se encontró ninguna de las claves {sorted(keys)}")
+
+        while True:
+            key = reader.value(decoder)
+            reader.expect(":")
+            if key in keys and reader.peek() == "[":
+                yield from _iter_array(reader, decoder)
+                return
+            reader.value(decoder)  # descartar (metadata, etc.)
+            sep = reader.peek()
+            reader.pos += 1
+            if sep == "}":
+                raise ValueError(f"No se encontró ninguna de las claves {sorted(keys)}")
+            if sep != ",":
+                raise ValueError(f"JSON inválido: separador inesperado '{sep or 'EOF'}' en objeto")
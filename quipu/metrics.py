@@ -0,0 +1,518 @@
+"""
+Instrumentación de los scripts: latencia, bytes, filas, errores y reintentos
+por fase y por llamada a Supabase / Gemini, con un reporte al final de la corrida.
+
+Los clientes se envuelven una vez y todo lo que pase por ellos (incluido lo
+que hacen BulkUpserter, EmbeddingService o los snapshots desde sus hilos) se
+registra en la fase activa:
+
+    from quipu import metrics
+
+    metrics.start_run("002_migrate_to_supabase")
+    supabase = metrics.instrument_supabase(create_client(url, key))
+    with metrics.phase("promesas"):
+        ...
+
+Al salir del proceso (atexit) se escriben en data/.cache/metrics/
+(o QUIPU_METRICS_DIR):
+
+- <script>-<YYYYmmdd-HHMMSS>.json: reporte de la corrida, para comparar en el tiempo
+- <script>.prom: formato textfile de Prometheus (node_exporter
+  --collector.textfile.directory), reescrito en cada corrida
+
+Por fase se reporta el tiempo de pared, la CPU del proceso y el tiempo
+acumulado esperando a cada servicio; `dominante` indica cuál de los tres
+pesó más (las esperas en paralelo se suman, así que pueden superar al tiempo
+de pared). Los bytes son los del JSON serializado del payload y de la
+respuesta, no los del cable (sin compresión ni headers), y son estimados:
+de una lista de más de BYTES_SAMPLE elementos se serializa una muestra
+repartida y se escala, para no volver a codificar cada batch y cada página.
+
+Sin start_run() las llamadas se registran igual pero no se escribe nada.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from quipu.cache import CACHE_DIR
+
+METRICS_DIR = Path(os.getenv("QUIPU_METRICS_DIR") or CACHE_DIR / "metrics")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIN_FASE = "main"
+BYTES_SAMPLE = 8     # Elementos que se serializan para estimar el tamaño de una lista
+
+
+def _encoded_bytes(value):
+    return len(json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def _json_bytes(value):
+    """Tamaño estimado del JSON de `value` (exacto si no tiene listas largas)."""
+    if value is None:
+        return 0
+    if isinstance(value, dict) and value:
+        return 1 + sum(_encoded_bytes(str(k)) + 2 + (_json_bytes(v) if v is not None else 4)
+                       for k, v in value.items())
+    if isinstance(value, (list, tuple)) and len(value) > BYTES_SAMPLE:
+        paso = len(value) / BYTES_SAMPLE
+        muestra = [value[int(i * paso)] for i in range(BYTES_SAMPLE)]
+        return round(_encoded_bytes(muestra) * len(value) / BYTES_SAMPLE)
+    return _encoded_bytes(value)
+
+
+class Histogram:
+    """Histograma acumulativo con los buckets de LATENCY_BUCKETS (segundos)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)   # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                break
+        else:
+            i = len(LATENCY_BUCKETS)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimación por interpolación lineal dentro del bucket (como histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        acumulado = 0
+        for i, n in enumerate(self.counts):
+            if acumulado + n >= rank and n:
+                lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+                if i == len(LATENCY_BUCKETS):
+                    return lower
+                return lower + (LATENCY_BUCKETS[i] - lower) * (rank - acumulado) / n
+            acumulado += n
+        return LATENCY_BUCKETS[-1]
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), self.counts):
+            total += n
+            yield bound, total
+
+
+class CallStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rows = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = Histogram()
+
+    def to_dict(self):
+        return {
+            "calls": self.calls, "errors": self.errors, "retries": self.retries, "rows": self.rows,
+            "bytes_sent": self.bytes_sent, "bytes_received": self.bytes_received,
+            "latency_s": round(self.latency.sum, 4),
+            "p50_s": round(self.latency.quantile(0.5), 4),
+            "p90_s": round(self.latency.quantile(0.9), 4),
+            "p99_s": round(self.latency.quantile(0.99), 4),
+        }
+
+
+class Registry:
+    """Estado de la corrida, compartido por todos los hilos."""
+
+    def __init__(self):
+        self.script = None
+        self.started = None
+        self.failed = False
+        self.phases = {}        # nombre → {"wall_s", "cpu_s", "runs"}
+        self.calls = {}         # (fase, servicio, op, destino) → CallStats
+        self._stack = []
+        self._lock = threading.Lock()
+
+    @property
+    def current_phase(self):
+        return self._stack[-1] if self._stack else SIN_FASE
+
+    def record(self, service, op, target, seconds, error=False, rows=0, sent=0, received=0):
+        key = (self.current_phase, service, op, target)
+        with self._lock:
+            stats = self.calls.get(key) or self.calls.setdefault(key, CallStats())
+            stats.calls += 1
+            stats.errors += bool(error)
+            stats.rows += rows
+            stats.bytes_sent += sent
+            stats.bytes_received += received
+            stats.latency.observe(seconds)
+
+    def retry(self, service, op, target):
+        key = (self.current_phase, service, op, target)
+        with self._lock:
+            (self.calls.get(key) or self.calls.setdefault(key, CallStats())).retries += 1
+
+    def report(self):
+        wall = time.monotonic() - self.started[0] if self.started else 0.0
+        cpu = time.process_time() - self.started[1] if self.started else 0.0
+        fases = {}
+        for nombre, fase in self.phases.items():
+            fases[nombre] = {k: round(v, 4) if isinstance(v, float) else v for k, v in fase.items()}
+        dentro = sum(f["wall_s"] for f in self.phases.values())
+        if SIN_FASE not in fases:
+            fases[SIN_FASE] = {"wall_s": round(max(wall - dentro, 0.0), 4), "cpu_s": None, "runs": 0}
+
+        llamadas = []
+        espera = {}
+        for (fase, service, op, target), stats in sorted(self.calls.items()):
+            llamadas.append({"phase": fase, "service": service, "op": op, "target": target, **stats.to_dict()})
+            por_servicio = espera.setdefault(fase, {})
+            por_servicio[service] = por_servicio.get(service, 0.0) + stats.latency.sum
+
+        for nombre, fase in fases.items():
+            servicios = {s: round(t, 4) for s, t in espera.get(nombre, {}).items()}
+            fase["service_s"] = servicios
+            candidatos = dict(servicios, cpu=fase["cpu_s"] or 0.0)
+            fase["dominante"] = max(candidatos, key=candidatos.get) if any(candidatos.values()) else None
+
+        return {
+            "script": self.script,
+            "started_at": self.started[2] if self.started else None,
+            "status": "error" if self.failed else "ok",
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "phases": fases,
+            "calls": llamadas,
+        }
+
+
+_registry = Registry()
+
+
+def registry():
+    return _registry
+
+
+# ============================================
+# Corrida y fases
+# ============================================
+
+def start_run(script, write_at_exit=True):
+    """Marca el inicio de la corrida; al salir del proceso escribe el reporte."""
+    _registry.script = script
+    _registry.started = (time.monotonic(), time.process_time(), datetime.now().isoformat(timespec="seconds"))
+    if write_at_exit:
+        previous_hook = sys.excepthook
+
+        def excepthook(*args):
+            _registry.failed = True
+            previous_hook(*args)
+
+        sys.excepthook = excepthook
+        atexit.register(_write_at_exit)
+
+
+def _write_at_exit():
+    try:
+        paths = write_report()
+        print(f"Métricas: {paths[0]}")
+    except OSError as e:
+        print(f"[WARN] No se pudo escribir el reporte de métricas: {e}")
+
+
+class phase:
+    """
+    Context manager (o decorador) que atribuye lo que pase dentro a `name`.
+    Las fases anidadas se atribuyen a la interna; las llamadas desde otros
+    hilos van a la fase activa del programa, no a la del hilo.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        _registry._stack.append(self.name)
+        self._start = (time.monotonic(), time.process_time())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.monotonic() - self._start[0]
+        cpu = time.process_time() - self._start[1]
+        _registry._stack.pop()
+        with _registry._lock:
+            fase = _registry.phases.setdefault(self.name, {"wall_s": 0.0, "cpu_s": 0.0, "runs": 0})
+            fase["wall_s"] += wall
+            fase["cpu_s"] += cpu
+            fase["runs"] += 1
+        return False
+
+    def __call__(self, fn):
+        import functools
+
+        @functools.wraps(fn)
+        def wrapped(*args, **kwargs):
+            with phase(self.name):
+                return fn(*args, **kwargs)
+        return wrapped
+
+
+def count_retry(service, op, target):
+    """Para los loops de reintento: el error ya lo cuenta el cliente instrumentado."""
+    _registry.retry(service, op, target)
+
+
+# ============================================
+# Clientes instrumentados
+# ============================================
+
+class _Query:
+    """Envuelve un request builder de postgrest; mide execute()."""
+
+    WRITES = ("insert", "upsert", "update")
+
+    def __init__(self, inner, target, op="select", sent=0):
+        self._inner = inner
+        self._target = target
+        self._op = op
+        self._sent = sent
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        op, sent = self._op, self._sent
+        if name in self.WRITES or name in ("select", "delete"):
+            op = name
+        if not callable(attr):
+            return _Query(attr, self._target, op, sent) if hasattr(attr, "execute") else attr
+
+        def call(*args, **kwargs):
+            nonlocal sent
+            if name in self.WRITES:
+                sent = _json_bytes(args[0] if args else kwargs.get("json"))
+            result = attr(*args, **kwargs)
+            return _Query(result, self._target, op, sent) if hasattr(result, "execute") else result
+        return call
+
+    def execute(self):
+        start = time.monotonic()
+        try:
+            response = self._inner.execute()
+        except Exception:
+            _registry.record("supabase", self._op, self._target, time.monotonic() - start,
+                             error=True, sent=self._sent)
+            raise
+        elapsed = time.monotonic() - start
+        data = getattr(response, "data", None)
+        _registry.record("supabase", self._op, self._target, elapsed,
+                         rows=len(data) if isinstance(data, list) else 0,
+                         sent=self._sent, received=_json_bytes(data))
+        return response
+
+
+class _Bucket:
+    """Envuelve storage.from_(bucket): mide las operaciones sobre archivos."""
+
+    OPS = ("upload", "update", "download", "remove", "list")
+
+    def __init__(self, inner, bucket):
+        self._inner = inner
+        self._bucket = bucket
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if name not in self.OPS:
+            return attr
+
+        def call(*args, **kwargs):
+            payload = args[1] if len(args) > 1 else kwargs.get("file")
+            sent = len(payload) if isinstance(payload, (bytes, bytearray)) else 0
+            start = time.monotonic()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception:
+                _registry.record("storage", name, self._bucket, time.monotonic() - start, error=True, sent=sent)
+                raise
+            received = len(result) if isinstance(result, (bytes, bytearray)) else 0
+            _registry.record("storage", name, self._bucket, time.monotonic() - start,
+                             rows=1, sent=sent, received=received)
+            return result
+        return call
+
+
+class _Storage:
+    def __init__(self, inner):
+        self._inner = inner
+
+    def from_(self, bucket):
+        return _Bucket(self._inner.from_(bucket), bucket)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class _Supabase:
+    def __init__(self, inner):
+        self._inner = inner
+
+    def table(self, name):
+        return _Query(self._inner.table(name), name)
+
+    from_ = table
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        params = params if params is not None else {}
+        return _Query(self._inner.rpc(fn, params, *args, **kwargs), fn, op="rpc", sent=_json_bytes(params))
+
+    @property
+    def storage(self):
+        return _Storage(self._inner.storage)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+def instrument_supabase(client):
+    """Cliente de supabase-py con table/rpc/storage medidos; el resto pasa directo."""
+    return client if isinstance(client, _Supabase) else _Supabase(client)
+
+
+def _text_bytes(contents):
+    if isinstance(contents, str):
+        return len(contents.encode("utf-8")), 1
+    items = list(contents)
+    return sum(len(str(c).encode("utf-8")) for c in items), len(items)
+
+
+class _Models:
+    def __init__(self, inner):
+        self._inner = inner
+
+    def generate_content(self, model, contents, *args, **kwargs):
+        sent, _ = _text_bytes(contents)
+        start = time.monotonic()
+        try:
+            response = self._inner.generate_content(*args, model=model, contents=contents, **kwargs)
+        except Exception:
+            _registry.record("gemini", "generate_content", model, time.monotonic() - start, error=True, sent=sent)
+            raise
+        received = len((getattr(response, "text", None) or "").encode("utf-8"))
+        _registry.record("gemini", "generate_content", model, time.monotonic() - start,
+                         rows=1, sent=sent, received=received)
+        return response
+
+    def embed_content(self, model, contents, *args, **kwargs):
+        sent, items = _text_bytes(contents)
+        start = time.monotonic()
+        try:
+            response = self._inner.embed_content(*args, model=model, contents=contents, **kwargs)
+        except Exception:
+            _registry.record("gemini", "embed_content", model, time.monotonic() - start, error=True, sent=sent)
+            raise
+        received = sum(4 * len(e.values) for e in (getattr(response, "embeddings", None) or []))
+        _registry.record("gemini", "embed_content", model, time.monotonic() - start,
+                         rows=items, sent=sent, received=received)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class _Genai:
+    def __init__(self, inner):
+        self._inner = inner
+        self.models = _Models(inner.models)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+def instrument_genai(client):
+    """Cliente google-genai con generate_content/embed_content medidos (received de embed: 4 bytes/dim)."""
+    return client if isinstance(client, _Genai) else _Genai(client)
+
+
+# ============================================
+# Reporte
+# ============================================
+
+def _labels(**labels):
+    def escape(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def prometheus_text(report, reg=None):
+    """Reporte en formato de exposición de Prometheus (textfile collector)."""
+    reg = reg or _registry
+    script = report["script"] or "desconocido"
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(script=script, **labels)} {value}")
+
+    metric("quipu_run_duration_seconds", "gauge", "Duración de la última corrida",
+           [({}, report["wall_s"])])
+    metric("quipu_run_cpu_seconds", "gauge", "CPU del proceso en la última corrida",
+           [({}, report["cpu_s"])])
+    metric("quipu_run_success", "gauge", "1 si la última corrida terminó sin excepción",
+           [({}, int(report["status"] == "ok"))])
+    metric("quipu_run_timestamp_seconds", "gauge", "Fin de la última corrida (epoch)",
+           [({}, int(time.time()))])
+    metric("quipu_phase_duration_seconds", "gauge", "Tiempo de pared por fase",
+           [({"phase": p}, f["wall_s"]) for p, f in report["phases"].items()])
+    metric("quipu_phase_cpu_seconds", "gauge", "CPU del proceso por fase",
+           [({"phase": p}, f["cpu_s"]) for p, f in report["phases"].items() if f["cpu_s"] is not None])
+
+    items = sorted(reg.calls.items())
+    for name, attr, help_text in (
+        ("quipu_requests_total", "calls", "Requests por servicio y destino"),
+        ("quipu_request_errors_total", "errors", "Requests con error"),
+        ("quipu_request_retries_total", "retries", "Reintentos"),
+        ("quipu_request_rows_total", "rows", "Filas (o textos) devueltas o enviadas"),
+        ("quipu_request_sent_bytes_total", "bytes_sent", "Bytes de payload enviados"),
+        ("quipu_request_received_bytes_total", "bytes_received", "Bytes de respuesta recibidos"),
+    ):
+        metric(name, "counter", help_text,
+               [({"phase": k[0], "service": k[1], "op": k[2], "target": k[3]}, getattr(s, attr)) for k, s in items])
+
+    name = "quipu_request_duration_seconds"
+    lines.append(f"# HELP {name} Latencia por request")
+    lines.append(f"# TYPE {name} histogram")
+    for (fase, service, op, target), stats in items:
+        base = dict(script=script, phase=fase, service=service, op=op, target=target)
+        for bound, total in stats.latency.cumulative():
+            lines.append(f"{name}_bucket{_labels(**base, le=bound)} {total}")
+        lines.append(f"{name}_sum{_labels(**base)} {stats.latency.sum:.6f}")
+        lines.append(f"{name}_count{_labels(**base)} {stats.latency.count}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_report(metrics_dir=None):
+    """Escribe el JSON de la corrida y el .prom; devuelve (json_path, prom_path)."""
+    metrics_dir = Path(metrics_dir or METRICS_DIR)
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    report = _registry.report()
+    script = report["script"] or "desconocido"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    json_path = metrics_dir / f"{script}-{stamp}.json"
+    prom_path = metrics_dir / f"{script}.prom"
+    _write_atomic(json_path, json.dumps(report, ensure_ascii=False, indent=2))
+    _write_atomic(prom_path, prometheus_text(report))
+    return json_path, prom_path
@@ -0,0 +1,205 @@
+"""
+Extracción de texto de los planes de gobierno (pdfs/) y segmentación en
+promesas candidatas.
+
+- El texto se extrae por rangos de páginas en un pool de procesos: un PDF de
+  300 páginas se reparte entre todos los cores en vez de ocupar uno solo.
+- Las páginas extraídas se cachean en data/.cache/pdf_pages/<sha256>.json,
+  así que un PDF que no cambió no se vuelve a abrir.
+- segmentar() corta el texto de cada página en párrafos/viñetas, sigue el
+  encabezado de sección vigente y puntúa cada segmento según qué tanto se
+  parece a una propuesta (verbo de acción o "se + futuro" al inicio, viñeta,
+  largo).
+
+Requiere:
+    - pip install pypdf
+"""
+
+import re
+import json
+import hashlib
+import unicodedata
+from pathlib import Path
+
+from quipu.cache import CACHE_DIR
+from quipu.text import normalizar
+
+PAGE_CACHE_DIR = CACHE_DIR / "pdf_pages"
+PAGE_CACHE_VERSION = 1
+SEGMENTER_VERSION = 2
+PAGES_PER_TASK = 16
+
+MIN_CHARS = 40
+MAX_CHARS = 1200
+
+VERBOS_PROPUESTA = {
+    "implementar", "implementaremos", "crear", "crearemos", "promover", "promoveremos",
+    "fortalecer", "fortaleceremos", "garantizar", "garantizaremos", "construir", "construiremos",
+    "impulsar", "impulsaremos", "reducir", "reduciremos", "ampliar", "ampliaremos",
+    "mejorar", "mejoraremos", "establecer", "estableceremos", "desarrollar", "desarrollaremos",
+    "reformar", "reformaremos", "eliminar", "eliminaremos", "incrementar", "incrementaremos",
+    "aumentar", "aumentaremos", "modernizar", "modernizaremos", "invertir", "invertiremos",
+    "asegurar", "aseguraremos", "priorizar", "priorizaremos", "universalizar", "recuperar",
+    "recuperaremos", "declarar", "otorgar", "otorgaremos", "financiar", "financiaremos",
+    "reestructurar", "digitalizar", "descentralizar", "formalizar", "articular", "consolidar",
+    "masificar", "dotar", "instalar", "proponemos", "propone",
+}
+# Futuro impersonal: "se creará", "se implementarán" (no "se observa", "se declara")
+_FUTURO_RE = re.compile(r"\w+[aei]r(?:á|án)")
+_VINETA_RE = re.compile(r"^\s*(?:[•●▪■◦➢➤►\-–—*]|\(?[0-9]{1,2}[.)]|\(?[a-z][.)])\s+")
+_NUMERO_SECCION_RE = re.compile(r"^\s*(?:[0-9]+\.[0-9]+(?:\.[0-9]+)*\.?|[IVXLC]+\.)\s+\S")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def resolve_pdf(nombre, pdf_dir):
+    """Ruta del PDF aunque el nombre en disco use otra forma Unicode (NFC/NFD)."""
+    path = Path(pdf_dir) / nombre
+    if path.exists():
+        return path
+    objetivo = unicodedata.normalize("NFC", nombre)
+    for candidato in Path(pdf_dir).iterdir():
+        if unicodedata.normalize("NFC", candidato.name) == objetivo:
+            return candidato
+    return None
+
+
+def page_count(path):
+    from pypdf import PdfReader
+    return len(PdfReader(str(path)).pages)
+
+
+def extract_pages(path, start, end):
+    """(path, start, [texto de las páginas start..end-1]). Corre en el pool de procesos."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(str(path))
+    textos = []
+    for i in range(start, min(end, len(reader.pages))):
+        try:
+            textos.append(reader.pages[i].extract_text() or "")
+        except Exception:  # Una página corrupta no tira todo el documento
+            textos.append("")
+    return str(path), start, textos
+
+
+def page_tasks(path, n_pages, pages_per_task=PAGES_PER_TASK):
+    return [(str(path), start, start + pages_per_task) for start in range(0, n_pages, pages_per_task)]
+
+
+def cache_path(sha, cache_dir=PAGE_CACHE_DIR):
+    return Path(cache_dir) / f"{sha}.json"
+
+
+def load_cached_pages(sha, cache_dir=PAGE_CACHE_DIR):
+    path = cache_path(sha, cache_dir)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["pages"] if data.get("version") == PAGE_CACHE_VERSION else None
+
+
+def save_cached_pages(sha, nombre, pages, cache_dir=PAGE_CACHE_DIR):
+    path = cache_path(sha, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": PAGE_CACHE_VERSION, "file": nombre, "pages": pages}, f, ensure_ascii=False)
+    tmp.replace(path)
+
+
+def _es_encabezado(linea):
+    """Línea corta sin punto final, en mayúsculas o numerada como sección (2.1, IV.)."""
+    if not linea or len(linea) > 90 or linea.endswith((".", ";", ",")):
+        return False
+    letras = [c for c in linea if c.isalpha()]
+    if len(letras) < 4:
+        return False
+    mayusculas = sum(c.isupper() for c in letras) / len(letras)
+    return mayusculas > 0.8 or bool(_NUMERO_SECCION_RE.match(linea))
+
+
+def _es_futuro(palabra):
+    """Futuro de 3ra persona; sin tildes (texto mal extraído) solo si es de un verbo de VERBOS_PROPUESTA."""
+    if _FUTURO_RE.fullmatch(palabra):
+        return True
+    base = normalizar(palabra)
+    base = base[:-1] if base.endswith("an") else base
+    return base.endswith("ra") and base[:-1] in VERBOS_PROPUESTA
+
+
+def _marca_propuesta(palabras, i):
+    """La palabra i es un verbo de propuesta o el "se" de "se + futuro"."""
+    if palabras[i] == "se":
+        return i + 1 < len(palabras) and _es_futuro(palabras[i + 1])
+    return normalizar(palabras[i]) in VERBOS_PROPUESTA
+
+
+def confianza(texto, vineta):
+    """Score 0-1 de que el segmento sea una propuesta concreta."""
+    palabras = [p.strip(".,:;") for p in texto.lower().split()]
+    score = 0.2
+    if palabras and _marca_propuesta(palabras, 0):
+        score += 0.4
+    elif any(_marca_propuesta(palabras, i) for i in range(1, min(len(palabras), 8))):
+        score += 0.25
+    if vineta:
+        score += 0.15
+    if 80 <= len(texto) <= 600:
+        score += 0.15
+    if re.search(r"\d", texto):
+        score += 0.05  # metas cuantificadas
+    return round(min(score, 1.0), 2)
+
+
+def segmentar(pages, min_confianza=0.5):
+    """
+    Genera (pagina, seccion, texto, confianza) desde el texto por página
+    (pagina es 1-based). Los segmentos cruzan saltos de línea pero no de página.
+    """
+    seccion = None
+    for numero, texto in enumerate(pages, start=1):
+        actual, vineta = [], False
+
+        def cerrar():
+            if not actual:
+                return None
+            segmento = " ".join(actual)
+            segmento = re.sub(r"(\w)- (\w)", r"\1\2", segmento)  # palabras cortadas con guion
+            segmento = _VINETA_RE.sub("", segmento, count=1).strip()
+            if MIN_CHARS <= len(segmento) <= MAX_CHARS:
+                score = confianza(segmento, vineta)
+                if score >= min_confianza:
+                    return (numero, seccion, segmento, score)
+            return None
+
+        for linea in (l.strip() for l in texto.splitlines()):
+            nuevo = None
+            if not linea:
+                nuevo = cerrar()
+                actual, vineta = [], False
+            elif _es_encabezado(linea):
+                nuevo = cerrar()
+                actual, vineta = [], False
+                seccion = " ".join(linea.split())[:200]
+            elif _VINETA_RE.match(linea):
+                nuevo = cerrar()
+                actual, vineta = [linea], True
+            else:
+                actual.append(linea)
+                # Un punto final en línea corta suele cerrar el párrafo
+                if linea.endswith(".") and len(linea) < 60:
+                    nuevo = cerrar()
+                    actual, vineta = [], False
+            if nuevo:
+                yield nuevo
+        ultimo = cerrar()
+        if ultimo:
+            yield ultimo
@@ -0,0 +1,146 @@
+"""
+Fotos de candidatos: descarga, deduplicación por contenido y miniaturas WebP.
+
+Cada foto original se identifica por el sha256 de sus bytes; `key` son los
+primeros 16 hex. Varios candidatos (la misma persona en dos cargos, las fotos
+genéricas del JNE) comparten key y se procesan una sola vez.
+
+Variantes por key (data/fotos/<key>/...):
+    s64.webp, s128.webp, s192.webp   cuadradas, recorte centrado (avatares)
+    w320.webp, w640.webp             ancho fijo, proporción original (detalle)
+
+manifest.json guarda:
+    sources:    foto_url → {sha256, key, etag, last_modified}
+    assets:     key → {version, variants: {nombre: {width, height, bytes}}, uploaded}
+    candidatos: id → {dni, key}
+
+Requiere:
+    - pip install pillow
+"""
+
+import json
+import hashlib
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from quipu.cache import CACHE_DIR
+
+JNE_FOTO_BASE = "https://mpesije.jne.gob.pe/apidocs/"   # Igual que buildFotoUrl() del frontend
+ORIGINALS_DIR = CACHE_DIR / "fotos"
+OUTPUT_DIR = Path(__file__).resolve().parent.parent / "data" / "fotos"
+MANIFEST_NAME = "manifest.json"
+
+PIPELINE_VERSION = 1
+SQUARE_SIZES = (64, 128, 192)
+WIDTHS = (320, 640)
+WEBP_QUALITY = 80
+DOWNLOAD_TIMEOUT = 30
+
+
+def foto_source_url(foto_url):
+    return foto_url if foto_url.startswith("http") else JNE_FOTO_BASE + foto_url
+
+
+def original_path(foto_url, directory=ORIGINALS_DIR):
+    return Path(directory) / hashlib.sha1(foto_url.encode()).hexdigest()
+
+
+def variant_names():
+    return [f"s{size}" for size in SQUARE_SIZES] + [f"w{width}" for width in WIDTHS]
+
+
+def download(foto_url, previo=None, directory=ORIGINALS_DIR, timeout=DOWNLOAD_TIMEOUT):
+    """
+    Baja la foto original a `directory` y devuelve la entrada de `sources`.
+
+    Con `previo` manda If-None-Match / If-Modified-Since: si el JNE responde 304
+    y el original sigue en disco, devuelve `previo` sin volver a hashear.
+    """
+    path = original_path(foto_url, directory)
+    request = urllib.request.Request(foto_source_url(foto_url), headers={"User-Agent": "quipu-fotos"})
+    if previo and path.exists():
+        if previo.get("etag"):
+            request.add_header("If-None-Match", previo["etag"])
+        if previo.get("last_modified"):
+            request.add_header("If-Modified-Since", previo["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = response.read()
+            headers = response.headers
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return previo
+        raise
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    sha = hashlib.sha256(data).hexdigest()
+    return {
+        "sha256": sha,
+        "key": sha[:16],
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+    }
+
+
+def render_variants(src, dest_dir):
+    """
+    Genera las variantes WebP de `src` en `dest_dir`. Corre en el pool de procesos.
+    Devuelve (dest_dir, {nombre: {width, height, bytes}}).
+    """
+    from PIL import Image, ImageOps
+
+    dest = Path(dest_dir)
+    dest.mkdir(parents=True, exist_ok=True)
+    variants = {}
+
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im).convert("RGB")
+
+        for size in SQUARE_SIZES:
+            thumb = ImageOps.fit(im, (size, size), Image.LANCZOS, centering=(0.5, 0.35))  # Caras arriba del centro
+            variants[f"s{size}"] = _save(thumb, dest / f"s{size}.webp")
+
+        for width in WIDTHS:
+            if im.width > width:
+                resized = im.resize((width, round(im.height * width / im.width)), Image.LANCZOS)
+            else:
+                resized = im   # No agrandar fotos chicas
+            variants[f"w{width}"] = _save(resized, dest / f"w{width}.webp")
+
+    return str(dest), variants
+
+
+def _save(im, path):
+    tmp = path.with_suffix(".tmp")
+    im.save(tmp, "WEBP", quality=WEBP_QUALITY, method=6)
+    tmp.replace(path)
+    return {"width": im.width, "height": im.height, "bytes": path.stat().st_size}
+
+
+def asset_ok(asset, directory):
+    """La key ya tiene todas sus variantes en disco con la versión actual del pipeline."""
+    return (asset is not None
+            and asset.get("version") == PIPELINE_VERSION
+            and set(asset.get("variants", {})) == set(variant_names())
+            and all((Path(directory) / f"{name}.webp").exists() for name in asset["variants"]))
+
+
+def load_manifest(output_dir=OUTPUT_DIR):
+    path = Path(output_dir) / MANIFEST_NAME
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"version": PIPELINE_VERSION, "sources": {}, "assets": {}, "candidatos": {}}
+
+
+def save_manifest(manifest, output_dir=OUTPUT_DIR):
+    path = Path(output_dir) / MANIFEST_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    tmp.replace(path)
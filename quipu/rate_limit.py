@@ -0,0 +1,34 @@
+"""
+Rate limiter compartido entre hilos (token bucket).
+"""
+
+import time
+import threading
+
+
+class RateLimiter:
+    """
+    Permite hasta `rate` adquisiciones por `per` segundos, con ráfagas de
+    hasta `burst` (por defecto = rate). acquire() bloquea hasta que haya cupo.
+    """
+
+    def __init__(self, rate, per=60.0, burst=None):
+        if rate <= 0:
+            raise ValueError("rate debe ser > 0")
+        self.capacity = float(burst or rate)
+        self.fill_rate = rate / per
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.fill_rate
+            time.sleep(wait)
@@ -0,0 +1,218 @@
+"""
+Rollups del Dashboard (fase3/migrations/024_dashboard_rollups.sql).
+
+Dos grupos, cada uno con su huella de fuentes en quipu_rollup_meta:
+
+- promesas: conteo por categoría y por partido × categoría
+  (reemplaza el conteo de usePromesasPorCategoria en el navegador)
+- declaraciones: interacciones type = 'declaration' de QUIPU_MASTER por tema
+  (campo `categorias`, separado por ';') y por tema × candidato, con el
+  stakeholder resuelto por CandidatoResolver (reemplaza useDeclaracionesPorTema)
+
+refresh_rollups() compara la huella actual (count/max(id) de las tablas
+fuente) con la guardada y no hace nada si no cambió. Si cambió, recalcula el
+grupo en memoria y upsertea solo las filas cuyo total o label cambió; las
+claves que desaparecen quedan en 0. Cada refresh con cambios sube `version`.
+
+Un UPDATE de categoría no mueve count ni max(id): quien reclasifica debe
+llamar con force=True. Lo mismo pasa con interacciones nuevas agregadas a una
+entrada existente de QUIPU_MASTER; la huella incluye quipu_declaraciones (que
+el sync llena a partir de ellas) y el sync además llama con force=True si
+insertó algo.
+
+No es incremental: cada refresh de declaraciones vuelve a leer todo
+QUIPU_MASTER (id, interacciones) y recalcula los conteos desde cero; lo
+incremental es solo la escritura del diff.
+"""
+
+import re
+from datetime import datetime, timezone
+
+from quipu.bulk_upsert import BulkUpserter
+from quipu.candidato_resolver import CandidatoResolver
+from quipu.snapshots import fetch_parallel, table_stats
+from quipu.text import normalizar
+
+MIN_CONFIDENCE = 0.5     # Igual que sync_master_declaraciones.py
+MASTER_PAGE_SIZE = 200
+SIN_CANDIDATO = 0
+
+# tabla → (columnas de la clave, columna del label)
+TABLAS = {
+    "quipu_rollup_categorias": (("categoria_key",), "categoria"),
+    "quipu_rollup_partido_categoria": (("partido_id", "categoria_key"), "categoria"),
+    "quipu_rollup_temas": (("tema_key",), "tema"),
+    "quipu_rollup_tema_candidato": (("tema_key", "candidato_id"), "tema"),
+}
+GRUPOS = {
+    "promesas": ("quipu_rollup_categorias", "quipu_rollup_partido_categoria"),
+    "declaraciones": ("quipu_rollup_temas", "quipu_rollup_tema_candidato"),
+}
+
+
+def normalize_key(texto):
+    """Equivalente de normalizeKey() en frontend/src/lib/utils.ts."""
+    return re.sub(r"\s+", "_", normalizar(texto or ""))
+
+
+def _contar(conteo, key, label):
+    if key not in conteo:
+        conteo[key] = [label, 0]
+    conteo[key][1] += 1
+
+
+def rollup_promesas(promesas):
+    """{tabla: {clave: [label, total]}} a partir de filas (categoria, partido_id)."""
+    por_categoria, por_partido = {}, {}
+    for p in promesas:
+        categoria = p.get("categoria")
+        if not categoria:
+            continue
+        key = normalize_key(categoria)
+        _contar(por_categoria, (key,), categoria)
+        if p.get("partido_id") is not None:
+            _contar(por_partido, (p["partido_id"], key), categoria)
+    return {
+        "quipu_rollup_categorias": por_categoria,
+        "quipu_rollup_partido_categoria": por_partido,
+    }
+
+
+def rollup_declaraciones(masters, resolver, min_confidence=MIN_CONFIDENCE):
+    """{tabla: {clave: [label, total]}} a partir de filas de QUIPU_MASTER."""
+    por_tema, por_candidato = {}, {}
+    for entry in masters:
+        for inter in entry.get("interacciones") or []:
+            if inter.get("type") != "declaration" or not inter.get("categorias"):
+                continue
+            candidato_id = SIN_CANDIDATO
+            if inter.get("stakeholder"):
+                match = resolver.resolve(inter["stakeholder"])
+                if match.confidence >= min_confidence:
+                    candidato_id = match.candidato_id
+            for tema in (t.strip() for t in inter["categorias"].split(";")):
+                if not tema:
+                    continue
+                key = normalize_key(tema)
+                _contar(por_tema, (key,), tema)
+                _contar(por_candidato, (key, candidato_id), tema)
+    return {
+        "quipu_rollup_temas": por_tema,
+        "quipu_rollup_tema_candidato": por_candidato,
+    }
+
+
+def fetch_masters(supabase, page_size=MASTER_PAGE_SIZE):
+    """Todas las entradas de QUIPU_MASTER (id, interacciones) por keyset sobre id."""
+    rows = []
+    last_id = None
+    while True:
+        query = supabase.table("QUIPU_MASTER").select("id, interacciones").order("id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_id = page[-1]["id"]
+
+
+def fingerprint(supabase, grupo):
+    """Huella barata de las fuentes de un grupo."""
+    if grupo == "promesas":
+        return {"quipu_promesas_planes": list(table_stats(supabase, "quipu_promesas_planes"))}
+    return {
+        "QUIPU_MASTER": list(table_stats(supabase, "QUIPU_MASTER")),
+        "quipu_declaraciones": list(table_stats(supabase, "quipu_declaraciones")),
+        "quipu_candidatos": list(table_stats(supabase, "quipu_candidatos")),
+        "quipu_stakeholder_aliases": list(table_stats(supabase, "quipu_stakeholder_aliases")),
+    }
+
+
+def fetch_rollup(supabase, tabla, page_size=1000):
+    """{clave: [label, total]} de lo que hoy tiene la tabla de rollup (tablas chicas)."""
+    keys, label = TABLAS[tabla]
+    actual = {}
+    offset = 0
+    while True:
+        query = supabase.table(tabla).select(", ".join(keys + (label, "total")))
+        for k in keys:
+            query = query.order(k)
+        page = query.range(offset, offset + page_size - 1).execute().data
+        for r in page:
+            actual[tuple(r[k] for k in keys)] = [r[label], r["total"]]
+        if len(page) < page_size:
+            return actual
+        offset += page_size
+
+
+def diff_rollup(actual, nuevo):
+    """Claves cuyo (label, total) cambió; las que ya no existen pasan a total 0."""
+    cambios = {k: v for k, v in nuevo.items() if actual.get(k) != v}
+    for k, (label, total) in actual.items():
+        if k not in nuevo and total != 0:
+            cambios[k] = [label, 0]
+    return cambios
+
+
+def write_rollup(supabase, tabla, cambios):
+    keys, label = TABLAS[tabla]
+    now = datetime.now(timezone.utc).isoformat()
+    with BulkUpserter(supabase, tabla, on_conflict=",".join(keys), progress_every=0) as upserter:
+        for clave, (texto, total) in cambios.items():
+            upserter.submit({**dict(zip(keys, clave)), label: texto, "total": total, "updated_at": now})
+
+
+def refresh_rollups(supabase, grupos=tuple(GRUPOS), force=False):
+    """
+    Recalcula los grupos cuya huella cambió (o todos con force=True).
+    Devuelve {grupo: filas escritas, o None si se saltó}.
+    """
+    meta = {m["nombre"]: m for m in
+            supabase.table("quipu_rollup_meta").select("nombre, version, fingerprint").execute().data}
+    resultado = {}
+
+    for grupo in grupos:
+        huella = fingerprint(supabase, grupo)
+        previo = meta.get(grupo) or {}
+        if not force and previo.get("fingerprint") == huella:
+            print(f"  [ROLLUP] {grupo}: sin cambios en las fuentes (v{previo.get('version', 0)})")
+            resultado[grupo] = None
+            continue
+
+        if grupo == "promesas":
+            count, max_id = huella["quipu_promesas_planes"]
+            filas = fetch_parallel(supabase, "quipu_promesas_planes", "id, categoria, partido_id", count, max_id)
+            nuevos = rollup_promesas(filas)
+        else:
+            nuevos = rollup_declaraciones(fetch_masters(supabase), CandidatoResolver.from_supabase(supabase))
+
+        escritas = 0
+        for tabla in GRUPOS[grupo]:
+            cambios = diff_rollup(fetch_rollup(supabase, tabla), nuevos[tabla])
+            if cambios:
+                write_rollup(supabase, tabla, cambios)
+            escritas += len(cambios)
+
+        version = previo.get("version", 0) + (1 if escritas else 0)
+        supabase.table("quipu_rollup_meta").upsert({
+            "nombre": grupo,
+            "version": version,
+            "fingerprint": huella,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }, on_conflict="nombre").execute()
+        print(f"  [ROLLUP] {grupo}: {escritas:,} filas actualizadas (v{version})")
+        resultado[grupo] = escritas
+
+    return resultado
+
+
+def refresh_after_run(supabase, grupos=tuple(GRUPOS), force=False):
+    """refresh_rollups() al final de una migración/sync: un fallo solo se reporta."""
+    print("\nActualizando rollups del Dashboard...")
+    try:
+        return refresh_rollups(supabase, grupos, force)
+    except Exception as e:
+        print(f"  [WARN] No se pudieron actualizar los rollups: {e}")
+        print("  Correr fase3/scripts/refresh_rollups.py a mano")
+        return None
@@ -0,0 +1,259 @@
+"""
+Búsqueda semántica local sobre las promesas de promesas_v2.db.
+
+Replica en memoria la función quipu_buscar_promesas_similares
+(migrations/001_schema_supabase.sql): misma similitud (1 - distancia coseno),
+mismo corte estricto `similarity > match_threshold`, mismos filtros opcionales
+por categoría y partido, y mismas columnas de salida. A diferencia del RPC,
+search() acepta muchos vectores de consulta a la vez y los resuelve con un
+producto matricial por bloques + argpartition, sin red.
+
+Uso:
+    from quipu.semantic_search import PromesaSearchIndex
+
+    index = PromesaSearchIndex.from_sqlite(sqlite3.connect("data/promesas_v2.db"))
+    resultados = index.search(query_vectors, match_threshold=0.7, match_count=10)
+
+    python -m quipu.semantic_search --queries 2000   # benchmark con promesas como consultas
+    python -m quipu.semantic_search --compaction int8  # ídem sobre la matriz cuantizada
+
+index.compacted("int8") devuelve el mismo índice sobre una matriz compacta
+(int8, float16 o truncada, ver quipu/compaction.py).
+
+Requiere:
+    - pip install numpy
+"""
+
+import json
+import time
+import sqlite3
+import argparse
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from quipu.embedding_store import EmbeddingStore
+
+DB_PATH = Path(__file__).resolve().parent.parent / "data" / "promesas_v2.db"
+SUBSET_CACHE_SIZE = 16   # Submatrices filtradas que se guardan (cada una es una copia)
+
+
+def normalize_rows(matrix):
+    """Copia float32 con filas de norma 1 (filas nulas quedan en cero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores, k):
+    """
+    Top-k por fila de una matriz de scores (mayor primero).
+
+    Devuelve (índices, valores), ambos de forma (n_filas, k). Usa
+    argpartition para no ordenar la fila completa.
+    """
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n), (scores.shape[0], n))
+    values = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-values, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def load_promesas_matrix(conn, store=None):
+    """
+    (ids, matrix) de las promesas con embedding.
+
+    Usa el .npy de 010_convert_embeddings_npy.py si existe y está al día;
+    si no, parsea la columna JSON.
+    """
+    if store is None and EmbeddingStore.exists():
+        store = EmbeddingStore.load()
+        if not store.is_fresh(conn):
+            store = None
+    if store is not None:
+        return np.asarray(store.ids), store.matrix
+
+    ids, vectors = [], []
+    for promesa_id, emb_json in conn.execute(
+            "SELECT id, embedding FROM promesas WHERE embedding IS NOT NULL ORDER BY id"):
+        try:
+            vectors.append(json.loads(emb_json))
+            ids.append(promesa_id)
+        except (TypeError, ValueError):
+            continue
+    return np.array(ids, dtype=np.int64), np.array(vectors, dtype=np.float32)
+
+
+class LRUCache:
+    """Dict acotado: pasado `maxsize` descarta la entrada usada hace más tiempo."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, build):
+        """Valor de `key`; si no está lo calcula con build() y lo guarda."""
+        if key in self._data:
+            self._data.move_to_end(key)
+            return self._data[key]
+        value = self._data[key] = build()
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return value
+
+
+class PromesaSearchIndex:
+    """Índice en memoria: matriz normalizada + columnas para filtrar y devolver."""
+
+    def __init__(self, ids, matrix, categorias, partido_ids, rows):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        # Una CompactMatrix ya viene normalizada
+        self.matrix = matrix if hasattr(matrix, "scores") else normalize_rows(matrix)
+        self.categorias = np.asarray(categorias, dtype=object)
+        self.partido_ids = np.asarray(partido_ids, dtype=np.int64)
+        self.rows = rows  # dicts alineados a self.ids (texto_original, resumen, ...)
+        self._subsets = LRUCache(SUBSET_CACHE_SIZE)
+
+    @classmethod
+    def from_sqlite(cls, conn, store=None):
+        ids, matrix = load_promesas_matrix(conn, store)
+
+        meta = {}
+        for row in conn.execute("""
+                SELECT p.id, p.texto_original, p.resumen, p.categoria, p.partido_id,
+                       pp.nombre_oficial, pp.candidato_presidencial
+                FROM promesas p
+                JOIN partidos_politicos pp ON p.partido_id = pp.id
+                WHERE p.embedding IS NOT NULL"""):
+            meta[row[0]] = row
+
+        # Solo promesas con partido (el RPC hace JOIN con quipu_partidos)
+        keep = np.array([int(i) in meta for i in ids], dtype=bool)
+        ids, matrix = ids[keep], matrix[keep]
+
+        rows, categorias, partido_ids = [], [], []
+        for pid in ids:
+            _, texto, resumen, categoria, partido_id, partido, candidato = meta[int(pid)]
+            rows.append({
+                "id": int(pid),
+                "texto_original": texto,
+                "resumen": resumen,
+                "categoria": categoria,
+                "partido": partido,
+                "candidato": candidato,
+            })
+            categorias.append(categoria)
+            partido_ids.append(partido_id)
+
+        return cls(ids, matrix, categorias, partido_ids, rows)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def compacted(self, mode):
+        """Copia del índice sobre la matriz en un modo de quipu/compaction.py (p.ej. "int8")."""
+        from quipu.compaction import CompactMatrix
+
+        return PromesaSearchIndex(self.ids, CompactMatrix.build(self.matrix, mode),
+                                  self.categorias, self.partido_ids, self.rows)
+
+    def _subset(self, filter_categoria, filter_partido_id):
+        """Filas candidatas para un par de filtros (las últimas SUBSET_CACHE_SIZE, cacheadas)."""
+        if filter_categoria is None and filter_partido_id is None:
+            return None, self.matrix
+
+        def build():
+            mask = np.ones(len(self.ids), dtype=bool)
+            if filter_categoria is not None:
+                mask &= self.categorias == filter_categoria
+            if filter_partido_id is not None:
+                mask &= self.partido_ids == filter_partido_id
+            rows = np.flatnonzero(mask)
+            return rows, self.matrix[rows]
+        return self._subsets.get((filter_categoria, filter_partido_id), build)
+
+    def search_raw(self, query_embeddings, match_threshold=0.7, match_count=10,
+                   filter_categoria=None, filter_partido_id=None, block_size=1024):
+        """
+        Igual que search() pero devuelve, por consulta, (filas, similitudes)
+        como arrays en vez de dicts. Útil para jobs batch.
+        """
+        queries = normalize_rows(np.atleast_2d(query_embeddings))
+        subset_rows, sub = self._subset(filter_categoria, filter_partido_id)
+
+        out = []
+        for start in range(0, len(queries), block_size):
+            block = queries[start:start + block_size]
+            scores = sub.scores(block) if hasattr(sub, "scores") else block @ sub.T
+            idx, sims = top_k(scores, match_count)
+            for r_idx, r_sims in zip(idx, sims):
+                keep = r_sims > match_threshold
+                r_idx, r_sims = r_idx[keep], r_sims[keep]
+                if subset_rows is not None:
+                    r_idx = subset_rows[r_idx]
+                out.append((r_idx, r_sims))
+        return out
+
+    def search(self, query_embeddings, match_threshold=0.7, match_count=10,
+               filter_categoria=None, filter_partido_id=None, block_size=1024):
+        """
+        Promesas más similares a cada vector de consulta.
+
+        Con un solo vector (1-D) devuelve una lista de resultados; con una
+        matriz (n, d) devuelve una lista por consulta. Cada resultado tiene
+        las columnas del RPC: id, texto_original, resumen, categoria,
+        partido, candidato, similarity.
+        """
+        single = np.ndim(query_embeddings) == 1
+        raw = self.search_raw(query_embeddings, match_threshold, match_count,
+                              filter_categoria, filter_partido_id, block_size)
+        results = [
+            [{**self.rows[i], "similarity": float(s)} for i, s in zip(r_idx, r_sims)]
+            for r_idx, r_sims in raw
+        ]
+        return results[0] if single else results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda semántica local")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Base SQLite (default: data/promesas_v2.db)")
+    parser.add_argument("--queries", type=int, default=1000, help="Consultas a lanzar (promesas al azar)")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--compaction", help="Modo compacto de la matriz (ver quipu/compaction.py), p.ej. int8")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    index = PromesaSearchIndex.from_sqlite(conn)
+    conn.close()
+    print(f"Índice: {len(index):,} promesas x {index.matrix.shape[1]} en {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(index), size=min(args.queries, len(index)), replace=False)
+    queries = index.matrix[sample]
+    if args.compaction:
+        index = index.compacted(args.compaction)
+        print(f"Matriz {args.compaction}: {index.matrix.nbytes / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    results = index.search_raw(queries, args.threshold, args.count)
+    elapsed = time.perf_counter() - start
+    hits = sum(len(r[0]) for r in results)
+    print(f"{len(queries):,} consultas en {elapsed:.2f}s ({len(queries) / elapsed:,.0f} consultas/s, {hits:,} resultados)")
+
+
+if __name__ == "__main__":
+    main()
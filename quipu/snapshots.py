@@ -0,0 +1,167 @@
+"""
+Snapshots locales de tablas de referencia (candidatos, partidos, temas).
+
+Cada script que necesita el mapa DNI → candidato_id (o nombre → partido_id,
+o el catálogo de temas) lo arma desde un snapshot en
+data/.cache/snapshots/ en vez de recorrer la tabla con offset. El snapshot
+se revalida con dos requests baratos (count exacto y max(id)); si ambos
+coinciden y el archivo no venció, no se baja nada.
+
+Cuando hay que bajar la tabla se usa keyset (id > último) sobre rangos de id
+disjuntos que se piden en paralelo.
+
+Uso:
+    from quipu.snapshots import candidato_map, load_snapshot
+    dni_a_id = candidato_map(supabase)
+    temas = load_snapshot(supabase, "quipu_temas").rows
+"""
+
+import json
+import time
+import hashlib
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from quipu.cache import CACHE_DIR
+
+SNAPSHOT_DIR = CACHE_DIR / "snapshots"
+SNAPSHOT_VERSION = 1
+PAGE_SIZE = 1000            # Límite de filas por request de PostgREST en Supabase
+MAX_AGE = 24 * 3600         # Count/max(id) no detectan ediciones in-place
+WORKERS = 4
+
+COLUMNS = {
+    "quipu_candidatos": ("id, dni, nombres, apellido_paterno, apellido_materno, nombre_completo, "
+                         "cargo_postula, cargo_eleccion, partido_id, organizacion_politica"),
+    "quipu_partidos": "id, nombre_oficial, nombre_corto, candidato_presidencial",
+    "quipu_temas": "id, nombre, nombre_normalizado, categoria, sector, keywords, orden, activo",
+}
+
+
+@dataclass
+class Snapshot:
+    table: str
+    columns: str
+    rows: list
+    count: int
+    max_id: int
+    fetched_at: float
+    from_cache: bool = False
+
+
+def fetch_all(supabase, table, columns, page_size=PAGE_SIZE, id_desde=0, id_hasta=None):
+    """Filas con id_desde < id <= id_hasta, paginando por id > último."""
+    rows = []
+    last_id = id_desde
+    while True:
+        query = supabase.table(table).select(columns).gt("id", last_id)
+        if id_hasta is not None:
+            query = query.lte("id", id_hasta)
+        page = query.order("id").limit(page_size).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_id = page[-1]["id"]
+
+
+def table_stats(supabase, table):
+    """(count, max_id) de una tabla: dos requests sin traer filas."""
+    count = supabase.table(table).select("id", count="exact", head=True).execute().count or 0
+    top = supabase.table(table).select("id").order("id", desc=True).limit(1).execute().data
+    return count, (top[0]["id"] if top else 0)
+
+
+def fetch_parallel(supabase, table, columns, count, max_id, page_size=PAGE_SIZE, workers=WORKERS):
+    """
+    Baja toda la tabla partiendo [0, max_id] en rangos de id que se piden en
+    paralelo. El ancho de rango se escala con la densidad de ids para que cada
+    rango sea ~1 página; si hay huecos, cada rango sigue paginando por keyset.
+    """
+    if max_id <= 0:
+        return []
+    densidad = count / max_id if count else 1.0
+    ancho = max(page_size, int(page_size / max(densidad, 1e-6)))
+    rangos = [(lo, min(lo + ancho, max_id)) for lo in range(0, max_id, ancho)]
+    # El último rango queda abierto por si se insertó algo después de table_stats
+    rangos[-1] = (rangos[-1][0], None)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        partes = pool.map(lambda r: fetch_all(supabase, table, columns, page_size, *r), rangos)
+        return [row for parte in partes for row in parte]
+
+
+def _path(table, columns, cache_dir):
+    digest = hashlib.sha1(columns.encode("utf-8")).hexdigest()[:8]
+    return cache_dir / f"{table}.v{SNAPSHOT_VERSION}.{digest}.json"
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if data.get("version") == SNAPSHOT_VERSION else None
+
+
+def _write(path, snap):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": SNAPSHOT_VERSION,
+            "table": snap.table,
+            "columns": snap.columns,
+            "count": snap.count,
+            "max_id": snap.max_id,
+            "fetched_at": snap.fetched_at,
+            "rows": snap.rows,
+        }, f, ensure_ascii=False)
+    tmp.replace(path)
+
+
+def load_snapshot(supabase, table, columns=None, refresh=False, max_age=MAX_AGE,
+                  cache_dir=SNAPSHOT_DIR, workers=WORKERS):
+    """
+    Snapshot de `table` con `columns` (por defecto COLUMNS[table]).
+
+    Usa el archivo local si su count y max(id) coinciden con la tabla y tiene
+    menos de `max_age` segundos; si no, baja la tabla y reescribe el archivo.
+    refresh=True fuerza la descarga (p.ej. después de escribir en la tabla).
+    """
+    columns = columns or COLUMNS[table]
+    path = _path(table, columns, cache_dir)
+    count, max_id = table_stats(supabase, table)
+
+    cached = None if refresh else _read(path)
+    if (cached is not None
+            and cached["count"] == count
+            and cached["max_id"] == max_id
+            and time.time() - cached["fetched_at"] < max_age):
+        return Snapshot(table, columns, cached["rows"], count, max_id, cached["fetched_at"], from_cache=True)
+
+    rows = fetch_parallel(supabase, table, columns, count, max_id, workers=workers)
+    snap = Snapshot(table, columns, rows, len(rows), max((r["id"] for r in rows), default=0), time.time())
+    _write(path, snap)
+    return snap
+
+
+def invalidate(table, cache_dir=SNAPSHOT_DIR):
+    """Borra los snapshots locales de una tabla (todas las proyecciones)."""
+    for path in cache_dir.glob(f"{table}.v*.json"):
+        path.unlink()
+
+
+def candidato_map(supabase, **kwargs):
+    """
+    DNI → candidato_id. Con varias postulaciones por DNI gana el id mayor
+    (la hoja de vida es por persona; el frontend hace fallback por DNI).
+    """
+    snap = load_snapshot(supabase, "quipu_candidatos", **kwargs)
+    return {c["dni"]: c["id"] for c in snap.rows if c.get("dni")}
+
+
+def partido_map(supabase, **kwargs):
+    """nombre_oficial → partido_id."""
+    snap = load_snapshot(supabase, "quipu_partidos", **kwargs)
+    return {p["nombre_oficial"]: p["id"] for p in snap.rows}
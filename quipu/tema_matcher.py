@@ -0,0 +1,97 @@
+"""
+Matcher de temas (quipu_temas) compilado una vez por corrida.
+
+Reproduce la regla de buscar_tema en sync_master_declaraciones.py: se
+recorren los temas en orden y gana el primero cuyo nombre normalizado es
+igual al tema_raw normalizado, o alguna de cuyas keywords normalizadas
+aparece como substring. En vez del doble loop por llamada, los nombres van a
+un dict y las keywords a un autómata Aho-Corasick, así que cada tema_raw se
+resuelve en una sola pasada sin importar cuántas keywords haya.
+"""
+
+from collections import deque
+
+from quipu.snapshots import load_snapshot
+from quipu.text import normalizar
+
+
+class _AhoCorasick:
+    """Autómata multi-patrón; cada patrón lleva un valor y gana el mínimo."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+
+    def add(self, pattern, value):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(None)
+            node = nxt
+        if self.best[node] is None or value < self.best[node]:
+            self.best[node] = value
+
+    def build(self):
+        """Calcula links de fallo y propaga el mejor valor por la cadena de sufijos."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(ch, 0)
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+                queue.append(child)
+
+    def min_match(self, text):
+        """Menor valor entre todos los patrones que aparecen en `text`, o None."""
+        node = 0
+        found = None
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            value = self.best[node]
+            if value is not None and (found is None or value < found):
+                found = value
+                if found == 0:
+                    break
+        return found
+
+
+class TemaMatcher:
+    def __init__(self, temas):
+        """`temas`: filas de quipu_temas (id, nombre, keywords) en orden de prioridad."""
+        self.ids = [t['id'] for t in temas]
+        self.nombres = {}
+        self.keywords = _AhoCorasick()
+
+        for orden, t in enumerate(temas):
+            self.nombres.setdefault(normalizar(t['nombre']), orden)
+            for kw in (t.get('keywords') or []):
+                kw_norm = normalizar(kw)
+                if kw_norm:  # una keyword vacía matchearía cualquier texto
+                    self.keywords.add(kw_norm, orden)
+        self.keywords.build()
+
+    @classmethod
+    def from_supabase(cls, supabase, **kwargs):
+        """kwargs van a load_snapshot (p.ej. refresh=True tras editar keywords)."""
+        return cls(load_snapshot(supabase, 'quipu_temas', **kwargs).rows)
+
+    def match(self, tema_raw):
+        """id del tema para un tema_raw, o None."""
+        if not tema_raw:
+            return None
+        tema_norm = normalizar(tema_raw)
+        candidatos = [o for o in (self.nombres.get(tema_norm), self.keywords.min_match(tema_norm)) if o is not None]
+        return self.ids[min(candidatos)] if candidatos else None
@@ -0,0 +1,16 @@
+"""
+Normalización de texto compartida (matching de temas, stakeholders, caches).
+"""
+
+import unicodedata
+
+
+def normalizar(texto):
+    """Sin tildes, en minúsculas y sin espacios en los extremos."""
+    texto = unicodedata.normalize('NFD', texto)
+    return ''.join(c for c in texto if unicodedata.category(c) != 'Mn').lower().strip()
+
+
+def normalizar_espacios(texto):
+    """normalizar() y además colapsa cualquier secuencia de espacios en uno."""
+    return ' '.join(normalizar(texto).split())
@@ -0,0 +1,285 @@
+"""
+Escrituras a Supabase con concurrencia adaptativa, backoff y dead-letter.
+
+- Concurrencia AIMD (AdaptiveConcurrency): el límite de requests en vuelo
+  sube de a uno por cada ronda de respuestas OK y se divide a la mitad ante
+  throttling (429, 5xx, timeouts), como mucho una vez por `cooldown`, así una
+  ráfaga de errores simultáneos cuenta como un solo evento.
+- Errores transitorios: reintento del mismo batch con backoff exponencial y
+  jitter completo, sin ocupar cupo mientras espera. Si se agotan los
+  reintentos se levanta WriteError: Supabase no está respondiendo y seguir
+  solo llenaría el dead-letter.
+- Errores del batch (una fila inválida, constraint, payload o statement
+  timeout): el batch se parte en mitades hasta aislar las filas que fallan,
+  ~2·log2(n) requests por fila mala en vez de n. Cada fila que falla sola va
+  a data/dead_letter/<tabla>.jsonl con el error; el resto se escribe. Los
+  de carga (413, statement timeout) además bajan la concurrencia; una fila
+  sola con statement timeout se reintenta con backoff como un transitorio
+  en vez de ir al dead-letter.
+- Errores que no dependen de las filas (columna o tabla inexistente, JWT,
+  permisos, excepciones que no vienen de la API): WriteError sin partir. Si
+  al partir las dos mitades fallan con el mismo error permanente durante
+  UNIFORM_LEVELS niveles seguidos, el error es de todo el batch y también
+  se levanta WriteError en vez de mandar cada fila al dead-letter (los de
+  carga se siguen partiendo).
+
+Uso:
+    from quipu.write_client import WriteClient
+
+    writer = WriteClient(supabase, max_concurrency=6)
+    result = writer.upsert("quipu_candidatos", filas, on_conflict="dni,cargo_eleccion")
+    result.written, result.failed
+
+WriteClient es seguro entre hilos; BulkUpserter lo usa para cada batch.
+"""
+
+import json
+import time
+import random
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from quipu import metrics
+
+DEAD_LETTER_DIR = Path(__file__).resolve().parent.parent / "data" / "dead_letter"
+
+# Códigos que justifican reintentar el mismo batch (HTTP o SQLSTATE vía PostgREST)
+TRANSIENT_HTTP = {"408", "429", "500", "502", "503", "504"}
+TRANSIENT_SQLSTATE = {"40001", "40P01", "53000", "53100", "53200", "53300", "57P01", "57P03"}
+# Errores que dependen del tamaño del batch: partir y además bajar concurrencia
+OVERLOAD_CODES = {"413", "57014"}   # payload demasiado grande, statement timeout
+# De esos, los que en una fila sola son carga y no la fila: reintentar en vez de dead-letter
+RETRY_ALONE_CODES = {"57014"}
+# Clases base de httpx/httpcore (por nombre, sin importarlos)
+TRANSIENT_EXCEPTIONS = {"TimeoutException", "NetworkError", "RemoteProtocolError"}
+# Errores de esquema, autenticación o permisos: ninguna fila se va a poder escribir
+FATAL_HTTP = {"401", "403", "404"}
+FATAL_PREFIXES = (
+    "PGRST1",   # request inválido (schema no expuesto, headers)
+    "PGRST2",   # schema cache: tabla, columna o relación inexistente (PGRST204, PGRST205)
+    "PGRST3",   # JWT (PGRST301, PGRST302)
+    "42",       # SQLSTATE sintaxis / objeto inexistente / privilegios (42703, 42P01, 42501)
+    "28",       # SQLSTATE autorización
+)
+# Niveles seguidos de bisección con las dos mitades rechazadas por el mismo error
+# antes de abortar: con filas malas sueltas, una de las mitades pasa enseguida
+UNIFORM_LEVELS = 3
+
+
+def error_code(error):
+    return str(getattr(error, "code", "") or "")
+
+
+def classify_error(error):
+    """
+    'transient' (reintentar), 'overload' (partir y frenar), 'permanent'
+    (partir hasta aislar las filas) o 'fatal' (abortar: no depende de las filas).
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return "transient"
+    if any(cls.__name__ in TRANSIENT_EXCEPTIONS for cls in type(error).__mro__):
+        return "transient"
+    code = error_code(error)
+    if not code:
+        return "fatal"   # No viene de PostgREST: bug del script, serialización, etc.
+    if code in OVERLOAD_CODES:
+        return "overload"
+    if code in TRANSIENT_HTTP or code in TRANSIENT_SQLSTATE or code.startswith("08") or code.startswith("PGRST00"):
+        return "transient"
+    if code in FATAL_HTTP or code.startswith(FATAL_PREFIXES):
+        return "fatal"
+    return "permanent"
+
+
+class WriteError(Exception):
+    """
+    Un batch no se pudo escribir y seguir no tiene sentido: reintentos
+    agotados, o un error que no depende de las filas (esquema, permisos).
+    """
+
+
+class _BatchRejected(Exception):
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+class AdaptiveConcurrency:
+    """
+    Límite AIMD de requests en vuelo. `limit` arranca en `initial` (por
+    defecto el máximo): sin throttling se comporta como un semáforo fijo.
+    """
+
+    def __init__(self, maximum=4, minimum=1, initial=None, decrease=0.5, cooldown=1.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(initial or maximum)
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.decreases = 0
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+@dataclass
+class WriteResult:
+    written: list = field(default_factory=list)
+    failed: list = field(default_factory=list)
+    requests: int = 0
+    retries: int = 0
+    splits: int = 0
+
+    def merge(self, other):
+        self.written += other.written
+        self.failed += other.failed
+        self.requests += other.requests
+        self.retries += other.retries
+        self.splits += other.splits
+        return self
+
+
+class WriteClient:
+    def __init__(self, supabase, max_concurrency=4, concurrency=None, max_retries=6,
+                 base_delay=0.5, max_delay=30.0, dead_letter_dir=DEAD_LETTER_DIR):
+        self.supabase = supabase
+        self.concurrency = concurrency or AdaptiveConcurrency(maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_dir = Path(dead_letter_dir)
+        self.dead_letters = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, table, rows, on_conflict=None, ignore_duplicates=False):
+        kwargs = {}
+        if on_conflict:
+            kwargs["on_conflict"] = on_conflict
+        if ignore_duplicates:
+            kwargs["ignore_duplicates"] = True
+        return self._write("upsert", table, list(rows), kwargs)
+
+    def insert(self, table, rows):
+        return self._write("insert", table, list(rows), {})
+
+    def _write(self, op, table, rows, kwargs):
+        """Escribe `rows`; si PostgREST rechaza el batch, bisecta hasta aislar las filas malas."""
+        result = WriteResult()
+        if not rows:
+            return result
+        error = self._attempt(op, table, rows, kwargs, result)
+        if error is None:
+            result.written += rows
+            return result
+        return self._bisect(op, table, rows, kwargs, error, result, 0)
+
+    def _attempt(self, op, table, rows, kwargs, result, retry_codes=()):
+        """None si se escribió; si no, el error con que se rechazó el batch."""
+        try:
+            self._execute(op, table, rows, kwargs, result, retry_codes)
+        except _BatchRejected as rejected:
+            return rejected.error
+        return None
+
+    def _bisect(self, op, table, rows, kwargs, error, result, racha):
+        """
+        `rows` fue rechazado con `error`. Prueba las dos mitades antes de
+        bajar en cualquiera: `racha` cuenta los niveles seguidos en que ambas
+        fallaron con el mismo error permanente (código y mensaje: los errores
+        de una fila suelen nombrar el valor, los de esquema no).
+        """
+        if len(rows) == 1:
+            if error_code(error) in RETRY_ALONE_CODES:
+                error = self._attempt(op, table, rows, kwargs, result, RETRY_ALONE_CODES)
+                if error is None:
+                    result.written += rows
+                    return result
+            self._dead_letter(op, table, kwargs, rows[0], error)
+            result.failed += rows
+            return result
+        result.splits += 1
+        mid = len(rows) // 2
+        mitades = [(half, self._attempt(op, table, half, kwargs, result)) for half in (rows[:mid], rows[mid:])]
+        firma = (error_code(error), str(error))
+        if classify_error(error) == "permanent" and all(
+                e is not None and (error_code(e), str(e)) == firma for _, e in mitades):
+            racha += 1
+            if racha >= UNIFORM_LEVELS:
+                raise WriteError(f"{table}: las dos mitades fallan con el mismo error en {racha} niveles de "
+                                 f"bisección; es del batch entero, no de filas sueltas: {error}") from error
+        else:
+            racha = 0
+        for half, e in mitades:
+            if e is None:
+                result.written += half
+            else:
+                self._bisect(op, table, half, kwargs, e, result, racha)
+        return result
+
+    def _execute(self, op, table, rows, kwargs, result, retry_codes=()):
+        """Un request con reintentos; `retry_codes` se tratan como transitorios."""
+        for attempt in range(self.max_retries):
+            self.concurrency.acquire()
+            result.requests += 1
+            try:
+                getattr(self.supabase.table(table), op)(rows, **kwargs).execute()
+            except Exception as e:
+                kind = classify_error(e)
+                self.concurrency.release(throttled=kind in ("transient", "overload"))
+                if kind == "fatal":
+                    raise WriteError(f"{table}: {e}") from e
+                if kind != "transient" and error_code(e) not in retry_codes:
+                    raise _BatchRejected(e)
+                if attempt == self.max_retries - 1:
+                    raise WriteError(f"{table}: {len(rows)} filas sin escribir tras "
+                                     f"{self.max_retries} intentos: {e}") from e
+                wait = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt + 1)))
+                print(f"    [RETRY] {table}: {e}, reintentando en {wait:.1f}s "
+                      f"(concurrencia {int(self.concurrency.limit)})")
+                result.retries += 1
+                metrics.count_retry("supabase", op, table)
+                time.sleep(wait)
+            else:
+                self.concurrency.release()
+                return
+
+    def _dead_letter(self, op, table, kwargs, row, error):
+        entry = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "tabla": table,
+            "op": op,
+            "on_conflict": kwargs.get("on_conflict"),
+            "code": error_code(error),
+            "error": str(error),
+            "fila": row,
+        }
+        path = self.dead_letter_dir / f"{table}.jsonl"
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self.dead_letter_dir.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.dead_letters += 1
+        ident = next((row.get(k) for k in ("id", "id_hoja_vida", "dni") if row.get(k) is not None), "?")
+        print(f"    [DEAD-LETTER] {table} ({ident}): {error} → {path}")